@@ -1,75 +1,129 @@
-import json
 import asyncio
+import json
 import time
 from fastapi import WebSocket, WebSocketDisconnect
-from app.services.vad_service import voice_detector
-from app.services.interrupt_manager import interrupt_manager
+from app.core.config import settings
+from app.services.session_manager import session_manager
+
+
+class SensoryGate:
+    """
+    Stage W2: VAD -> barge-in / commit decisions for one mic stream.
+    Shared by the legacy JSON socket and the duplex session socket; the
+    session's detector must be open (Session.open_detector).
+    """
+    INTERRUPT_COOLDOWN = 0.6
+    COMMIT_COOLDOWN = 1.2  # Balanced for natural turn-taking
+
+    def __init__(self, session):
+        self.session = session
+        self.voice_detector = session.voice_detector
+        self.interrupt_manager = session.interrupt_manager
+        self.last_interrupt_time = 0
+        self.last_commit_time = 0  # 🔥 Prevent rapid-fire commit loops
+
+    def on_audio(self, data) -> list:
+        """Feeds one mic frame; returns the events to send ("stop_audio", "commit")."""
+        events = []
+        # 1. Process VAD (frame bytes are viewed in place by the detector's PCM ring)
+        is_voiced = self.voice_detector.is_speech(data)
+
+        if is_voiced:
+            now = time.time()
+            if now - self.last_interrupt_time > self.INTERRUPT_COOLDOWN:
+                if self.interrupt_manager.on_user_speech():
+                    self.session.cancel_turn()  # Also a turn streaming from another worker
+                    self.last_interrupt_time = now
+                    print(f"⚡ NEURAL INTERRUPT DETECTED")
+                    events.append({"type": "stop_audio"})
+
+        # 2. Fast Commit (with cooldown to prevent loops)
+        if self.voice_detector.check_commit():
+            now = time.time()
+            if now - self.last_commit_time > self.COMMIT_COOLDOWN:
+                self.last_commit_time = now
+                print("🏁 SPEECH END (Commit)")
+                events.append({"type": "commit"})
+                self.interrupt_manager.on_silence()
+        return events
+
+    def apply_immunity(self, vad_until: float, barge_in_until: float):
+        """Adopts immunity windows from the session store (a turn running on another worker)."""
+        self.voice_detector.immunity_until = max(self.voice_detector.immunity_until, vad_until)
+        self.interrupt_manager.immune_until = max(self.interrupt_manager.immune_until, barge_in_until)
+
+    def watch_immunity(self):
+        """
+        With a shared store, a task that keeps this gate's VAD and barge-in
+        immunity in step with the store while the socket is open. None otherwise
+        (the turn sets them on this process's own detectors).
+        """
+        if not self.session.store.shared:
+            return None
+
+        async def watch():
+            while True:
+                self.apply_immunity(*await self.session.immunity())
+                await asyncio.sleep(settings.SESSION_TURN_POLL_S)
+        return asyncio.create_task(watch())
+
+    def on_control(self, ctrl: dict):
+        """Stage W3: control messages from the frontend."""
+        if ctrl.get("type") == "ai_state":
+            if ctrl["status"] == "speaking":
+                print("🛡️ AI SPEAKING (Hardware Immunity SKIPPED -> Strict VAD)")
+                self.voice_detector.set_strict_mode(True)
+            elif ctrl["status"] == "listening":
+                print("👂 AI LISTENING")
+                self.voice_detector.set_strict_mode(False)
+                # 🔥 Clear accumulated "echo" frames to prevent instant trigger on mode switch
+                self.voice_detector.reset()
+        elif ctrl.get("type") == "lang_update":
+            lang = ctrl.get("lang", "en")
+            self.voice_detector.set_language_mode(lang)
+
+    def close(self):
+        self.interrupt_manager.on_silence()
+        self.voice_detector.reset()
+
 
 async def audio_stream(websocket: WebSocket):
     """
     Stage W2/W3: Responsive Audio Stream with JSON Control Channel
     """
     await websocket.accept()
-    print("🎙️ Sensory Layer: ACTIVE (Sync Mode)")
-    
-    last_interrupt_time = 0
-    last_commit_time = 0  # 🔥 Prevent rapid-fire commit loops
-    INTERRUPT_COOLDOWN = 0.6
-    COMMIT_COOLDOWN = 1.2  # Balanced for natural turn-taking
-    
+    session = session_manager.get(websocket.query_params.get("session_id"))
+    await session.open_detector()
+    session.connections += 1
+    gate = SensoryGate(session)
+    immunity_watch = gate.watch_immunity()  # Echo immunity of a turn streaming from another worker
+    print(f"🎙️ Sensory Layer: ACTIVE (Sync Mode) [session={session.session_id}]")
+
     try:
         while True:
             # Handle both Binary (Audio) and Text (Control) frames
             message = await websocket.receive()
-            
-            if "bytes" in message:
-                data = message["bytes"]
-                # 🧪 DEBUG: Confirm data arrival
-                # print(f"📥 Received Bytes: {len(data)}", flush=True)
-
-                # 1. Process VAD
-                is_voiced = voice_detector.is_speech(data)
-                
-                if is_voiced:
-                    now = time.time()
-                    if now - last_interrupt_time > INTERRUPT_COOLDOWN:
-                        if interrupt_manager.on_user_speech():
-                            last_interrupt_time = now
-                            print(f"⚡ NEURAL INTERRUPT DETECTED")
-                            await websocket.send_json({"type": "stop_audio"})
-                
-                # 2. Fast Commit (with cooldown to prevent loops)
-                if voice_detector.check_commit():
-                    now = time.time()
-                    if now - last_commit_time > COMMIT_COOLDOWN:
-                        last_commit_time = now
-                        print("🏁 SPEECH END (Commit)")
-                        await websocket.send_json({"type": "commit"})
-                        interrupt_manager.on_silence()
-
-            elif "text" in message:
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                for event in gate.on_audio(message["bytes"]):
+                    await websocket.send_json(event)
+
+            elif message.get("text") is not None:
                 # 3. Control Messages from Frontend
                 try:
-                    ctrl = json.loads(message["text"])
-                    if ctrl.get("type") == "ai_state":
-                        if ctrl["status"] == "speaking":
-                            print("🛡️ AI SPEAKING (Hardware Immunity SKIPPED -> Strict VAD)")
-                            voice_detector.set_strict_mode(True) 
-                        elif ctrl["status"] == "listening":
-                            print("👂 AI LISTENING")
-                            voice_detector.set_strict_mode(False)
-                            # 🔥 Clear accumulated "echo" frames to prevent instant trigger on mode switch
-                            voice_detector.reset()
-                    elif ctrl.get("type") == "lang_update":
-                        lang = ctrl.get("lang", "en")
-                        voice_detector.set_language_mode(lang)
+                    gate.on_control(json.loads(message["text"]))
                 except:
                     pass
-                        
+
     except WebSocketDisconnect:
         print("📡 Client Disconnected")
     except Exception as e:
         print(f"📡 Sensory Error: {e}")
     finally:
-        interrupt_manager.on_silence()
-        voice_detector.reset()
+        if immunity_watch is not None:
+            immunity_watch.cancel()
+        session.connections -= 1
+        session.touch()
+        gate.close()
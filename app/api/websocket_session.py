@@ -0,0 +1,155 @@
+import json
+import asyncio
+from fastapi import WebSocket, WebSocketDisconnect
+from app.core.config import settings
+from app.services.session_manager import session_manager
+from app.services.turn_pipeline import start_turn
+from app.services.stream_protocol import (
+    DUPLEX_SUBPROTOCOL, FRAME_MIC, FRAME_JSON, ws_event, ws_audio,
+)
+from app.services.audio_codecs import negotiate, encode_chunk_async, frame_bytes
+from app.api.websocket_audio import SensoryGate
+
+
+class DuplexSender:
+    """
+    The socket's only writer. Audio frames carry a session-wide sequence number
+    so an interrupt can discard everything already queued for the old turn.
+    Audio is sent in the session's codec, each frame decodable on its own.
+    """
+    def __init__(self, websocket: WebSocket, codec: str = "pcm"):
+        self.websocket = websocket
+        self.codec = codec
+        self.frame_bytes = frame_bytes(codec, settings.WS_AUDIO_FRAME_BYTES)
+        self.queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        self.seq = 0              # Last audio frame seq handed out
+        self.discard_through = 0  # Frames with seq <= this belong to an interrupted turn
+
+    async def event(self, event: dict):
+        await self.queue.put((None, ws_event(event)))
+
+    async def audio(self, pcm):
+        if self.codec != "pcm":
+            pcm = await encode_chunk_async(self.codec, pcm)  # Whole phrase; frames split on unit bounds
+        view = memoryview(pcm).cast("B")
+        step = self.frame_bytes
+        for start in range(0, len(view), step):
+            self.seq += 1
+            await self.queue.put((self.seq, ws_audio(self.seq, view[start:start + step])))
+
+    def interrupt(self):
+        """Drops all audio handed out so far and tells the client to do the same."""
+        self.discard_through = self.seq
+        if self.queue.full():
+            self.queue.get_nowait()  # Queued output of the interrupted turn: dropped anyway
+        self.queue.put_nowait((None, ws_event({"type": "interrupt", "seq": self.seq})))
+
+    async def run(self):
+        while True:
+            seq, data = await self.queue.get()
+            if seq is not None and seq <= self.discard_through:
+                continue
+            await self.websocket.send_bytes(data)
+
+
+async def session_stream(websocket: WebSocket, llm_client=None):
+    """
+    Stage W4: Full-duplex session socket (see stream_protocol).
+    Mic frames, control, LLM text and sequenced output PCM share one connection.
+    """
+    try:
+        codec = negotiate(websocket.query_params.get("codec"))
+    except ValueError as e:
+        print(f"📡 Session Socket Refused: {e}")
+        await websocket.close(code=1008)
+        return
+    await websocket.accept(subprotocol=DUPLEX_SUBPROTOCOL)
+    session = session_manager.get(websocket.query_params.get("session_id"))
+    await session.open_detector()
+    session.connections += 1
+    gate = SensoryGate(session)
+    immunity_watch = gate.watch_immunity()  # A /api/stream_chat turn may run on another worker
+    sender = DuplexSender(websocket, codec)
+    writer = asyncio.create_task(sender.run())
+    turn_task = None
+    print(f"🎙️ Session Socket: ACTIVE (Duplex, {codec}) [session={session.session_id}]")
+
+    async def run_turn(text: str, language: str = None):
+        pipeline, _ = await start_turn(session, text, language, llm_client, inline_audio=True)
+        events = pipeline()
+        try:
+            async for item in events:
+                if not isinstance(item, dict):
+                    await sender.audio(item)
+                elif item["type"] == "interrupt":
+                    if sender.seq > sender.discard_through:
+                        sender.interrupt()  # Barge-in already sent one if nothing new went out
+                else:
+                    if item["type"] == "audio_text":
+                        item["frame_seq"] = sender.seq + 1  # First audio frame of this phrase
+                    await sender.event(item)
+        finally:
+            await events.aclose()
+        await sender.event({"type": "done"})
+
+    async def stop_turn():
+        nonlocal turn_task
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+            await asyncio.gather(turn_task, return_exceptions=True)
+            # Before the next turn hands out frames, so only the old turn's audio is dropped
+            sender.interrupt()
+        turn_task = None
+
+    async def on_control(ctrl: dict):
+        nonlocal turn_task
+        kind = ctrl.get("type")
+        if kind == "text":
+            text = (ctrl.get("text") or "").strip()
+            if text:
+                await stop_turn()
+                turn_task = asyncio.create_task(run_turn(text, ctrl.get("language")))
+        elif kind == "stop":
+            session.cancel_turn()
+            await stop_turn()
+        elif kind == "reset":
+            await stop_turn()
+            session.reset()
+        else:
+            gate.on_control(ctrl)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            data = message.get("bytes")
+            if data is None:
+                if message.get("text"):
+                    await on_control(json.loads(message["text"]))
+                continue
+
+            kind, payload = data[:1], memoryview(data)[1:]
+            if kind == FRAME_MIC:
+                for event in gate.on_audio(payload):
+                    if event["type"] == "stop_audio":
+                        sender.interrupt()
+                    else:
+                        await sender.event(event)
+            elif kind == FRAME_JSON:
+                await on_control(json.loads(bytes(payload)))
+
+    except WebSocketDisconnect:
+        print("📡 Client Disconnected")
+    except Exception as e:
+        print(f"📡 Session Socket Error: {e}")
+    finally:
+        if turn_task:
+            turn_task.cancel()
+        if immunity_watch is not None:
+            immunity_watch.cancel()
+        writer.cancel()
+        session.connections -= 1
+        session.touch()
+        gate.close()
@@ -4,6 +4,22 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+def parse_voices(spec: str) -> dict:
+    """"hi-female=/models/hi_f.onnx,mr-news=..." -> {voice: model path}."""
+    voices = {}
+    for item in spec.split(","):
+        name, _, path = item.partition("=")
+        if name.strip() and path.strip():
+            voices[name.strip()] = path.strip()
+    return voices
+
+
+def quantized_path(model_path: str) -> str:
+    """english.onnx -> english.int8.onnx (written by scripts/quantize_voices.py)."""
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.int8{ext}"
+
+
 class Settings:
     APP_NAME = "Multi-Lang API"
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -21,11 +37,111 @@ class Settings:
     # App settings
     MIN_CONFIDENCE = float(os.getenv("MIN_CONFIDENCE", "0.70"))
     
+    # Session settings (per-user conversation state)
+    SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "900"))
+    SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+    SESSION_HISTORY_LEN = int(os.getenv("SESSION_HISTORY_LEN", "10"))
+    # Where history, language lock and turn state live: "memory" (one process) or "sqlite"
+    # (several uvicorn workers sharing SESSION_STORE_PATH; see session_store)
+    SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+    SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(TEMP_DIR, "sessions.db"))
+    # How often a process running a turn checks the shared store for a barge-in elsewhere
+    SESSION_TURN_POLL_S = float(os.getenv("SESSION_TURN_POLL_S", "0.05"))
+    
+    # Inline synthesis: phrases synthesized ahead of playback in /api/stream_chat
+    TTS_INLINE_LOOKAHEAD = int(os.getenv("TTS_INLINE_LOOKAHEAD", "3"))
+    # Bound of each stage queue in the /api/stream_chat pipeline (backpressure)
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+    # Duplex WebSocket: output PCM frame size (8820 bytes = 200ms at 22050 Hz)
+    WS_AUDIO_FRAME_BYTES = int(os.getenv("WS_AUDIO_FRAME_BYTES", "8820"))
+    # Text token coalescing: merged for up to this long / this many chars (0 ms = one write per token)
+    STREAM_TEXT_FLUSH_MS = float(os.getenv("STREAM_TEXT_FLUSH_MS", "30"))
+    STREAM_TEXT_FLUSH_CHARS = int(os.getenv("STREAM_TEXT_FLUSH_CHARS", "120"))
+    # JSON encoder for stream events: "auto" (orjson if installed), "orjson" or "json"
+    STREAM_JSON_ENCODER = os.getenv("STREAM_JSON_ENCODER", "auto")
+    # /api/v1/generate: sentences synthesized ahead of a slow client before its job yields the worker
+    TTS_STREAM_BUFFER = int(os.getenv("TTS_STREAM_BUFFER", "2"))
+    # Phrase chunking: min chars before a comma may end the first / later phrases
+    TTS_FIRST_PHRASE_MIN = int(os.getenv("TTS_FIRST_PHRASE_MIN", "6"))
+    TTS_PHRASE_MIN = int(os.getenv("TTS_PHRASE_MIN", "40"))
+    # RTF-adaptive phrase sizing (seconds of audio); TTS_PHRASE_MAX caps later phrases in chars
+    TTS_FIRST_PHRASE_MIN_S = float(os.getenv("TTS_FIRST_PHRASE_MIN_S", "0.4"))
+    TTS_PHRASE_MIN_S = float(os.getenv("TTS_PHRASE_MIN_S", "2.5"))
+    TTS_PHRASE_MAX = int(os.getenv("TTS_PHRASE_MAX", "200"))
+    
+    # TTS backend: "thread" (TTSWorkerPool) or "process" (ProcessTTSPool, one Piper per worker process)
+    TTS_BACKEND = os.getenv("TTS_BACKEND", "thread")
+    TTS_PROCESS_START_METHOD = os.getenv("TTS_PROCESS_START_METHOD", "spawn")
+    # Thread backend autoscaling: each voice runs TTS_MIN_WORKERS..TTS_MAX_WORKERS workers and
+    # all voices together at most TTS_CPU_BUDGET (0 = CPU count, never below the voices' minimums)
+    TTS_MIN_WORKERS = int(os.getenv("TTS_MIN_WORKERS", "1"))
+    TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+    TTS_CPU_BUDGET = int(os.getenv("TTS_CPU_BUDGET", "0"))
+    # Scale up when a job waited this long (or the backlog reaches the worker count);
+    # scale down after a voice has been idle this long
+    TTS_AUTOSCALE_INTERVAL = float(os.getenv("TTS_AUTOSCALE_INTERVAL", "0.5"))
+    TTS_SCALE_UP_WAIT_MS = float(os.getenv("TTS_SCALE_UP_WAIT_MS", "100"))
+    TTS_SCALE_DOWN_IDLE_S = float(os.getenv("TTS_SCALE_DOWN_IDLE_S", "10"))
+    # Inference threads for the whole process (see app/core/runtime_resources.py);
+    # 0 = sized from the CPU count and TTS_CPU_BUDGET / left to torch
+    CPU_AFFINITY = os.getenv("CPU_AFFINITY", "")
+    ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+    ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "1"))
+    ORT_ALLOW_SPINNING = os.getenv("ORT_ALLOW_SPINNING", "0") == "1"
+    TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "1"))
+    # Per-voice phoneme-ID cache in front of espeak (0 disables); TTS_PHONEME_CACHE_WORDS
+    # also assembles new phrases from words already seen
+    TTS_PHONEME_CACHE_BYTES = int(os.getenv("TTS_PHONEME_CACHE_BYTES", str(4 * 1024 * 1024)))
+    TTS_PHONEME_CACHE_WORDS = os.getenv("TTS_PHONEME_CACHE_WORDS", "1") == "1"
+    # Batched inference: a worker runs up to TTS_BATCH_MAX queued phrases as one padded
+    # ONNX batch; under load it first waits TTS_BATCH_WINDOW_MS for more (1 = off)
+    TTS_BATCH_MAX = int(os.getenv("TTS_BATCH_MAX", "4"))
+    TTS_BATCH_WINDOW_MS = float(os.getenv("TTS_BATCH_WINDOW_MS", "5"))
+    # A later phrase is scheduled like a first phrase once it must start within this
+    # long for its audio to be ready when the turn's playback runs out
+    TTS_DEADLINE_SLACK_MS = float(os.getenv("TTS_DEADLINE_SLACK_MS", "250"))
+    # Voices (comma-separated langs, e.g. "mr") loaded on first use instead of at startup;
+    # they don't gate /health readiness
+    TTS_LAZY_VOICES = os.getenv("TTS_LAZY_VOICES", "")
+    
+    # Phrase-level TTS audio cache (0 disables). TTS_CACHE_DIR enables the on-disk tier.
+    TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "")
+    TTS_CACHE_DISK_MAX_BYTES = int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+    TTS_CACHE_PREWARM = os.getenv("TTS_CACHE_PREWARM", "1") == "1"
+    # Filler: a turn with no answer audio after TTS_FILLER_BUDGET_MS plays a cached
+    # acknowledgement ("Hmm.") that cross-fades into the answer
+    TTS_FILLER = os.getenv("TTS_FILLER", "0") == "1"
+    TTS_FILLER_BUDGET_MS = float(os.getenv("TTS_FILLER_BUDGET_MS", "700"))
+    
     # Model Paths - Normalized to lowercase for professionalism
     PIPER_MODELS = {
         "en": os.path.join(MODELS_DIR, "english.onnx"),
         "hi": os.path.join(MODELS_DIR, "hindi.onnx"),
         "mr": os.path.join(MODELS_DIR, "marathi.onnx")
     }
+    # More speakers / styles per language ("<lang>-<style>=<model path>,..."); loaded on demand
+    PIPER_EXTRA_VOICES = parse_voices(os.getenv("PIPER_EXTRA_VOICES", ""))
+    PIPER_MODELS.update(PIPER_EXTRA_VOICES)
+    # Voice registry: resident memory allowed for loaded voices (0 = unlimited). Least
+    # recently used voices are unloaded to fit, except pinned ones (eager voices always are)
+    TTS_VOICE_MEMORY_MB = float(os.getenv("TTS_VOICE_MEMORY_MB", "0"))
+    TTS_PINNED_VOICES = os.getenv("TTS_PINNED_VOICES", "")
+    # Hot swap (/admin/voices/{voice}/swap): longest wait for the old pool's jobs before it stops
+    TTS_SWAP_DRAIN_S = float(os.getenv("TTS_SWAP_DRAIN_S", "30"))
+    # Enables the /admin endpoints, sent as X-Admin-Token (unset = disabled)
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    # Languages that load the INT8 variant instead ("hi,mr" or "all"), when it exists
+    PIPER_QUANTIZED = os.getenv("PIPER_QUANTIZED", "")
+
+    def voice_model(self, lang: str) -> str:
+        """Model file `lang` loads: the quantized variant if chosen and present, else full precision."""
+        model_path = self.PIPER_MODELS[lang]
+        chosen = {l.strip() for l in self.PIPER_QUANTIZED.split(",") if l.strip()}
+        if lang in chosen or "all" in chosen:
+            quantized = quantized_path(model_path)
+            if os.path.exists(quantized):
+                return quantized
+        return model_path
 
 settings = Settings()
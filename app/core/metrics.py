@@ -0,0 +1,40 @@
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    """Rolling window of latency samples (ms) with percentile summary."""
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()  # Recorded from synthesis threads too
+
+    def record(self, ms: float):
+        with self.lock:
+            self.samples.append(ms)
+            self.count += 1
+
+    def summary(self) -> dict:
+        with self.lock:
+            data = sorted(self.samples)
+        if not data:
+            return {"count": self.count}
+
+        def pct(p):
+            return round(data[min(len(data) - 1, int(len(data) * p))], 2)
+        return {"count": self.count, "p50": pct(0.50), "p90": pct(0.90), "p99": pct(0.99), "max": round(data[-1], 2)}
+
+
+class LatencyRegistry:
+    """Named LatencyStats, created on first use."""
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, name: str, ms: float):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats.setdefault(name, LatencyStats())
+        stats.record(ms)
+
+    def summary(self) -> dict:
+        return {name: s.summary() for name, s in self.stats.items()}
@@ -0,0 +1,152 @@
+"""
+Process-wide CPU resources for the inference runtimes.
+
+Every voice pool runs its own ONNX Runtime session and Silero runs on torch;
+left at their defaults each one sizes its thread pool to the whole machine, so
+(voices x workers) sessions plus torch oversubscribe the cores. This module
+sets them all from one place:
+
+  CPU_AFFINITY         cores the process may use ("" = all), e.g. "0-7,12"
+  ORT_INTRA_OP_THREADS threads per ONNX run (0 = cores / TTS worker budget, so
+                       all concurrent syntheses together fill the cores once)
+  ORT_INTER_OP_THREADS threads across independent graph nodes (Piper is sequential)
+  ORT_ALLOW_SPINNING   idle ORT threads spin-wait: faster hand-off, burns CPU
+  TORCH_NUM_THREADS    torch intra-op threads for the VAD (0 = torch default)
+
+apply() runs once at startup, before any model loads; voices are loaded
+through load_voice() so their sessions get session_options().
+"""
+import json
+import os
+from pathlib import Path
+import onnxruntime
+from piper import PiperVoice
+from piper.config import PiperConfig
+from app.core.config import settings
+from app.core.logging_config import logger
+
+_applied = {}
+
+
+def parse_cpu_list(spec: str) -> set:
+    """"0-3,6" -> {0, 1, 2, 3, 6}"""
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def intra_op_threads() -> int:
+    if settings.ORT_INTRA_OP_THREADS > 0:
+        return settings.ORT_INTRA_OP_THREADS
+    cpus = available_cpus()
+    concurrent_runs = settings.TTS_CPU_BUDGET or cpus  # Same budget the TTS autoscaler uses
+    return max(1, cpus // concurrent_runs)
+
+
+def session_options() -> onnxruntime.SessionOptions:
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads()
+    options.inter_op_num_threads = max(1, settings.ORT_INTER_OP_THREADS)
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.add_session_config_entry("session.intra_op.allow_spinning", "1" if settings.ORT_ALLOW_SPINNING else "0")
+    return options
+
+
+def load_voice(model_path: str, config_path: str, alignments: bool = False):
+    """
+    PiperVoice.load, with this process's ONNX Runtime thread settings. With
+    `alignments` the model also outputs its per-phoneme-id durations (see
+    has_alignments), patched in memory like PiperVoice.load(include_alignments=True).
+    """
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = PiperConfig.from_dict(json.load(f))
+    model = _with_alignments(model_path) if alignments else str(model_path)
+    session = onnxruntime.InferenceSession(
+        model, sess_options=session_options(), providers=["CPUExecutionProvider"]
+    )
+    return PiperVoice(config=config, session=session, download_dir=Path.cwd())
+
+
+def _with_alignments(model_path: str):
+    """The model's bytes with its duration tensor marked as an output, or its path if that can't be done."""
+    try:
+        import onnx
+        from piper.patch_voice_with_alignment import add_alignment_output
+    except ImportError:
+        logger.warning("⚠️ The onnx package is needed for voice alignments (pip install piper-tts[alignment])")
+        return str(model_path)
+    model = onnx.load(str(model_path))
+    try:
+        add_alignment_output(model)
+    except ValueError:
+        return str(model_path)  # Already patched on disk, or no duration tensor to expose
+    return model.SerializeToString()
+
+
+def has_alignments(voice) -> bool:
+    """True if the voice's ONNX session outputs per-phoneme-id durations next to the audio."""
+    return len(voice.session.get_outputs()) > 1
+
+
+def process_rss() -> int:
+    """Resident memory of this process in bytes (0 where /proc isn't available)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def apply():
+    """Pins the process to CPU_AFFINITY and sizes torch's thread pools (idempotent)."""
+    if _applied:
+        return _applied
+    if settings.CPU_AFFINITY and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, parse_cpu_list(settings.CPU_AFFINITY))
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ CPU_AFFINITY {settings.CPU_AFFINITY!r} not applied: {e}")
+
+    torch_threads = None
+    try:
+        import torch
+        if settings.TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
+            try:
+                torch.set_num_interop_threads(1)  # Only allowed before torch's first parallel op
+            except RuntimeError:
+                pass
+        torch_threads = torch.get_num_threads()
+    except ImportError:
+        pass
+
+    _applied.update({
+        "cpus": available_cpus(),
+        "ort_intra_op_threads": intra_op_threads(),
+        "ort_inter_op_threads": max(1, settings.ORT_INTER_OP_THREADS),
+        "ort_allow_spinning": settings.ORT_ALLOW_SPINNING,
+        "torch_threads": torch_threads,
+    })
+    logger.info(
+        f"🧵 Runtime threads: {_applied['cpus']} CPUs, ORT intra-op {_applied['ort_intra_op_threads']} "
+        f"/ inter-op {_applied['ort_inter_op_threads']} per session, torch {torch_threads}"
+    )
+    return _applied
+
+
+def snapshot() -> dict:
+    return dict(_applied) or {"cpus": available_cpus(), "ort_intra_op_threads": intra_op_threads()}
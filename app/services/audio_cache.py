@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from app.core.config import settings
+from app.core.logging_config import logger
+
+# Short replies that come back all the time; synthesized once at startup.
+CANNED_PHRASES = {
+    "en": ["Hello!", "Sure.", "Okay.", "Thank you!", "Sorry, could you say that again?", "Got it."],
+    "hi": ["नमस्ते!", "ठीक है।", "धन्यवाद!", "जी हाँ।", "माफ़ कीजिए, फिर से बोलिए?"],
+    "mr": ["नमस्कार!", "ठीक आहे।", "धन्यवाद!", "हो।", "माफ करा, पुन्हा सांगाल का?"],
+}
+
+# Acknowledgements played while the LLM is still thinking (TTS_FILLER); pre-warmed too.
+FILLER_PHRASES = {
+    "en": ["Hmm.", "Let me see.", "Okay, so.", "Right."],
+    "hi": ["हम्म।", "अच्छा।", "एक सेकंड।", "देखिए।"],
+    "mr": ["हम्म।", "बरं।", "एक सेकंद।", "बघा।"],
+}
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def voice_namespace(model_path: str) -> str:
+    """
+    Cache namespace of a voice model: its file name plus a fingerprint of the
+    file (size and mtime). A model replaced on disk, e.g. for a hot swap,
+    never gets the audio of the version before it, not even from the disk
+    tier after a restart.
+    """
+    name = os.path.basename(model_path)
+    try:
+        st = os.stat(model_path)
+    except OSError:
+        return name
+    return f"{name}@{hashlib.sha1(f'{st.st_size}:{st.st_mtime_ns}'.encode()).hexdigest()[:12]}"
+
+
+class AudioCache:
+    """
+    Phrase-level PCM cache keyed by (voice, normalized text).
+
+    Memory tier is an LRU bounded by total bytes; the optional disk tier keeps
+    entries across restarts. Identical concurrent misses share one synthesis.
+    """
+    def __init__(self, max_bytes: int = None, disk_dir: str = None, disk_max_bytes: int = None):
+        self.max_bytes = settings.TTS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.disk_dir = settings.TTS_CACHE_DIR if disk_dir is None else disk_dir
+        self.disk_max_bytes = settings.TTS_CACHE_DISK_MAX_BYTES if disk_max_bytes is None else disk_max_bytes
+
+        self.entries = OrderedDict()  # key -> pcm bytes, oldest first
+        self.bytes = 0
+        self.inflight = {}  # key -> asyncio.Future shared by coalesced callers
+        self.lock = threading.Lock()  # lookups also happen from threadpool generators
+        self.disk_lock = threading.Lock()  # disk_bytes and the files it counts; writes run in threads
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+        self.disk_bytes = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self.disk_bytes = sum(f.stat().st_size for f in self._disk_files())
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # ---------------- KEYS ----------------
+    @staticmethod
+    def key(voice: str, text: str):
+        return (voice, normalize_text(text))
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(f"{key[0]}\x00{key[1]}".encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pcm")
+
+    def _disk_files(self):
+        return [e for e in os.scandir(self.disk_dir) if e.name.endswith(".pcm")]
+
+    # ---------------- MEMORY TIER ----------------
+    def _remember(self, key, pcm: bytes):
+        if len(pcm) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self.entries[key] = pcm
+            self.bytes += len(pcm)
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def _from_memory(self, key):
+        with self.lock:
+            pcm = self.entries.get(key)
+            if pcm is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return pcm
+
+    # ---------------- DISK TIER ----------------
+    def _from_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                pcm = f.read()
+        except OSError:
+            return None
+        self.disk_hits += 1
+        self._remember(key, pcm)
+        return pcm
+
+    def _to_disk(self, key, pcm: bytes):
+        if not self.disk_dir or len(pcm) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(pcm)
+            with self.disk_lock:
+                try:
+                    replaced = os.path.getsize(path)  # Same phrase written again: counted once
+                except OSError:
+                    replaced = 0
+                os.replace(tmp, path)
+                self.disk_bytes += len(pcm) - replaced
+                if self.disk_bytes > self.disk_max_bytes:
+                    self._trim_disk()
+        except OSError as e:
+            logger.warning(f"⚠️ TTS cache disk write failed: {e}")
+
+    def _trim_disk(self):
+        # Called with disk_lock held
+        files = []
+        for entry in self._disk_files():
+            try:
+                st = entry.stat()
+            except OSError:
+                continue  # Removed meanwhile
+            files.append((st.st_mtime, st.st_size, entry.path))
+        for _, size, path in sorted(files):
+            if self.disk_bytes <= self.disk_max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+
+    # ---------------- PUBLIC API ----------------
+    def lookup(self, voice: str, text: str):
+        """Synchronous lookup (memory, then disk). Returns PCM bytes or None."""
+        if not self.enabled:
+            return None
+        key = self.key(voice, text)
+        pcm = self._from_memory(key)
+        if pcm is None:
+            pcm = self._from_disk(key)
+        if pcm is None:
+            self.misses += 1
+        return pcm
+
+    async def alookup(self, voice: str, text: str):
+        """Like lookup() but keeps disk reads off the event loop."""
+        if not self.enabled:
+            return None
+        key = self.key(voice, text)
+        pcm = self._from_memory(key)
+        if pcm is None and self.disk_dir:
+            pcm = await asyncio.to_thread(self._from_disk, key)
+        if pcm is None:
+            self.misses += 1
+        return pcm
+
+    def store(self, voice: str, text: str, pcm: bytes):
+        if not self.enabled or not pcm:
+            return
+        key = self.key(voice, text)
+        self._remember(key, pcm)
+        self._to_disk(key, pcm)
+
+    def contains(self, voice: str, text: str) -> bool:
+        """Membership check that doesn't touch LRU order or hit/miss counters."""
+        key = self.key(voice, text)
+        if key in self.entries:
+            return True
+        return bool(self.disk_dir) and os.path.exists(self._disk_path(key))
+
+    async def acontains(self, voice: str, text: str) -> bool:
+        """Like contains() but checks the disk tier off the event loop."""
+        key = self.key(voice, text)
+        if key in self.entries:
+            return True
+        return bool(self.disk_dir) and await asyncio.to_thread(os.path.exists, self._disk_path(key))
+
+    def is_inflight(self, voice: str, text: str) -> bool:
+        return self.key(voice, text) in self.inflight
+
+    async def get_or_synthesize(self, voice: str, text: str, synthesize):
+        """
+        Returns cached PCM or runs `synthesize()` (a coroutine factory) once for
+        all concurrent callers asking for the same phrase. `synthesize` returns
+        None for audio that must not be cached (interrupted / failed); waiting
+        callers then retry on their own.
+        """
+        if not self.enabled:
+            return await synthesize()
+        key = self.key(voice, text)
+        while True:
+            pcm = await self.alookup(voice, text)
+            if pcm is not None:
+                return pcm
+
+            pending = self.inflight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            pcm = await asyncio.shield(pending)
+            if pcm is not None:
+                return pcm
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        pcm = None
+        try:
+            pcm = await synthesize()
+            if pcm:
+                if self.disk_dir:
+                    await asyncio.to_thread(self.store, voice, text, pcm)
+                else:
+                    self.store(voice, text, pcm)
+            return pcm
+        finally:
+            self.inflight.pop(key, None)
+            future.set_result(pcm or None)
+
+    async def prewarm(self, voice: str, phrases, synthesize):
+        """Synthesizes the canned phrases that are not cached yet."""
+        warmed = 0
+        for phrase in phrases:
+            if not self.enabled or self.contains(voice, phrase):
+                continue
+            if await self.get_or_synthesize(voice, phrase, lambda p=phrase: synthesize(p)):
+                warmed += 1
+        if warmed:
+            logger.info(f"🔥 TTS cache pre-warmed {warmed} phrase(s) for {voice}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "inflight": len(self.inflight),
+            "disk_bytes": self.disk_bytes,
+        }
+
+audio_cache = AudioCache()
@@ -0,0 +1,267 @@
+"""
+Compact encodings for TTS output audio (int16 mono PCM in).
+
+pcm    audio/pcm          raw little-endian int16, 2 bytes/sample
+mulaw  audio/x-mulaw      G.711 u-law, 1 byte/sample (one table lookup per sample)
+adpcm  audio/x-ima-adpcm  IMA-ADPCM, ~4 bits/sample, WAV-style 256-byte blocks:
+                          [int16 LE first sample][u8 step index][u8 0][252 bytes]
+                          = 505 samples; nibbles low first. The last block of a
+                          stream may be shorter (odd sample counts pad one nibble).
+
+ADPCM is sequential within a block, so blocks start independently (their step
+index is seeded from the block's own first samples) and are encoded all at
+once: the per-sample loop runs 505 times per chunk, vectorized across blocks.
+
+Encoders are streaming: encode() takes any run of samples and returns whole
+units only (ADPCM keeps the tail of a block for the next call); flush() ends
+the stream. encode_chunk() makes one self-contained payload (one frame or
+WebSocket message).
+"""
+import asyncio
+import numpy as np
+from app.services.pcm_buffer import as_int16
+
+MEDIA_TYPES = {
+    "pcm": "audio/pcm",
+    "mulaw": "audio/x-mulaw",
+    "adpcm": "audio/x-ima-adpcm",
+}
+
+# ---------------- u-law ----------------
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def _build_mulaw_tables():
+    x = np.arange(-32768, 32768, dtype=np.int32)
+    sign = np.where(x < 0, 0x80, 0)
+    mag = np.minimum(np.abs(x), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = np.floor(np.log2(mag >> 7)).astype(np.int32)
+    mantissa = (mag >> (exponent + 3)) & 0x0F
+    encoded = (~(sign | (exponent << 4) | mantissa)) & 0xFF
+    # Indexed by the sample's uint16 bit pattern
+    encode = np.empty(65536, dtype=np.uint8)
+    encode[x.astype(np.uint16)] = encoded
+
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    mag = (((u & 0x0F) << 3) + _MULAW_BIAS) << ((u >> 4) & 0x07)
+    decode = np.where(u & 0x80, _MULAW_BIAS - mag, mag - _MULAW_BIAS).astype(np.int16)
+    return encode, decode
+
+
+MULAW_ENCODE, MULAW_DECODE = _build_mulaw_tables()
+
+# ---------------- IMA-ADPCM ----------------
+ADPCM_BLOCK_BYTES = 256
+ADPCM_BLOCK_SAMPLES = 1 + 2 * (ADPCM_BLOCK_BYTES - 4)  # 505
+
+STEP_TABLE = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+], dtype=np.int32)
+INDEX_ADJUST = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2, dtype=np.int32)
+
+
+def _build_adpcm_tables():
+    # Flat [index * 16 + code] tables: signed predictor change and next step index
+    step = STEP_TABLE[:, None]
+    code = np.arange(16, dtype=np.int32)[None, :]
+    delta = (step >> 3) + np.where(code & 4, step, 0) + np.where(code & 2, step >> 1, 0) + np.where(code & 1, step >> 2, 0)
+    delta = np.where(code & 8, -delta, delta)
+    next_index = np.clip(np.arange(89)[:, None] + INDEX_ADJUST[None, :], 0, 88)
+    return delta.ravel().astype(np.int32), next_index.ravel().astype(np.int32)
+
+
+ADPCM_DELTA, ADPCM_NEXT_INDEX = _build_adpcm_tables()
+
+
+def _adpcm_encode_blocks(samples: np.ndarray) -> bytes:
+    """Encodes int16 samples as IMA-ADPCM blocks (all full but the last)."""
+    n = samples.shape[0]
+    if n == 0:
+        return b""
+    n_blocks = -(-n // ADPCM_BLOCK_SAMPLES)
+    grid = np.empty((n_blocks, ADPCM_BLOCK_SAMPLES), dtype=np.int32)
+    grid.ravel()[:n] = samples
+    tail = n - (n_blocks - 1) * ADPCM_BLOCK_SAMPLES
+    if tail < ADPCM_BLOCK_SAMPLES:
+        grid[-1, tail:] = grid[-1, tail - 1]  # Padding is dropped below
+
+    # Seed each block's step from its own opening slope, so blocks are independent
+    slope = np.abs(np.diff(grid[:, :9], axis=1)).mean(axis=1)
+    index = np.clip(np.searchsorted(STEP_TABLE, slope), 0, 88).astype(np.int32)
+    pred = grid[:, 0].copy()
+    header_index = index.copy()
+
+    codes = np.empty((n_blocks, ADPCM_BLOCK_SAMPLES - 1), dtype=np.uint8)
+    for i in range(1, ADPCM_BLOCK_SAMPLES):
+        diff = grid[:, i] - pred
+        step = STEP_TABLE[index]
+        # 3-bit magnitude; any choice decodes correctly since the decoder uses the same tables
+        code = np.minimum((np.abs(diff) << 2) // step, 7)
+        code |= (diff >> 28) & 8  # Sign bit
+        flat = (index << 4) | code
+        pred += ADPCM_DELTA[flat]
+        np.clip(pred, -32768, 32767, out=pred)
+        index = ADPCM_NEXT_INDEX[flat]
+        codes[:, i - 1] = code
+
+    out = np.zeros((n_blocks, ADPCM_BLOCK_BYTES), dtype=np.uint8)
+    out[:, 0:2] = grid[:, 0].astype("<i2").view(np.uint8).reshape(n_blocks, 2)
+    out[:, 2] = header_index
+    out[:, 4:] = codes[:, 0::2] | (codes[:, 1::2] << 4)
+    data = out.tobytes()
+    if tail < ADPCM_BLOCK_SAMPLES:
+        data = data[:len(data) - ADPCM_BLOCK_BYTES + 4 + tail // 2]
+    return data
+
+
+def _adpcm_decode_blocks(data) -> np.ndarray:
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if raw.shape[0] < 4:
+        return np.empty(0, dtype=np.int16)
+    n_blocks = -(-raw.shape[0] // ADPCM_BLOCK_BYTES)
+    blocks = np.zeros((n_blocks, ADPCM_BLOCK_BYTES), dtype=np.uint8)
+    blocks.ravel()[:raw.shape[0]] = raw
+    tail_bytes = raw.shape[0] - (n_blocks - 1) * ADPCM_BLOCK_BYTES
+    n = (n_blocks - 1) * ADPCM_BLOCK_SAMPLES + 1 + 2 * max(0, tail_bytes - 4)
+
+    pred = blocks[:, 0:2].copy().view("<i2").ravel().astype(np.int32)
+    index = np.minimum(blocks[:, 2].astype(np.int32), 88)
+    codes = np.empty((n_blocks, ADPCM_BLOCK_SAMPLES - 1), dtype=np.int32)
+    codes[:, 0::2] = blocks[:, 4:] & 0x0F
+    codes[:, 1::2] = blocks[:, 4:] >> 4
+
+    out = np.empty((n_blocks, ADPCM_BLOCK_SAMPLES), dtype=np.int16)
+    out[:, 0] = pred
+    for i in range(1, ADPCM_BLOCK_SAMPLES):
+        flat = (index << 4) | codes[:, i - 1]
+        pred += ADPCM_DELTA[flat]
+        np.clip(pred, -32768, 32767, out=pred)
+        index = ADPCM_NEXT_INDEX[flat]
+        out[:, i] = pred
+    return out.ravel()[:n]
+
+
+# ---------------- ENCODERS ----------------
+class PCMEncoder:
+    codec = "pcm"
+    unit_bytes, unit_samples = 2, 1
+    offload = False  # Cheap enough for the event loop
+
+    def encode(self, pcm) -> bytes:
+        return bytes(pcm)
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class MulawEncoder(PCMEncoder):
+    codec = "mulaw"
+    unit_bytes, unit_samples = 1, 1
+
+    def encode(self, pcm) -> bytes:
+        return MULAW_ENCODE[as_int16(pcm).view(np.uint16)].tobytes()
+
+
+class AdpcmEncoder(PCMEncoder):
+    codec = "adpcm"
+    unit_bytes, unit_samples = ADPCM_BLOCK_BYTES, ADPCM_BLOCK_SAMPLES
+    offload = True  # ~500 vector steps per call: run off the event loop
+
+    def __init__(self):
+        self.pending = np.empty(0, dtype=np.int16)  # Head of the next block
+
+    def encode(self, pcm) -> bytes:
+        samples = as_int16(pcm)
+        if self.pending.shape[0]:
+            samples = np.concatenate((self.pending, samples))
+        whole = samples.shape[0] - samples.shape[0] % ADPCM_BLOCK_SAMPLES
+        self.pending = samples[whole:].copy()
+        return _adpcm_encode_blocks(samples[:whole])
+
+    def flush(self) -> bytes:
+        data = _adpcm_encode_blocks(self.pending)
+        self.pending = self.pending[:0]
+        return data
+
+
+ENCODERS = {cls.codec: cls for cls in (PCMEncoder, MulawEncoder, AdpcmEncoder)}
+
+
+def negotiate(requested: str = None, accept: str = None) -> str:
+    """
+    Picks the output codec: an explicit `?codec=` wins, then the best match in
+    the Accept header (q-values honoured), else raw PCM.
+    Raises ValueError for an unknown explicit codec.
+    """
+    if requested:
+        if requested not in ENCODERS:
+            raise ValueError(f"Unknown audio codec: {requested}")
+        return requested
+    by_media = {media: codec for codec, media in MEDIA_TYPES.items()}
+    best, best_q = "pcm", 0.0
+    for item in (accept or "").split(","):
+        media, *params = [p.strip() for p in item.split(";")]
+        q = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        if media in by_media and q > best_q:
+            best, best_q = by_media[media], q
+    return best
+
+
+def get_encoder(codec: str):
+    return ENCODERS[codec]()
+
+
+def frame_bytes(codec: str, pcm_bytes: int) -> int:
+    """Encoded size of whole units covering at least `pcm_bytes` of PCM (frame splitting)."""
+    cls = ENCODERS[codec]
+    units = -(-(pcm_bytes // 2) // cls.unit_samples)
+    return max(1, units) * cls.unit_bytes
+
+
+def encode_chunk(codec: str, pcm) -> bytes:
+    """One self-contained payload (e.g. one frame): decodable on its own."""
+    encoder = get_encoder(codec)
+    return encoder.encode(pcm) + encoder.flush()
+
+
+async def encode_chunk_async(codec: str, pcm) -> bytes:
+    if ENCODERS[codec].offload:
+        return await asyncio.to_thread(encode_chunk, codec, pcm)
+    return encode_chunk(codec, pcm)
+
+
+async def encode_stream(codec: str, chunks):
+    """Encodes an async stream of PCM chunks as one continuous stream."""
+    encoder = get_encoder(codec)
+    try:
+        async for pcm in chunks:
+            data = await asyncio.to_thread(encoder.encode, pcm) if encoder.offload else encoder.encode(pcm)
+            if data:
+                yield data
+    finally:
+        await chunks.aclose()  # Client gone: release the synthesis now, not at GC
+    tail = await asyncio.to_thread(encoder.flush) if encoder.offload else encoder.flush()
+    if tail:
+        yield tail
+
+
+def decode(codec: str, data) -> np.ndarray:
+    """Reference decoder (int16 samples); the browser has its own in audio_codecs.js."""
+    if codec == "mulaw":
+        return MULAW_DECODE[np.frombuffer(data, dtype=np.uint8)]
+    if codec == "adpcm":
+        return _adpcm_decode_blocks(data)
+    return as_int16(bytes(data))
@@ -0,0 +1,69 @@
+import threading
+import time
+from app.core.metrics import LatencyRegistry
+
+# Time from barge-in (token.cancel()) to each stage actually letting go, in ms.
+abort_latency = LatencyRegistry()
+
+
+class CancelToken:
+    """
+    Cancellation scope for one conversation turn.
+
+    Checked by the LLM stream, the TTS queue, in-flight synthesis (from worker
+    threads) and the HTTP stream. Callbacks let a stage react immediately
+    instead of polling: abort an ONNX run, cancel a task, wake a queue.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.cancelled_at = None
+        self._recorded = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.cancelled_at = time.perf_counter()
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception as e:
+                print(f"⚠️ Cancel callback error: {e}")
+
+    def add_callback(self, cb):
+        """Runs `cb()` on cancel (immediately if already cancelled). Returns a remover."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return lambda: self._remove(cb)
+        cb()
+        return lambda: None
+
+    def _remove(self, cb):
+        with self._lock:
+            if cb in self._callbacks:
+                self._callbacks.remove(cb)
+
+    def child(self):
+        """
+        A token for one request inside this scope (e.g. one HTTP stream): it is
+        cancelled along with this one, or on its own without ending the turn.
+        """
+        child = CancelToken()
+        child.add_callback(self.add_callback(child.cancel))
+        return child
+
+    def record_abort(self, stage: str):
+        """Records how long `stage` took to stop after cancel (once per stage)."""
+        if self.cancelled_at is None or stage in self._recorded:
+            return
+        self._recorded.add(stage)
+        abort_latency.record(stage, (time.perf_counter() - self.cancelled_at) * 1000)
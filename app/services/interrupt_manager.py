@@ -1,11 +1,21 @@
 import time
+from app.services.cancellation import CancelToken
 
 class InterruptManager:
     def __init__(self):
-        self.cancel_current_tts = False
+        self.turn = CancelToken()  # Cancellation scope of the current AI turn
         self.user_active = False
         self.immune_until = 0
 
+    @property
+    def cancel_current_tts(self) -> bool:
+        return self.turn.cancelled
+
+    @cancel_current_tts.setter
+    def cancel_current_tts(self, value: bool):
+        if value:
+            self.turn.cancel()
+
     def on_user_speech(self):
         """Called when Sensory Layer validates user speech."""
         now = time.time()
@@ -17,7 +27,7 @@ class InterruptManager:
             print(" USER BARGE-IN: ABORT SIGNAL SENT")
             self.user_active = True
             # Constraints: Abort Gemini generation safely and stop synthesis
-            self.cancel_current_tts = True
+            self.turn.cancel()
             return True
         return False
 
@@ -26,12 +36,14 @@ class InterruptManager:
         if self.user_active:
             self.user_active = False
 
-    def reset_interrupt(self):
-        """Called at the start of every AI response turn."""
-        self.cancel_current_tts = False
+    def reset_interrupt(self) -> CancelToken:
+        """
+        Called at the start of every AI response turn. Supersedes the previous
+        turn (its token is cancelled) and returns the new turn's token.
+        """
+        self.turn.cancel()
+        self.turn = CancelToken()
         # Constraints: Set immunity window to prevent self-interruption (echo)
         self.immune_until = time.time() + 0.6
         print(f" IMMUNITY ACTIVE (600ms)")
-
-# Single Global Instance for Stage W4
-interrupt_manager = InterruptManager()
+        return self.turn
@@ -0,0 +1,110 @@
+"""
+Preallocated int16 PCM buffers shared by TTS output and VAD input.
+
+PCMBuffer  - growable append-only buffer (amortized O(1) appends) for
+             assembling synthesized audio without `bytes +=` copies.
+PCMRing    - fixed-frame reader for the mic stream: arbitrary-size writes in,
+             fixed 512-sample float32 frames out, no Python lists.
+"""
+import numpy as np
+
+INT16_SCALE = np.float32(32767.0)
+FLOAT_SCALE = np.float32(1.0 / 32768.0)
+
+
+def as_int16(data) -> np.ndarray:
+    """Zero-copy int16 view of bytes / bytearray / memoryview / int16 array."""
+    if isinstance(data, np.ndarray):
+        return data if data.dtype == np.int16 else data.astype(np.int16)
+    return np.frombuffer(data, dtype=np.int16)
+
+
+def float_to_int16(audio: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """float [-1, 1] -> int16 in one pass (no intermediate float array)."""
+    if out is None:
+        out = np.empty(audio.shape[0], dtype=np.int16)
+    np.multiply(audio, INT16_SCALE, out=out, casting="unsafe")
+    return out
+
+
+class PCMBuffer:
+    def __init__(self, capacity: int = 22050):
+        self.array = np.empty(max(1, capacity), dtype=np.int16)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, extra: int) -> np.ndarray:
+        needed = self.size + extra
+        if needed > self.array.shape[0]:
+            grown = np.empty(max(needed, self.array.shape[0] * 2), dtype=np.int16)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        dst = self.array[self.size:needed]
+        self.size = needed
+        return dst
+
+    def append(self, data):
+        """Appends int16 samples (bytes-like or int16 array)."""
+        samples = as_int16(data)
+        self._reserve(samples.shape[0])[:] = samples
+
+    def append_float(self, audio: np.ndarray):
+        """Appends float [-1, 1] audio, converting straight into the buffer."""
+        float_to_int16(audio, out=self._reserve(audio.shape[0]))
+
+    def view(self) -> np.ndarray:
+        return self.array[:self.size]
+
+    def memoryview(self) -> memoryview:
+        return memoryview(self.view()).cast("B")
+
+    def tobytes(self) -> bytes:
+        return self.view().tobytes()
+
+    def clear(self):
+        self.size = 0
+
+
+class PCMRing:
+    def __init__(self, frame_size: int = 512, capacity: int = 8192):
+        self.frame_size = frame_size
+        self.array = np.empty(max(capacity, frame_size * 2), dtype=np.int16)
+        self.start = 0
+        self.end = 0
+
+    @property
+    def available(self) -> int:
+        return self.end - self.start
+
+    def write(self, data):
+        samples = as_int16(data)
+        n = samples.shape[0]
+        if self.end + n > self.array.shape[0]:
+            # Compact the unread tail (< one frame in steady state) to the front
+            pending = self.available
+            if pending + n > self.array.shape[0]:
+                grown = np.empty(max(pending + n, self.array.shape[0] * 2), dtype=np.int16)
+                grown[:pending] = self.array[self.start:self.end]
+                self.array = grown
+            else:
+                self.array[:pending] = self.array[self.start:self.end]
+            self.start, self.end = 0, pending
+        self.array[self.end:self.end + n] = samples
+        self.end += n
+
+    def read_frame(self, out: np.ndarray) -> bool:
+        """Fills `out` (float32, frame_size) with the next frame scaled to [-1, 1)."""
+        if self.available < self.frame_size:
+            return False
+        # Cast into `out`, then scale in place: no temporaries on the per-frame path
+        out[:] = self.array[self.start:self.start + self.frame_size]
+        np.multiply(out, FLOAT_SCALE, out=out)
+        self.start += self.frame_size
+        if self.start == self.end:
+            self.start = self.end = 0
+        return True
+
+    def clear(self):
+        self.start = self.end = 0
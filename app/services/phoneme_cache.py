@@ -0,0 +1,156 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from app.core.config import settings
+from app.services.audio_cache import normalize_text
+
+# Text tokens that end a sentence the way espeak splits them
+_SENTENCE_END = re.compile(r"[.!?।॥]+[\"')\]]*$")
+
+
+def _split_sentences(text: str):
+    """Whitespace tokens (punctuation attached) grouped into sentences."""
+    sentences, current = [], []
+    for token in text.split():
+        current.append(token)
+        if _SENTENCE_END.search(token):
+            sentences.append(current)
+            current = []
+    if current:
+        sentences.append(current)
+    return sentences
+
+
+def _phoneme_words(phonemes):
+    words, current = [], []
+    for p in phonemes:
+        if p == " ":
+            words.append(current)
+            current = []
+        else:
+            current.append(p)
+    words.append(current)
+    return words
+
+
+class PhonemeCache:
+    """
+    Per-voice phoneme-ID cache in front of espeak (which runs under one global
+    lock, so every miss also serializes the other workers).
+
+    Phrase tier: normalized text -> phoneme IDs per sentence.
+    Word tier: text token (punctuation attached) -> its phonemes, learned from
+    phrases whose tokens line up one-to-one with espeak's words. A new phrase
+    made only of known tokens is assembled from them without phonemizing.
+    Both tiers share one LRU bounded by TTS_PHONEME_CACHE_BYTES.
+    """
+    def __init__(self, voice, max_bytes: int = None, words: bool = None):
+        self.voice = voice
+        self.max_bytes = settings.TTS_PHONEME_CACHE_BYTES if max_bytes is None else max_bytes
+        self.words = settings.TTS_PHONEME_CACHE_WORDS if words is None else words
+
+        self.entries = OrderedDict()  # ("p", text) | ("w", token) -> (value, size), oldest first
+        self.bytes = 0
+        self.lock = threading.Lock()  # Used from synthesis threads
+
+        self.phrase_hits = 0
+        self.word_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.phonemize_s = 0.0  # Time spent in espeak on misses
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key, value, size: int):
+        # Caller holds the lock
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self.entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def phonemize_ids(self, text: str):
+        """Text -> phoneme IDs per sentence (what iter_sentence_audio feeds to ONNX)."""
+        if not self.enabled:
+            return self._phonemize(text)[1]
+        text = normalize_text(text)
+        with self.lock:
+            ids = self._get(("p", text))
+            if ids is not None:
+                self.phrase_hits += 1
+                return ids
+            ids = self._from_words(text) if self.words else None
+            if ids is not None:
+                self.word_hits += 1
+        if ids is None:
+            phonemes, ids = self._phonemize(text)
+            with self.lock:
+                self.misses += 1
+                if self.words:
+                    self._learn_words(text, phonemes)
+        with self.lock:
+            # ~8 bytes per ID in the nested lists plus the key
+            self._put(("p", text), ids, 8 * sum(len(s) for s in ids) + len(text) * 2 + 64)
+        return ids
+
+    def _phonemize(self, text: str):
+        t0 = time.perf_counter()
+        phonemes = [p for p in self.voice.phonemize(text) if p]
+        self.phonemize_s += time.perf_counter() - t0
+        return phonemes, [self.voice.phonemes_to_ids(p) for p in phonemes]
+
+    def _from_words(self, text: str):
+        # Caller holds the lock
+        ids = []
+        for tokens in _split_sentences(text):
+            phonemes = []
+            for token in tokens:
+                word = self._get(("w", token))
+                if word is None:
+                    return None
+                if phonemes:
+                    phonemes.append(" ")
+                phonemes.extend(word)
+            ids.append(self.voice.phonemes_to_ids(phonemes))
+        return ids
+
+    def _learn_words(self, text: str, phonemes):
+        # Caller holds the lock. Only when espeak's sentences and words line up with ours
+        # (numbers, abbreviations and the like expand, and are skipped)
+        sentences = _split_sentences(text)
+        if len(sentences) != len(phonemes):
+            return
+        for tokens, sentence in zip(sentences, phonemes):
+            words = _phoneme_words(sentence)
+            if len(words) != len(tokens):
+                continue
+            for token, word in zip(tokens, words):
+                if word and ("w", token) not in self.entries:
+                    self._put(("w", token), word, 4 * len(word) + len(token) * 2 + 64)
+
+    def snapshot(self) -> dict:
+        lookups = self.phrase_hits + self.word_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "phrase_hits": self.phrase_hits,
+            "word_hits": self.word_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.phrase_hits + self.word_hits) / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "phonemize_ms": round(self.phonemize_s * 1000, 1),
+        }
@@ -0,0 +1,122 @@
+"""
+Incremental phrase segmenter for streamed LLM replies.
+
+Splits the token stream into speakable phrases for TTS. Every incoming
+character is looked at exactly once; text is only joined when a phrase is cut,
+so cost is linear in the reply length no matter how tokens are split.
+
+Rules:
+  - Hard boundaries (. ! ? । ॥ newline) always end the first phrase (earliest
+    audio). Later phrases end at one only once they have next_min_len
+    characters, so short sentences are merged up to the size the voice can
+    keep ahead of playback. Runs like "?!", "..." and closing quotes stay with
+    the sentence they end.
+  - Soft boundaries (, ;) end a phrase only once it has min_len characters:
+    first_min_len for the first phrase, next_min_len after.
+  - "." is not a boundary after abbreviations (Dr., Mr., डॉ., श्री., e.g.,
+    initials) or inside words and numbers (3.5, gemini.com).
+"""
+
+HARD_BOUNDARIES = frozenset(".!?।॥\n")
+SOFT_BOUNDARIES = frozenset(",;")
+CLOSERS = frozenset("\"')]}”’»")
+OPENERS = "\"'([{“‘«"
+MAX_WORD = 16
+
+ABBREVIATIONS = frozenset({
+    # English honorifics / short forms that are never sentence ends in replies
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "approx", "dept", "govt",
+    # Devanagari (Hindi / Marathi) honorific abbreviations
+    "डॉ", "श्री", "श्रीमती", "सौ", "कु", "प्रा", "स्व",
+})
+
+
+class PhraseSegmenter:
+    def __init__(self, first_min_len: int = 6, next_min_len: int = 40):
+        self.first_min_len = first_min_len
+        self.next_min_len = next_min_len
+        self.reset()
+
+    def reset(self):
+        self.parts = []           # Text of the current phrase, as received
+        self.length = 0           # Chars in the current phrase (leading whitespace excluded)
+        self.word = ""            # Current word, for abbreviation checks
+        self.pending = None       # Hard boundary seen; the cut waits for the next char
+        self.after_digit = False  # Pending "." follows a digit ("3." may become "3.5")
+        self.emitted = 0
+
+    @property
+    def min_len(self) -> int:
+        return self.first_min_len if self.emitted == 0 else self.next_min_len
+
+    def push(self, text: str) -> list:
+        """Feeds one streamed chunk; returns the phrases it completed (maybe none)."""
+        phrases = []
+        start = 0  # Start of the part of `text` not yet assigned to a phrase
+        for i, ch in enumerate(text):
+            if self.pending is not None:
+                if ch in HARD_BOUNDARIES or ch in CLOSERS:
+                    self.length += 1
+                    continue
+                boundary, self.pending = self.pending, None
+                if not (boundary == "." and ch.isalnum()):
+                    start = self._end_sentence(phrases, text, start, i)
+
+            if ch.isspace() and ch != "\n":
+                self.word = ""
+                if self.length:
+                    self.length += 1
+                continue
+
+            self.length += 1
+            if ch in HARD_BOUNDARIES:
+                if not (ch == "." and self._is_abbreviation()):
+                    self.pending = ch
+                    self.after_digit = ch == "." and self.word[-1:].isdigit()
+            elif ch in SOFT_BOUNDARIES and self.length >= self.min_len:
+                start = self._cut(phrases, text, start, i + 1)
+            # Capped: abbreviations are short, and this keeps the scan linear on long tokens
+            self.word = "" if ch == "\n" else (self.word + ch)[-MAX_WORD:]
+
+        # End of chunk: don't hold a finished sentence back for the next token,
+        # unless it may still turn out to be a decimal number
+        if self.pending is not None and not self.after_digit:
+            self.pending = None
+            start = self._end_sentence(phrases, text, start, len(text))
+        if start < len(text):
+            self.parts.append(text[start:])
+        return phrases
+
+    def flush(self):
+        """Ends the stream; returns the remaining phrase or None."""
+        phrases = []
+        self._cut(phrases, "", 0, 0)
+        self.pending = None
+        self.word = ""
+        return phrases[0] if phrases else None
+
+    def _end_sentence(self, phrases, text, start, end) -> int:
+        # Later sentences are merged until the phrase reaches next_min_len
+        if self.emitted == 0 or self.length >= self.next_min_len:
+            return self._cut(phrases, text, start, end)
+        return start
+
+    def _cut(self, phrases, text, start, end) -> int:
+        self.parts.append(text[start:end])
+        phrase = "".join(self.parts).strip()
+        self.parts = []
+        self.length = 0
+        if phrase:
+            phrases.append(phrase)
+            self.emitted += 1
+        return end
+
+    def _is_abbreviation(self) -> bool:
+        word = self.word.lstrip(OPENERS)
+        if not word:
+            return False
+        if "." in word and all(len(part) <= 2 for part in word.split(".")):
+            return True  # e.g / U.S: dotted short forms (not "gemini.com.")
+        if len(word) == 1 and word.isupper() and word != "I":
+            return True  # Initials: "J. Smith"
+        return word.lower() in ABBREVIATIONS
@@ -0,0 +1,104 @@
+"""
+Abortable Piper synthesis.
+
+Mirrors PiperVoice.synthesize (phonemize -> ids -> ONNX -> normalize per
+sentence) but runs ONNX with caller-owned RunOptions, so a barge-in can set
+`terminate` and stop the utterance mid-sentence instead of after it.
+"""
+import numpy as np
+import onnxruntime
+
+
+def abortable_run_options(token=None):
+    """RunOptions terminated when `token` is cancelled. Returns (run_options, remove_callback)."""
+    run_options = onnxruntime.RunOptions()
+    if token is None:
+        return run_options, lambda: None
+    remove = token.add_callback(lambda: setattr(run_options, "terminate", True))
+    return run_options, remove
+
+
+def abortable_batch_run_options(tokens):
+    """RunOptions terminated once every row's token is cancelled. Returns (run_options, remove_callback)."""
+    run_options = onnxruntime.RunOptions()
+    tokens = [t for t in tokens if t is not None]
+    if len(tokens) == 0:
+        return run_options, lambda: None
+
+    def on_cancel():
+        if all(t.cancelled for t in tokens):
+            run_options.terminate = True
+    removers = [t.add_callback(on_cancel) for t in tokens]
+    return run_options, lambda: [remove() for remove in removers]
+
+
+def phoneme_ids_to_audio(voice, phoneme_ids, run_options=None) -> np.ndarray:
+    cfg = voice.config
+    args = {
+        "input": np.array([phoneme_ids], dtype=np.int64),
+        "input_lengths": np.array([len(phoneme_ids)], dtype=np.int64),
+        "scales": np.array([cfg.noise_scale, cfg.length_scale, cfg.noise_w_scale], dtype=np.float32),
+    }
+    if cfg.num_speakers > 1:
+        args["sid"] = np.array([cfg.default_speaker_id], dtype=np.int64)
+    return voice.session.run(None, args, run_options)[0].squeeze()
+
+
+def phoneme_ids_to_audio_batch(voice, batch_ids, run_options=None) -> list:
+    """
+    One ONNX run for several utterances: rows are padded to the longest input
+    and each row's audio is cut to exactly the samples its own phoneme
+    durations produce (the model's alignment output; padded ids get none).
+    Needs a voice loaded with alignments (runtime_resources.has_alignments).
+    """
+    cfg = voice.config
+    lengths = np.array([len(ids) for ids in batch_ids], dtype=np.int64)
+    padded = np.zeros((len(batch_ids), int(lengths.max())), dtype=np.int64)
+    for row, ids in zip(padded, batch_ids):
+        row[:len(ids)] = ids
+    args = {
+        "input": padded,
+        "input_lengths": lengths,
+        "scales": np.array([cfg.noise_scale, cfg.length_scale, cfg.noise_w_scale], dtype=np.float32),
+    }
+    if cfg.num_speakers > 1:
+        args["sid"] = np.full(len(batch_ids), cfg.default_speaker_id, dtype=np.int64)
+    result = voice.session.run(None, args, run_options)
+    if len(result) < 2:
+        raise ValueError("batched synthesis needs a voice loaded with alignments")
+    audio = result[0].reshape(len(batch_ids), -1)
+    durations = result[1].reshape(len(batch_ids), -1)
+    samples = durations.sum(axis=1).astype(np.int64) * cfg.hop_length
+    return [a[:n] for a, n in zip(audio, samples)]
+
+
+def normalize_audio(audio: np.ndarray) -> np.ndarray:
+    """Peak-normalizes in place to [-1, 1] like Piper's default SynthesisConfig."""
+    audio = np.asarray(audio, dtype=np.float32)
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+    if peak < 1e-8:
+        audio[:] = 0
+        return audio
+    np.multiply(audio, np.float32(1.0 / peak), out=audio)
+    return np.clip(audio, -1.0, 1.0, out=audio)
+
+
+def sentence_ids(voice, text: str, phonemes=None) -> list:
+    """Phoneme IDs per sentence; through the voice's PhonemeCache when given one."""
+    if phonemes is not None:
+        return phonemes.phonemize_ids(text)
+    return [voice.phonemes_to_ids(p) for p in voice.phonemize(text) if p]
+
+
+def iter_sentence_audio(voice, text: str, run_options=None, is_cancelled=None, phonemes=None):
+    """Yields float32 audio per sentence; stops quietly once cancelled."""
+    for ids in sentence_ids(voice, text, phonemes):
+        if is_cancelled and is_cancelled():
+            return
+        try:
+            audio = phoneme_ids_to_audio(voice, ids, run_options)
+        except Exception:
+            if is_cancelled and is_cancelled():
+                return  # ONNX run terminated by the cancel callback
+            raise
+        yield normalize_audio(audio)
@@ -0,0 +1,278 @@
+import asyncio
+import time
+from collections import deque
+from app.core.config import settings
+from app.core.logging_config import logger
+from app.services.cancellation import CancelToken
+from app.services.interrupt_manager import InterruptManager
+from app.services.session_store import MemorySessionStore, create_store
+from app.services.vad_service import VoiceDetector
+
+DEFAULT_SESSION_ID = "default"
+
+
+class StoredHistory:
+    """
+    The session's chat history as a list-like view of the session store.
+    Loaded once per turn (Session.begin_turn) and read from that copy, so a
+    shared store isn't queried on every access; appends update the copy and
+    are written through in the background. Reads before load() see nothing:
+    the store is never read on the event loop.
+    """
+    def __init__(self, session):
+        self.session = session
+        self.items = None  # This turn's copy; None until loaded
+
+    async def load(self):
+        session = self.session
+        items = await session.store_call(session.store.history, session.session_id)
+        self.items = deque(items, maxlen=session.store.history_len)
+
+    def _items(self):
+        return self.items if self.items is not None else ()
+
+    def append(self, item: dict):
+        if self.items is not None:  # Not loaded yet: the next load reads it back
+            self.items.append(item)
+        self.session.store_write(self.session.store.append_history, self.session.session_id, item)
+
+    def clear(self):
+        self.items = deque(maxlen=self.session.store.history_len)
+        self.session.store_write(self.session.store.clear_history, self.session.session_id)
+
+    def __iter__(self):
+        return iter(list(self._items()))
+
+    def __len__(self):
+        return len(self._items())
+
+    def __getitem__(self, index):
+        return list(self._items())[index]
+
+
+class Session:
+    """
+    Everything that belongs to one user's conversation: chat history,
+    barge-in state and the VAD stream state for their microphone.
+    History, language lock and turn state live in the session store (shared
+    between processes when it is); sockets, VAD and the turn token are local.
+    A shared store is only ever called off the event loop (store_call,
+    store_write): its calls can wait on another worker's write lock.
+    """
+    def __init__(self, session_id: str, store=None):
+        self.session_id = session_id
+        self.store = store if store is not None else MemorySessionStore()
+        self.chat_history = StoredHistory(self)
+        self.interrupt_manager = InterruptManager()
+        self.voice_detector = None  # Mic VAD, created when a mic socket first needs it (open_detector)
+        self.vad_immune_until = 0  # Echo immunity for that VAD (time.time()), kept while it doesn't exist
+        self.connections = 0  # Open /ws/audio sockets pin the session
+        self.last_active = time.time()
+        self.turn_id = 0  # Store turn that interrupt_manager.turn belongs to
+        self.writes = None  # Latest background store write; the next one runs after it
+
+    def touch(self):
+        self.last_active = time.time()
+
+    async def open_detector(self) -> VoiceDetector:
+        """
+        The session's VoiceDetector, created on first use by a mic socket:
+        text-only sessions (/api/stream_chat, /api/v1/generate) never need one.
+        Silero is preloaded at startup; its per-session copy is made off the loop.
+        """
+        if self.voice_detector is None:
+            detector = await asyncio.to_thread(VoiceDetector)
+            if self.voice_detector is None:  # Another socket may have opened one meanwhile
+                detector.immunity_until = self.vad_immune_until
+                self.voice_detector = detector
+        return self.voice_detector
+
+    # ---------------- STORE ACCESS ----------------
+    async def store_call(self, fn, *args):
+        """Runs a store call and returns its result: in a thread for a shared store, after the writes queued before it."""
+        if not self.store.shared:
+            return fn(*args)
+        await self.flush()
+        return await asyncio.to_thread(fn, *args)
+
+    def store_write(self, fn, *args):
+        """
+        Runs a store write without making the caller wait: in a thread for a
+        shared store, in order with the writes before it. The in-process store
+        writes at once.
+        """
+        if not self.store.shared:
+            fn(*args)
+            return
+        previous = self.writes
+
+        async def write():
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            await asyncio.to_thread(fn, *args)
+        self.writes = asyncio.ensure_future(write())
+        self.writes.add_done_callback(_report_write)
+
+    async def flush(self):
+        """Waits for the background store writes queued so far."""
+        if self.writes is not None:
+            await asyncio.gather(self.writes, return_exceptions=True)
+
+    # ---------------- LANGUAGE LOCK ----------------
+    async def get_language(self):
+        """Language the last turn locked to (None before the first turn)."""
+        return await self.store_call(self.store.language, self.session_id)
+
+    def set_language(self, language: str):
+        self.store_write(self.store.set_language, self.session_id, language)
+
+    # ---------------- TURNS ----------------
+    async def begin_turn(self):
+        """Starts a new turn here and everywhere: returns (CancelToken, turn id)."""
+        token = self.interrupt_manager.reset_interrupt()  # The previous turn stops here right away
+        self.turn_id = await self.store_call(self.store.start_turn, self.session_id)
+        # The barge-in window reset_interrupt opened, for a mic socket on another worker too
+        self.store_write(self.store.set_immunity, self.session_id, 0.0, self.interrupt_manager.immune_until)
+        await self.chat_history.load()  # This turn reads the history from its own copy
+        return token, self.turn_id
+
+    def start_immunity(self, duration_ms: int):
+        """
+        Echo immunity: VAD ignores the mic for `duration_ms` (the AI is about
+        to speak). Kept in the store, so the gate of a mic socket on another
+        worker honours it as well.
+        """
+        self.vad_immune_until = time.time() + duration_ms / 1000
+        if self.voice_detector is not None:
+            self.voice_detector.immunity_until = self.vad_immune_until
+        self.store_write(self.store.set_immunity, self.session_id, self.vad_immune_until)
+
+    async def immunity(self):
+        """(VAD immune until, barge-in immune until) from the store."""
+        return await self.store_call(self.store.immunity, self.session_id)
+
+    async def turn_token(self):
+        """
+        CancelToken of the session's current turn, for work joining it (TTS
+        requests). With a shared store the turn may have started, or been
+        cancelled, in another process: the local token follows the store.
+        """
+        if not self.store.shared:
+            return self.interrupt_manager.turn
+        current, cancelled = await self.store_call(self.store.turn_state, self.session_id)
+        if current != self.turn_id:
+            self.interrupt_manager.turn.cancel()  # Superseded
+            self.interrupt_manager.turn = CancelToken()
+            self.turn_id = current
+        if cancelled:
+            self.interrupt_manager.turn.cancel()
+        return self.interrupt_manager.turn
+
+    async def join_turn(self):
+        """
+        turn_token() for a request joining the turn (a TTS phrase) plus the
+        watch_turn task that cancels it when the turn is cancelled or
+        superseded from another process: (token, watch or None). The caller
+        cancels the watch once it is done.
+        """
+        token = await self.turn_token()
+        return token, self.watch_turn(token, self.turn_id)
+
+    def cancel_turn(self):
+        """Barge-in / stop: cancels the current turn in whichever process runs it."""
+        self.interrupt_manager.turn.cancel()
+        self.store_write(self.store.cancel_turn, self.session_id)
+
+    def watch_turn(self, token, turn_id: int):
+        """
+        With a shared store, a task that cancels `token` once the turn is
+        cancelled or superseded from another process. None otherwise.
+        """
+        if not self.store.shared:
+            return None
+
+        async def watch():
+            while not token.cancelled:
+                await asyncio.sleep(settings.SESSION_TURN_POLL_S)
+                current, cancelled = await self.store_call(self.store.turn_state, self.session_id)
+                if cancelled or current != turn_id:  # Barge-in, or a newer turn started elsewhere
+                    token.cancel()
+        return asyncio.create_task(watch())
+
+    def reset(self):
+        """Forgets the conversation: history, the current turn and its immunity windows, here and in the store."""
+        self.chat_history.clear()
+        self.cancel_turn()  # A turn running on another worker stops too
+        self.interrupt_manager.turn = CancelToken()
+        self.interrupt_manager.immune_until = 0
+        self.vad_immune_until = 0
+        if self.voice_detector is not None:
+            self.voice_detector.reset()
+            self.voice_detector.immunity_until = 0
+        self.store_write(self.store.clear_immunity, self.session_id)
+
+
+def _report_write(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ Session store write failed: {task.exception()}")
+
+
+class SessionManager:
+    def __init__(self, idle_timeout: float = None, store=None):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.SESSION_IDLE_TIMEOUT
+        self.store = store if store is not None else create_store()
+        self.sessions = {}
+        self.sweeper_task = None
+
+    def get(self, session_id: str = None) -> Session:
+        """Returns the session for this id, creating it on first use."""
+        session_id = session_id or DEFAULT_SESSION_ID
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = Session(session_id, self.store)
+            self.sessions[session_id] = session
+            logger.info(f"🆕 Session created: {session_id} (active={len(self.sessions)})")
+        session.touch()
+        return session
+
+    def evict_idle(self, now: float = None) -> int:
+        """Drops sessions with no open socket that have been idle past the timeout."""
+        now = now if now is not None else time.time()
+        stale = [
+            sid for sid, s in self.sessions.items()
+            if s.connections == 0 and now - s.last_active > self.idle_timeout
+        ]
+        for sid in stale:
+            self.sessions.pop(sid, None)
+            self.store.forget(sid)
+        if stale:
+            logger.info(f"🧹 Evicted {len(stale)} idle session(s) (active={len(self.sessions)})")
+        return len(stale)
+
+    def expire_shared(self, connected, now: float = None) -> int:
+        """
+        Shared state outlives this process's copy: expires it by age, keeping
+        the `connected` sessions. Blocking (store I/O): run it in a thread.
+        """
+        now = now if now is not None else time.time()
+        for sid in connected:
+            self.store.touch(sid)
+        expired = self.store.expire(now - self.idle_timeout)
+        if expired:
+            logger.info(f"🧹 Expired {expired} idle session(s) from the shared store")
+        return expired
+
+    async def sweep_loop(self, interval: float = None):
+        interval = interval or settings.SESSION_SWEEP_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+            if self.store.shared:
+                connected = [sid for sid, s in self.sessions.items() if s.connections]
+                await asyncio.to_thread(self.expire_shared, connected)
+
+    def start(self):
+        if self.sweeper_task is None:
+            self.sweeper_task = asyncio.create_task(self.sweep_loop())
+
+session_manager = SessionManager()
@@ -0,0 +1,248 @@
+"""
+Conversation state that must be visible to every server process.
+
+A browser's WebSocket and its /api/stream_chat calls may land on different
+uvicorn workers, so chat history, the language lock, the current turn
+(id + cancelled) and the echo-immunity deadlines live behind a SessionStore
+instead of in the Session object. Sockets, VAD state and the turn's
+CancelToken stay process-local.
+
+memory  MemorySessionStore  one process (the default)
+sqlite  SQLiteSessionStore  N workers on one box sharing SESSION_STORE_PATH
+
+A turn is superseded when another process starts a newer one, or cancelled
+by a barge-in anywhere; processes running a turn poll turn_state() to notice
+(Session.watch_turn). Immunity windows opened by the process running a turn
+are polled the other way, by the process holding the mic socket
+(SensoryGate.watch_immunity).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from app.core.config import settings
+
+
+class MemorySessionStore:
+    shared = False  # Only this process sees the state
+
+    def __init__(self, history_len: int = None):
+        self.history_len = history_len or settings.SESSION_HISTORY_LEN
+        self.histories = {}
+        self.languages = {}
+        self.turns = {}  # session_id -> [turn_id, cancelled]
+        self.immunities = {}  # session_id -> [vad_until, barge_in_until] (time.time())
+
+    # ---------------- HISTORY ----------------
+    def history(self, session_id: str) -> list:
+        return list(self.histories.get(session_id, ()))
+
+    def append_history(self, session_id: str, item: dict):
+        self.histories.setdefault(session_id, deque(maxlen=self.history_len)).append(item)
+
+    def clear_history(self, session_id: str):
+        self.histories.pop(session_id, None)
+
+    # ---------------- LANGUAGE LOCK ----------------
+    def language(self, session_id: str):
+        return self.languages.get(session_id)
+
+    def set_language(self, session_id: str, language: str):
+        self.languages[session_id] = language
+
+    # ---------------- TURNS ----------------
+    def start_turn(self, session_id: str) -> int:
+        """Supersedes the session's current turn; returns the new turn id."""
+        turn = self.turns.setdefault(session_id, [0, False])
+        turn[0] += 1
+        turn[1] = False
+        return turn[0]
+
+    def cancel_turn(self, session_id: str):
+        turn = self.turns.get(session_id)
+        if turn:
+            turn[1] = True
+
+    def turn_state(self, session_id: str):
+        """(current turn id, cancelled)."""
+        return tuple(self.turns.get(session_id, (0, False)))
+
+    # ---------------- ECHO IMMUNITY ----------------
+    def set_immunity(self, session_id: str, vad_until: float = 0.0, barge_in_until: float = 0.0):
+        """Extends the session's immunity windows (deadlines never move back)."""
+        windows = self.immunities.setdefault(session_id, [0.0, 0.0])
+        windows[0] = max(windows[0], vad_until)
+        windows[1] = max(windows[1], barge_in_until)
+
+    def immunity(self, session_id: str):
+        """(VAD immune until, barge-in immune until), as time.time()."""
+        return tuple(self.immunities.get(session_id, (0.0, 0.0)))
+
+    def clear_immunity(self, session_id: str):
+        """Closes both windows (the session was reset)."""
+        self.immunities.pop(session_id, None)
+
+    # ---------------- LIFETIME ----------------
+    def touch(self, session_id: str):
+        pass
+
+    def forget(self, session_id: str):
+        """The session was evicted from this process: nobody else holds its state."""
+        self.histories.pop(session_id, None)
+        self.languages.pop(session_id, None)
+        self.turns.pop(session_id, None)
+        self.immunities.pop(session_id, None)
+
+    def expire(self, cutoff: float) -> int:
+        return 0  # Follows the process's own sessions (forget)
+
+
+class SQLiteSessionStore:
+    """
+    Shared store in one SQLite file (WAL: readers don't block the writer).
+    Every call is one short local transaction, but a write may wait up to the
+    busy timeout on another worker's: Session calls it from a thread, never
+    on the event loop.
+    """
+    shared = True
+
+    def __init__(self, path: str = None, history_len: int = None):
+        self.path = path or settings.SESSION_STORE_PATH
+        self.history_len = history_len or settings.SESSION_HISTORY_LEN
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, language TEXT, "
+                "turn_id INTEGER NOT NULL DEFAULT 0, turn_cancelled INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL, "
+                "vad_immune_until REAL NOT NULL DEFAULT 0, barge_in_immune_until REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(sessions)")}
+            for column in ("vad_immune_until", "barge_in_immune_until"):
+                if column not in columns:  # A file from before immunity was shared
+                    try:
+                        self.db.execute(f"ALTER TABLE sessions ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+                    except sqlite3.OperationalError:
+                        pass  # Another worker added it first
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "session_id TEXT NOT NULL, item TEXT NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS history_session ON history (session_id, id)")
+
+    def _execute(self, *statements):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = [self.db.execute(sql, args).fetchall() for sql, args in statements]
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _query(self, sql: str, args=()):
+        # Reads take no write lock (WAL), so polling turn_state never stalls writers
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def _touch(self, session_id: str):
+        return ("INSERT INTO sessions (session_id, updated) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET updated = excluded.updated", (session_id, time.time()))
+
+    # ---------------- HISTORY ----------------
+    def history(self, session_id: str) -> list:
+        rows = self._query("SELECT item FROM history WHERE session_id = ? ORDER BY id", (session_id,))
+        return [json.loads(item) for (item,) in rows]
+
+    def append_history(self, session_id: str, item: dict):
+        self._execute(
+            self._touch(session_id),
+            ("INSERT INTO history (session_id, item) VALUES (?, ?)", (session_id, json.dumps(item, ensure_ascii=False))),
+            # Keep the newest history_len, like the in-process deque
+            ("DELETE FROM history WHERE session_id = ? AND id NOT IN "
+             "(SELECT id FROM history WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+             (session_id, session_id, self.history_len)),
+        )
+
+    def clear_history(self, session_id: str):
+        self._execute(("DELETE FROM history WHERE session_id = ?", (session_id,)))
+
+    # ---------------- LANGUAGE LOCK ----------------
+    def language(self, session_id: str):
+        rows = self._query("SELECT language FROM sessions WHERE session_id = ?", (session_id,))
+        return rows[0][0] if rows else None
+
+    def set_language(self, session_id: str, language: str):
+        self._execute(self._touch(session_id),
+                      ("UPDATE sessions SET language = ? WHERE session_id = ?", (language, session_id)))
+
+    # ---------------- TURNS ----------------
+    def start_turn(self, session_id: str) -> int:
+        rows = self._execute(
+            self._touch(session_id),
+            ("UPDATE sessions SET turn_id = turn_id + 1, turn_cancelled = 0 WHERE session_id = ?", (session_id,)),
+            ("SELECT turn_id FROM sessions WHERE session_id = ?", (session_id,)),
+        )
+        return rows[2][0][0]
+
+    def cancel_turn(self, session_id: str):
+        self._execute(("UPDATE sessions SET turn_cancelled = 1 WHERE session_id = ?", (session_id,)))
+
+    def turn_state(self, session_id: str):
+        rows = self._query("SELECT turn_id, turn_cancelled FROM sessions WHERE session_id = ?", (session_id,))
+        return (rows[0][0], bool(rows[0][1])) if rows else (0, False)
+
+    # ---------------- ECHO IMMUNITY ----------------
+    def set_immunity(self, session_id: str, vad_until: float = 0.0, barge_in_until: float = 0.0):
+        self._execute(
+            self._touch(session_id),
+            ("UPDATE sessions SET vad_immune_until = MAX(vad_immune_until, ?), "
+             "barge_in_immune_until = MAX(barge_in_immune_until, ?) WHERE session_id = ?",
+             (vad_until, barge_in_until, session_id)),
+        )
+
+    def immunity(self, session_id: str):
+        rows = self._query("SELECT vad_immune_until, barge_in_immune_until FROM sessions WHERE session_id = ?",
+                           (session_id,))
+        return tuple(rows[0]) if rows else (0.0, 0.0)
+
+    def clear_immunity(self, session_id: str):
+        self._execute(("UPDATE sessions SET vad_immune_until = 0, barge_in_immune_until = 0 WHERE session_id = ?",
+                       (session_id,)))
+
+    # ---------------- LIFETIME ----------------
+    def touch(self, session_id: str):
+        """Keeps a session that is connected here (but quiet) from expiring."""
+        self._execute(self._touch(session_id))
+
+    def forget(self, session_id: str):
+        pass  # Another process may still serve this session; rows expire by age instead
+
+    def expire(self, cutoff: float) -> int:
+        """Drops sessions nobody has written to since `cutoff`. Returns how many."""
+        rows = self._execute(
+            ("SELECT COUNT(*) FROM sessions WHERE updated < ?", (cutoff,)),
+            ("DELETE FROM history WHERE session_id IN (SELECT session_id FROM sessions WHERE updated < ?)", (cutoff,)),
+            ("DELETE FROM sessions WHERE updated < ?", (cutoff,)),
+        )
+        return rows[0][0][0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+STORES = {"memory": MemorySessionStore, "sqlite": SQLiteSessionStore}
+
+
+def create_store(kind: str = None):
+    kind = kind or settings.SESSION_STORE
+    if kind not in STORES:
+        raise ValueError(f"Unknown session store: {kind} (expected one of {', '.join(STORES)})")
+    return STORES[kind]()
@@ -0,0 +1,112 @@
+"""
+Wire encoding for /api/stream_chat.
+
+Default mode is NDJSON: one JSON event per line.
+
+Inline-audio mode is a length-prefixed binary stream, so PCM can travel in the
+same response as the events:
+
+    [1 byte kind][4 byte big-endian payload length][payload]
+
+    kind b"J" -> UTF-8 JSON event (same objects as the NDJSON lines)
+    kind b"A" -> audio for the most recent `audio_text` event: int16 PCM, or
+                 the request's `codec` (one self-contained payload, see audio_codecs)
+
+Duplex WebSocket (/ws/audio, subprotocol "baap.duplex.v1"): one socket per
+session carries everything. Every binary message is [1 byte kind][payload];
+the WebSocket itself already delimits messages.
+
+    client -> server
+    kind b"M" -> mic PCM (int16, 16 kHz), same frames as the legacy socket
+    kind b"J" -> JSON control: text (start a turn), stop, reset, ai_state, lang_update
+
+    server -> client
+    kind b"J" -> JSON event: text, audio_text, commit, interrupt {"seq"}, done
+    kind b"A" -> [4 byte big-endian seq][audio] output audio frame, in the
+                 codec chosen by ?codec= at connect (default int16 PCM); each
+                 frame decodes on its own. seq increases across turns;
+                 "interrupt" tells the client to drop every frame with seq <= its "seq".
+
+Both transports merge consecutive `text` events (TextCoalescer) so a burst of
+LLM tokens costs one write, not one per token. Every other event goes out at
+once. Events are encoded with orjson when it is installed.
+"""
+import json
+from app.core.config import settings
+
+try:
+    import orjson  # Optional fast encoder
+except ImportError:
+    orjson = None
+
+MEDIA_NDJSON = "application/x-ndjson"
+MEDIA_FRAMED = "application/vnd.baap.frames"
+
+FRAME_JSON = b"J"
+FRAME_AUDIO = b"A"
+FRAME_MIC = b"M"
+
+DUPLEX_SUBPROTOCOL = "baap.duplex.v1"
+
+
+def _stdlib_dumps(event: dict) -> bytes:
+    return json.dumps(event).encode("utf-8")
+
+
+if settings.STREAM_JSON_ENCODER == "orjson" and orjson is None:
+    raise ImportError("STREAM_JSON_ENCODER=orjson but orjson is not installed")
+# orjson writes non-ASCII as UTF-8 instead of \u escapes: same JSON, fewer bytes
+dumps = orjson.dumps if orjson and settings.STREAM_JSON_ENCODER != "json" else _stdlib_dumps
+
+
+class TextCoalescer:
+    """
+    Flush policy for `text` events: tokens are merged until `window_s` has
+    passed since the first unsent one or `max_chars` have piled up.
+    A zero window sends every token as it comes.
+    """
+    def __init__(self, window_s: float = None, max_chars: int = None):
+        self.window_s = settings.STREAM_TEXT_FLUSH_MS / 1000 if window_s is None else window_s
+        self.max_chars = settings.STREAM_TEXT_FLUSH_CHARS if max_chars is None else max_chars
+        self.parts = []
+        self.size = 0
+        self.deadline = None
+
+    def add(self, content: str, now: float) -> bool:
+        """Buffers one token; True when the buffer should be flushed now."""
+        if not self.parts:
+            self.deadline = now + self.window_s
+        self.parts.append(content)
+        self.size += len(content)
+        return self.size >= self.max_chars or now >= self.deadline
+
+    def take(self):
+        """The buffered tokens as one `text` event (None when empty)."""
+        if not self.parts:
+            return None
+        event = {"type": "text", "content": "".join(self.parts)}
+        self.parts.clear()
+        self.size = 0
+        return event
+
+
+def frame(kind: bytes, payload: bytes) -> bytes:
+    return kind + len(payload).to_bytes(4, "big") + payload
+
+
+def encode_event(event: dict, framed: bool = False):
+    if framed:
+        return frame(FRAME_JSON, dumps(event))
+    return dumps(event) + b"\n"
+
+
+def encode_audio(pcm: bytes) -> bytes:
+    return frame(FRAME_AUDIO, pcm)
+
+
+def ws_event(event: dict) -> bytes:
+    return FRAME_JSON + dumps(event)
+
+
+def ws_audio(seq: int, pcm) -> bytes:
+    return b"".join((FRAME_AUDIO, seq.to_bytes(4, "big"), pcm))  # One copy, pcm may be a view
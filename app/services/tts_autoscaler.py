@@ -0,0 +1,103 @@
+"""
+Queue-driven worker autoscaling for the TTS voice pools.
+
+Every TTS_AUTOSCALE_INTERVAL the autoscaler looks at each running thread
+pool's backlog (jobs waiting for a worker) and the longest queue wait since
+its last look:
+
+  scale up    jobs are waiting and one waited >= TTS_SCALE_UP_WAIT_MS, or the
+              backlog is at least the worker count
+  scale down  the voice has had no jobs for TTS_SCALE_DOWN_IDLE_S
+
+All voices share one CPU budget (TTS_CPU_BUDGET workers in total). When it is
+spent, a starved voice takes a worker from a voice with nothing queued, so a
+burst of Hindi traffic runs on the workers English isn't using. Pools move
+one worker per tick; the most-starved voice goes first.
+"""
+import asyncio
+import time
+from app.core import runtime_resources
+from app.core.config import settings
+from app.core.logging_config import logger
+
+
+class TTSAutoscaler:
+    def __init__(self):
+        self.pools = {}
+        self.task = None
+        self.last_busy = {}  # lang -> last time the voice had jobs
+
+    @property
+    def budget(self) -> int:
+        # Cores this process may run on (CPU_AFFINITY): the count ORT intra-op threads are sized from
+        budget = settings.TTS_CPU_BUDGET or runtime_resources.available_cpus()
+        reserved = sum(getattr(p, "min_workers", p.workers) for p in self.pools.values())
+        return max(budget, reserved)
+
+    def used(self) -> int:
+        # Voices not loaded (or unloaded by the voice registry) hold no workers
+        return sum(p.workers for p in self.pools.values() if getattr(p, "running", True))
+
+    def _scale(self, lang, pool, workers, reason):
+        before = pool.workers
+        after = pool.scale_to(workers)
+        if after != before:
+            icon = "📈" if after > before else "📉"
+            logger.info(f"{icon} TTS workers [{lang}]: {before} -> {after} ({reason})")
+        return after != before
+
+    def tick(self, now: float = None):
+        now = now if now is not None else time.monotonic()
+        running = {lang: p for lang, p in self.pools.items() if p.scalable and p.running}
+
+        starved = []
+        for lang, pool in running.items():
+            peak_wait = pool.stats.take_peak_wait()
+            waiting = pool.queue.qsize()
+            if pool.stats.queued:
+                self.last_busy[lang] = now
+            if waiting and (peak_wait >= settings.TTS_SCALE_UP_WAIT_MS or waiting >= pool.workers):
+                starved.append((peak_wait, waiting, lang))
+
+        # Most-starved first: they get the free budget, then workers from idle voices
+        for peak_wait, waiting, lang in sorted(starved, reverse=True):
+            pool = running[lang]
+            if pool.workers >= pool.max_workers:
+                continue
+            reason = f"{waiting} waiting, waited {peak_wait:.0f} ms"
+            if self.used() < self.budget:
+                self._scale(lang, pool, pool.workers + 1, reason)
+                continue
+            donors = [
+                (other_lang, other) for other_lang, other in running.items()
+                if other is not pool and other.workers > other.min_workers and not other.stats.queued
+            ]
+            if donors:
+                donor_lang, donor = max(donors, key=lambda d: d[1].workers)
+                self._scale(donor_lang, donor, donor.workers - 1, f"idle, lent to {lang}")
+                self._scale(lang, pool, pool.workers + 1, reason)
+
+        for lang, pool in running.items():
+            idle_s = now - self.last_busy.setdefault(lang, now)
+            if pool.workers > pool.min_workers and idle_s >= settings.TTS_SCALE_DOWN_IDLE_S:
+                self._scale(lang, pool, pool.workers - 1, f"idle {idle_s:.0f}s")
+                self.last_busy[lang] = now  # One worker per idle period
+
+    async def run_loop(self):
+        while True:
+            await asyncio.sleep(settings.TTS_AUTOSCALE_INTERVAL)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"❌ TTS autoscaler error: {e}")
+
+    def start(self, pools: dict):
+        self.pools = pools
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run_loop())
+
+    def snapshot(self) -> dict:
+        return {"budget": self.budget, "used": self.used()}
+
+
+autoscaler = TTSAutoscaler()
@@ -1,25 +1,474 @@
+import asyncio
+import os
+import random
+import time
+from collections import Counter, deque
+from app.core import runtime_resources
 from app.services.tts_pool import TTSWorkerPool
+from app.services.tts_process_pool import ProcessTTSPool
+from app.services.tts_autoscaler import autoscaler
 from app.core.config import settings
 from app.core.logging_config import logger
+from app.services.audio_cache import audio_cache, CANNED_PHRASES, FILLER_PHRASES
+from app.services.script_normalizer import ScriptNormalizer
 
 tts_pools = {}
+voice_states = {}
+voice_events = deque(maxlen=50)  # Recent loads / evictions, newest last
+pool_holds = Counter()  # Pool -> phrases being served from it (see hold_voice)
+_loading = set()  # Voices loading right now (their RSS deltas overlap)
+
+# Short phrase per language for the warm-up synthesis
+WARMUP_TEXT = {lang: phrases[0] for lang, phrases in CANNED_PHRASES.items()}
+
+
+class VoiceState:
+    """
+    Load lifecycle of one voice: cold -> loading -> warming -> ready (or failed).
+    An evicted voice goes ready -> unloading -> cold and loads again on its next use.
+    """
+    def __init__(self, lang: str, lazy: bool, pinned: bool = False):
+        self.lang = lang
+        self.lazy = lazy  # Loaded on first use; doesn't gate readiness
+        self.pinned = pinned or not lazy  # Never evicted
+        self.last_used = 0.0  # monotonic; LRU order for eviction
+        self.rss_bytes = None  # Resident memory while loaded
+        self.rss_measured = False  # False: estimated from the model size
+        self.in_use = 0  # Live turns / requests speaking this voice: never evicted meanwhile
+        self.unloading = None  # The unload task while state is "unloading"
+        self.loads = 0
+        self.evictions = 0
+        self.generation = 0  # Hot swaps so far
+        self.swap = None  # Progress of the latest hot swap (see swap_voice)
+        self.state = "cold"
+        self.task = None
+        self.load_ms = None
+        self.warmup_ms = None
+        self.first_request_wait_ms = None  # How long the first request waited for the voice
+        self.error = None
+
+    def snapshot(self) -> dict:
+        pool = tts_pools.get(self.lang)
+        return {
+            "state": self.state,
+            "model": os.path.basename(pool.model_path) if pool else None,
+            "lazy": self.lazy,
+            "pinned": self.pinned,
+            "in_use": self.in_use,
+            "rss_mb": round(self.rss_bytes / 1e6, 1) if self.rss_bytes else None,
+            "rss_measured": self.rss_measured,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "generation": self.generation,
+            "swap": dict(self.swap) if self.swap else None,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "first_request_wait_ms": self.first_request_wait_ms,
+            "first_synth_ms": pool.stats.first_synth_ms if pool else None,
+            "error": self.error,
+        }
+
+
+def _voice_list(spec: str) -> set:
+    return {lang.strip() for lang in spec.split(",") if lang.strip()}
+
+
+def _lazy_voices() -> set:
+    # Extra speakers / styles only load when asked for
+    return _voice_list(settings.TTS_LAZY_VOICES) | set(settings.PIPER_EXTRA_VOICES)
+
+
+def voice_lang(voice: str) -> str:
+    """Language of a voice key: "hi-female" -> "hi"."""
+    return voice.split("-", 1)[0]
+
 
 async def init_tts_pools():
-    for lang, model_path in settings.PIPER_MODELS.items():
-        # Deriving config path from model path (english.onnx -> english.onnx.json)
-        config_path = f"{model_path}.json"
-        
-        # 🔥 Marathi model is slower, use more workers for better parallelization
-        num_workers = 3 if lang == 'mr' else 2
-        
-        pool = TTSWorkerPool(
+    """
+    Registers every configured voice and starts loading the eager ones, all
+    at once and in the background: startup doesn't wait, and a request for a
+    voice that is still loading waits only for that voice (ensure_voice).
+    """
+    lazy, pinned = _lazy_voices(), _voice_list(settings.TTS_PINNED_VOICES)
+    for lang in settings.PIPER_MODELS:
+        # Full precision or its INT8 variant (PIPER_QUANTIZED)
+        tts_pools[lang] = _new_pool(lang, settings.voice_model(lang))
+        voice_states[lang] = VoiceState(lang, lazy=lang in lazy, pinned=lang in pinned)
+
+    for lang, state in voice_states.items():
+        if not state.lazy:
+            _start_loading(lang)
+    autoscaler.start(tts_pools)
+
+
+def _new_pool(lang: str, model_path: str, workers: int = None):
+    # Deriving config path from model path (english.onnx -> english.onnx.json)
+    config_path = f"{model_path}.json"
+
+    if settings.TTS_BACKEND == "process":
+        # 🔥 Fixed-size process pools: Marathi model is slower, use more workers
+        return ProcessTTSPool(
             model_path=model_path,
             config_path=config_path,
-            workers=num_workers
+            workers=3 if voice_lang(lang) == 'mr' else 2
         )
+    # Thread pools start small and follow their queue (tts_autoscaler)
+    return TTSWorkerPool(
+        model_path=model_path,
+        config_path=config_path,
+        workers=workers or settings.TTS_MIN_WORKERS,
+        min_workers=settings.TTS_MIN_WORKERS,
+        max_workers=settings.TTS_MAX_WORKERS
+    )
+
+
+def _start_loading(lang: str):
+    state = voice_states[lang]
+    if state.task is None:
+        state.task = asyncio.create_task(_load_voice(lang))
+    return state.task
+
+
+async def _load_voice(lang: str):
+    pool, state = tts_pools[lang], voice_states[lang]
+    text_lang = voice_lang(lang)
+    try:
+        await _make_room(lang, _estimated_rss(lang))
+        state.state = "loading"
+        for other in _loading:
+            voice_states[other].rss_measured = False
+        state.rss_measured = not _loading and settings.TTS_BACKEND != "process"
+        _loading.add(lang)
+        rss_before = runtime_resources.process_rss()
+        t0 = time.perf_counter()
+        await pool.start()
+        state.load_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+        state.state = "warming"
+        t0 = time.perf_counter()
+        await pool.warm_up(ScriptNormalizer.validate_output(WARMUP_TEXT.get(text_lang, "Hello."), text_lang))
+        state.warmup_ms = round((time.perf_counter() - t0) * 1000, 1)
+    except Exception as e:
+        state.state, state.error = "failed", str(e)
+        logger.error(f"❌ TTS Pool Failed: {lang}: {e}")
+        return None
+    finally:
+        _loading.discard(lang)
+
+    # Measured when this load ran alone in-process; otherwise (overlapping loads, worker processes) estimated
+    rss = runtime_resources.process_rss() - rss_before
+    if not (state.rss_measured and rss > 0):
+        state.rss_measured, rss = False, _estimated_rss(lang)
+    state.rss_bytes = rss
+    state.state = "ready"
+    state.loads += 1
+    _record_event(lang, "load", rss_mb=round(rss / 1e6, 1), load_ms=state.load_ms)
+    logger.info(f"✅ TTS Pool Ready: {lang} (cold start {state.load_ms} ms + warm-up {state.warmup_ms} ms)")
+    await _make_room(lang, 0)  # The measured size may be more than the estimate
+
+    phrases = _prewarm_phrases(text_lang)
+    if phrases:
+        asyncio.create_task(pool.prewarm_cache(phrases))
+    return pool
+
+
+def _prewarm_phrases(lang: str):
+    phrases = CANNED_PHRASES.get(lang, []) if settings.TTS_CACHE_PREWARM else []
+    if settings.TTS_FILLER:
+        phrases = phrases + FILLER_PHRASES.get(lang, [])
+    return _validated(phrases, lang)
+
+
+# ---------------- MEMORY BUDGET ----------------
+def _estimated_rss(lang: str) -> int:
+    """A loaded voice is mostly its weights: model size, once per worker process."""
+    try:
+        size = os.path.getsize(tts_pools[lang].model_path)
+    except OSError:
+        size = 0
+    return size * (tts_pools[lang].workers if settings.TTS_BACKEND == "process" else 1)
+
+
+def _resident_bytes() -> int:
+    return sum(
+        s.rss_bytes if s.rss_bytes is not None else _estimated_rss(lang)
+        for lang, s in voice_states.items() if s.state in ("loading", "warming", "ready", "unloading")
+    )
+
+
+def _record_event(lang: str, event: str, **info):
+    voice_events.append({"time": round(time.time(), 3), "voice": lang, "event": event, **info})
+
+
+async def _make_room(lang: str, needed: int):
+    """
+    Unloads least recently used voices until `needed` more bytes fit the budget.
+    Pinned voices, voices in use (a live turn, even between its phrases, or
+    queued / running jobs) and `lang` itself are kept; if that isn't enough
+    the load goes ahead over budget.
+    """
+    budget = settings.TTS_VOICE_MEMORY_MB * 1e6
+    if budget <= 0:
+        return
+    while _resident_bytes() + needed > budget:
+        idle = [
+            s for other, s in voice_states.items()
+            if other != lang and s.state == "ready" and not s.pinned and not s.in_use
+            and not tts_pools[other].stats.queued
+        ]
+        if not idle:
+            if needed:
+                logger.warning(f"⚠️ Voice memory over budget ({_resident_bytes() / 1e6:.0f} MB + {needed / 1e6:.0f} MB "
+                               f"> {budget / 1e6:.0f} MB): nothing left to evict")
+            return
+        await evict_voice(min(idle, key=lambda s: s.last_used).lang, reason=f"budget, making room for {lang}")
+
+
+async def evict_voice(lang: str, reason: str = "manual"):
+    """
+    Unloads a loaded voice; its next request loads it again. The voice is
+    "unloading" until the pool has stopped: ensure_voice waits for that
+    instead of starting the same pool again underneath the unload.
+    """
+    state = voice_states[lang]
+    if state.state != "ready":
+        return
+    state.state = "unloading"
+    state.unloading = asyncio.create_task(_unload_voice(lang, reason))
+    await asyncio.shield(state.unloading)
+
+
+async def _unload_voice(lang: str, reason: str):
+    state, pool = voice_states[lang], tts_pools[lang]
+    rss = state.rss_bytes or 0
+    try:
+        await pool.unload()
+    finally:
+        state.state, state.task, state.unloading, state.rss_bytes = "cold", None, None, None
+    state.evictions += 1
+    _record_event(lang, "evict", rss_mb=round(rss / 1e6, 1), reason=reason)
+    logger.info(f"🧹 TTS voice unloaded: {lang} ({rss / 1e6:.1f} MB, {reason})")
+
+
+def hold_voice(lang: str, pool=None):
+    """
+    Marks `lang` in use (a live turn speaks it, a phrase is being served)
+    until the returned release() is called: the registry doesn't evict it
+    meanwhile, even while the turn is between phrases. With `pool` (what
+    ensure_voice returned) that pool is held too: a hot swap drains it
+    before shutting it down.
+    """
+    state = voice_states.get(lang)
+    if state is None:
+        return lambda: None
+    state.in_use += 1
+    if pool is not None:
+        pool_holds[pool] += 1
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            state.in_use -= 1
+            if pool is not None:
+                pool_holds[pool] -= 1
+                if not pool_holds[pool]:
+                    del pool_holds[pool]
+    return release
+
+
+def _validated(phrases, lang: str):
+    # Cache keys are the validated text the pipeline actually sends to TTS
+    return [v for v in (ScriptNormalizer.validate_output(p, lang) for p in phrases) if v]
+
+
+# ---------------- HOT SWAP ----------------
+def _resolve_model(lang: str, model_path: str = None) -> str:
+    """The model a swap loads: `model_path` (relative to MODELS_DIR, and inside it) or the configured one."""
+    if not model_path:
+        return settings.voice_model(lang)
+    path = model_path if os.path.isabs(model_path) else os.path.join(settings.MODELS_DIR, model_path)
+    root = os.path.realpath(settings.MODELS_DIR)
+    if os.path.commonpath([os.path.realpath(path), root]) != root:
+        raise ValueError("Voice models must be inside the models directory")
+    if not (os.path.isfile(path) and os.path.isfile(f"{path}.json")):
+        raise ValueError(f"Model or config not found: {model_path}")
+    return path
+
+
+def swap_voice(lang: str, model_path: str = None) -> dict:
+    """
+    Starts replacing `lang`'s voice with `model_path` (default: its configured
+    model, e.g. updated on disk) without dropping live sessions. A loaded voice
+    gets the new pool loaded, warmed and pre-warmed alongside it, then new jobs
+    switch over in one step while the old pool drains and shuts down. A voice
+    that isn't loaded just points at the new model. Returns the swap status;
+    raises KeyError (unknown voice), ValueError (bad model) or RuntimeError
+    (the voice is loading or already swapping).
+    """
+    state = voice_states[lang]
+    path = _resolve_model(lang, model_path)
+    if state.state in ("loading", "warming", "unloading") or (state.swap and state.swap["state"] in ("loading", "draining")):
+        raise RuntimeError(f"Voice {lang} is busy: {state.swap['state'] if state.swap else state.state}")
+
+    state.generation += 1
+    state.swap = {"state": "loading", "model": os.path.basename(path), "generation": state.generation,
+                  "started": round(time.time(), 3), "load_ms": None, "drain_ms": None, "error": None}
+    if state.state != "ready":
+        tts_pools[lang] = _new_pool(lang, path)
+        state.state, state.task, state.error = "cold", None, None
+        state.swap["state"] = "done"
+        if not state.lazy:
+            _start_loading(lang)
+    else:
+        asyncio.create_task(_swap_loaded_voice(lang, path))
+    _record_event(lang, "swap", model=state.swap["model"], generation=state.generation)
+    return dict(state.swap)
+
+
+async def _swap_loaded_voice(lang: str, model_path: str):
+    state, old = voice_states[lang], tts_pools[lang]
+    swap = state.swap
+    # Same worker count and the old estimates, so capacity and phrase sizing carry straight over
+    pool = _new_pool(lang, model_path, workers=old.workers)
+    pool.stats.seed_from(old.stats)
+    release = hold_voice(lang)  # Not evicted while swapping: the new pool would land on a cold voice
+    try:
+        await _swap_pools(lang, old, pool, swap)
+    finally:
+        release()
+
+
+async def _swap_pools(lang: str, old, pool, swap):
+    state, text_lang = voice_states[lang], voice_lang(lang)
+    try:
+        await _make_room(lang, _estimated_rss(lang))
+        rss_before = runtime_resources.process_rss()
+        t0 = time.perf_counter()
         await pool.start()
-        tts_pools[lang] = pool
-        logger.info(f"✅ TTS Pool Ready: {lang}")
+        await pool.warm_up(ScriptNormalizer.validate_output(WARMUP_TEXT.get(text_lang, "Hello."), text_lang))
+        phrases = _prewarm_phrases(text_lang)
+        if phrases:
+            await pool.prewarm_cache(phrases)  # Canned replies and fillers stay cache hits across the switch
+        swap["load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    except Exception as e:
+        swap["state"], swap["error"] = "failed", str(e)
+        logger.error(f"❌ Voice swap failed, keeping the current {lang} voice: {e}")
+        if pool.running:
+            await pool.unload()
+        return
+    if state.state != "ready" or tts_pools[lang] is not old:
+        # Unloaded or replaced meanwhile: installing a running pool there would start it twice
+        swap["state"], swap["error"] = "failed", f"voice left the ready state ({state.state})"
+        logger.error(f"❌ Voice swap abandoned: {lang} is {state.state} now")
+        await pool.unload()
+        return
+
+    # The switch: phrases looked up from here on go to the new pool; the old one keeps what it has
+    rss = runtime_resources.process_rss() - rss_before
+    tts_pools[lang] = pool
+    state.rss_bytes = rss if (settings.TTS_BACKEND != "process" and rss > 0) else _estimated_rss(lang)
+    swap["state"] = "draining"
+    logger.info(f"🔁 TTS voice swapped: {lang} -> {swap['model']} (loaded in {swap['load_ms']} ms), draining the old pool")
+
+    t0 = time.perf_counter()
+    deadline = t0 + settings.TTS_SWAP_DRAIN_S
+    # Phrases still held on the old pool (looked up, not queued yet) count as well as queued jobs
+    while (old.stats.queued or pool_holds[old]) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    await old.unload()  # Workers finish anything still queued before they stop
+    swap["drain_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    swap["state"] = "done"
+    _record_event(lang, "swap_done", model=swap["model"], drain_ms=swap["drain_ms"])
+    logger.info(f"✅ Old {lang} voice drained and shut down ({swap['drain_ms']} ms)")
+
+
+async def shutdown_tts_pools():
+    """Stops every loaded voice's workers (server shutdown)."""
+    for pool in tts_pools.values():
+        if pool.running:
+            await pool.shutdown()
+
+
+async def ensure_voice(lang: str):
+    """
+    The pool for `lang`, loaded and warm: waits for a voice still loading and
+    starts a lazy one. None if the voice isn't configured or failed to load.
+    """
+    state = voice_states.get(lang)
+    if state is None:
+        return None
+    state.last_used = time.monotonic()
+    if state.state == "unloading":
+        await asyncio.shield(state.unloading)  # Evicted just now: load it again once it has stopped
+    if state.state == "ready":
+        pool = tts_pools[lang]
+    else:
+        t0 = time.perf_counter()
+        # Shielded: a request that gives up must not abort the load for everyone else
+        pool = await asyncio.shield(_start_loading(lang))
+        if state.first_request_wait_ms is None and pool is not None:
+            state.first_request_wait_ms = round((time.perf_counter() - t0) * 1000, 1)
+            logger.info(f"🥶 First {lang} request waited {state.first_request_wait_ms} ms for the voice")
+    if state.first_request_wait_ms is None:
+        state.first_request_wait_ms = 0.0
+    return pool
+
+
+async def filler_audio(lang: str):
+    """
+    A pre-synthesized acknowledgement for `lang` as (text, pcm), or None.
+    Served from the audio cache only (disk reads off the loop): never
+    synthesizes on the hot path.
+    """
+    pool, state = tts_pools.get(lang), voice_states.get(lang)
+    if pool is None or state is None or state.state != "ready":
+        return None
+    ready = [t for t in _validated(FILLER_PHRASES.get(lang, []), lang) if await audio_cache.acontains(pool.voice_id, t)]
+    if not ready:
+        return None
+    text = random.choice(ready)
+    pcm = await audio_cache.alookup(pool.voice_id, text)
+    return (text, pcm) if pcm else None
+
 
 def get_pool(lang: str):
+    """The registered pool (possibly not loaded yet: use ensure_voice before synthesizing)."""
     return tts_pools.get(lang)
+
+
+def voices_ready() -> bool:
+    """Every eagerly loaded voice is warm (lazy voices don't count)."""
+    return all(s.state == "ready" for s in voice_states.values() if not s.lazy)
+
+
+def voice_status():
+    return {lang: state.snapshot() for lang, state in voice_states.items()}
+
+
+def pool_stats():
+    """Live RTF, workers, queue depth / wait histograms, chosen phrase sizes and phoneme cache per language."""
+    stats = {}
+    for lang, pool in tts_pools.items():
+        stats[lang] = pool.stats.snapshot()
+        phonemes = getattr(pool, "phonemes", None)  # Process workers keep theirs in-process
+        if phonemes is not None:
+            stats[lang]["phoneme_cache"] = phonemes.snapshot()
+    return stats
+
+
+def registry_stats():
+    """Voice memory budget, what the loaded voices use, pinned voices and recent load/evict events."""
+    return {
+        "budget_mb": settings.TTS_VOICE_MEMORY_MB or None,
+        "resident_mb": round(_resident_bytes() / 1e6, 1),
+        "loaded": [lang for lang, s in voice_states.items() if s.state == "ready"],
+        "pinned": [lang for lang, s in voice_states.items() if s.pinned],
+        "events": list(voice_events),
+    }
+
+
+def worker_budget():
+    """Workers in use across all voices vs the shared CPU budget."""
+    return autoscaler.snapshot()
@@ -1,98 +1,459 @@
 import asyncio
-import numpy as np
-from piper import PiperVoice
-from app.services.interrupt_manager import interrupt_manager
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.runtime_resources import has_alignments, load_voice
 from app.core.logging_config import logger
+from app.services.cancellation import CancelToken
+from app.services.audio_cache import audio_cache, voice_namespace
+from app.services.pcm_buffer import PCMBuffer
+from app.services.piper_synth import (
+    abortable_batch_run_options, abortable_run_options, iter_sentence_audio, normalize_audio,
+    phoneme_ids_to_audio_batch, sentence_ids,
+)
+from app.services.phoneme_cache import PhonemeCache
+from app.services.tts_scheduler import (
+    FairJobQueue, PlaybackClock, ScheduledJob, PRIORITY_BACKGROUND, PRIORITY_FIRST, PRIORITY_NEXT,
+)
+from app.services.tts_stats import VoiceStats, read_sample_rate
+
+
+class _SynthJob(ScheduledJob):
+    """One whole-phrase synthesis (submit); the result goes to `future`."""
+    def __init__(self, text, future, **schedule):
+        super().__init__(**schedule)
+        self.text = text
+        self.future = future
+
+    @property
+    def stale(self) -> bool:
+        # Turn cancelled, or the caller gave up, while queued
+        return self.future.done() or super().stale
+
+    def drop(self):
+        if self.token and self.token.cancelled:
+            self.token.record_abort("tts")
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class _StreamJob(ScheduledJob):
+    """
+    One streamed synthesis (/api/v1/generate). Workers step its sentence
+    generator and hand each chunk to the request through `chunks`. When the
+    client falls TTS_STREAM_BUFFER sentences behind, the job parks and the
+    worker moves on; the request re-queues it as it drains.
+    """
+    def __init__(self, pcm_iter, **schedule):
+        super().__init__(**schedule)
+        self.pcm_iter = pcm_iter
+        self.capacity = max(1, settings.TTS_STREAM_BUFFER)
+        self.chunks = asyncio.Queue(maxsize=self.capacity + 1)  # + end sentinel
+        self.parked = False
+        self.complete = False
+        self.ended = False
+
+    def end(self):
+        """No more chunks: releases the sentence generator (its ONNX run options) and wakes the request."""
+        if not self.ended:
+            self.ended = True
+            self.pcm_iter.close()
+            self.chunks.put_nowait(None)
+
+    def drop(self):
+        self.end()
+
 
 class TTSWorkerPool:
-    def __init__(self, model_path, config_path, workers=2):
+    scalable = True  # Worker count can change at runtime (see tts_autoscaler)
+
+    def __init__(self, model_path, config_path, workers=2, min_workers=None, max_workers=None):
         self.model_path = model_path
         self.config_path = config_path
         self.workers = workers
+        self.min_workers = min(workers, min_workers or workers)
+        self.max_workers = max(workers, max_workers or workers)
+        self.voice_id = voice_namespace(model_path)  # Audio cache namespace: changes with the model file
+        self.stats = VoiceStats(workers, read_sample_rate(config_path), os.path.basename(model_path))
 
-        self.queue = asyncio.Queue()
+        # Priority / deadline / per-session round-robin instead of FIFO (tts_scheduler)
+        self.queue = FairJobQueue()
+        self.clocks = weakref.WeakKeyDictionary()  # Turn token -> PlaybackClock
         self.voice = None
+        self.phonemes = None  # PhonemeCache for the loaded voice
         self.worker_tasks = []
+        self.parked = set()  # Stream jobs waiting for their client to catch up (in no queue)
+        self.executor = None
+        self.next_wid = 0
+        self.batch_max = max(1, settings.TTS_BATCH_MAX)
 
     async def start(self):
         logger.info(f"🔊 Loading Piper model: {self.model_path}")
-        self.voice = PiperVoice.load(self.model_path, self.config_path)
+        # Off the loop: ONNX session setup takes seconds, and other voices load meanwhile
+        self.voice = await asyncio.to_thread(load_voice, self.model_path, self.config_path, self.batch_max > 1)
+        if self.batch_max > 1 and not has_alignments(self.voice):
+            # Without per-row durations a padded row's length is unknown: no batching
+            logger.warning(f"⚠️ {self.stats.name}: no alignment output, batched inference off")
+            self.batch_max = 1
+        self.phonemes = PhonemeCache(self.voice)
+        # Synthesis gets its own threads: never the loop's default executor or
+        # Starlette's request threadpool. Sized for the most workers the pool
+        # may scale to; threads are only created as workers use them.
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"piper-{self.stats.name}")
+
+        for _ in range(self.workers):
+            self._add_worker()
+
+    @property
+    def running(self) -> bool:
+        return self.executor is not None
+
+    def _add_worker(self):
+        self.worker_tasks = [t for t in self.worker_tasks if not t.done()]
+        self.worker_tasks.append(asyncio.create_task(self.worker_loop(self.next_wid)))
+        self.next_wid += 1
+
+    def scale_to(self, workers: int) -> int:
+        """
+        Grows or shrinks the worker count within [min_workers, max_workers].
+        A retired worker finishes its current job first (it takes the next
+        stop sentinel from the queue). Returns the new count.
+        """
+        workers = max(self.min_workers, min(self.max_workers, workers))
+        while self.workers < workers:
+            self._add_worker()
+            self.workers += 1
+        while self.workers > workers:
+            self.queue.put_nowait(None)
+            self.workers -= 1
+        self.stats.set_workers(self.workers)
+        return self.workers
 
-        for i in range(self.workers):
-            task = asyncio.create_task(self.worker_loop(i))
-            self.worker_tasks.append(task)
+    async def warm_up(self, text: str):
+        """One throwaway synthesis so the first request doesn't pay ONNX warm-up (kept out of stats)."""
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._warm_up_sync, text)
+
+    def _warm_up_sync(self, text: str):
+        for _ in iter_sentence_audio(self.voice, text, phonemes=self.phonemes):
+            pass
 
     async def worker_loop(self, wid):
+        loop = asyncio.get_running_loop()
         while True:
             job = await self.queue.get()
             if job is None:
                 break
+            if job.stale:
+                # Turn cancelled (or caller gone) while queued: never start the synthesis
+                job.drop()
+                continue
+            self.stats.record_wait(time.perf_counter() - job.enqueued)
+            if isinstance(job, _StreamJob):
+                await self._step_stream(wid, job)
+                continue
 
-            text, future = job
+            batch, extra = await self._gather_batch(job)
             try:
-                # Run blocking synthesis in a thread
-                audio_bytes = await asyncio.to_thread(self.synthesize_raw_sync, text)
-                future.set_result(audio_bytes)
+                if len(batch) == 1:
+                    # Run blocking synthesis in a thread
+                    audio_bytes = await loop.run_in_executor(self.executor, self.synthesize_raw_sync, job.text, job.token)
+                    if not job.future.done():
+                        job.future.set_result(audio_bytes)
+                else:
+                    await loop.run_in_executor(self.executor, self.synthesize_batch_sync, batch, self._deliver(loop))
             except Exception as e:
                 logger.error(f"❌ TTS Worker {wid} error: {e}")
-                future.set_result(None)
+            finally:
+                for j in batch:
+                    if not j.future.done():
+                        j.future.set_result(None)
+
+            # Something that couldn't join the batch: a streamed job or a stop sentinel
+            if extra is None:
+                break
+            if isinstance(extra, _StreamJob):
+                await self._step_stream(wid, extra)
+
+    async def _gather_batch(self, first):
+        """
+        `first` plus up to TTS_BATCH_MAX - 1 more queued phrases for one batched
+        synthesis. Under load (more jobs than workers) it waits TTS_BATCH_WINDOW_MS
+        once for more to arrive; otherwise it takes only what is already queued.
+        Only jobs at `first`'s level or more urgent join, and background work
+        never shares a run with live turns: a row waits for the batch's longest.
+        Returns (batch, extra): `extra` is a job that can't be batched, else False.
+        """
+        batch, extra = [first], False
+        head = self.queue.level(first)
+        levels = (PRIORITY_BACKGROUND,) if head == PRIORITY_BACKGROUND else tuple(range(head + 1))
+        waited = False
+        while len(batch) < self.batch_max:
+            try:
+                job = self.queue.get_nowait(levels)
+            except asyncio.QueueEmpty:
+                if waited or settings.TTS_BATCH_WINDOW_MS <= 0 or self.stats.queued <= self.workers:
+                    break
+                waited = True
+                await asyncio.sleep(settings.TTS_BATCH_WINDOW_MS / 1000)
+                continue
+            if job is None or isinstance(job, _StreamJob):
+                extra = job
+                break
+            self.stats.record_wait(time.perf_counter() - job.enqueued)
+            batch.append(job)
+        return batch, extra
+
+    @staticmethod
+    def _deliver(loop):
+        """Hands one phrase's batch result to its caller from the synthesis thread."""
+        def deliver(job, pcm):
+            loop.call_soon_threadsafe(lambda: job.future.done() or job.future.set_result(pcm))
+        return deliver
+
+    async def _step_stream(self, wid, job: _StreamJob):
+        """Synthesizes sentences of `job` until it ends or its client is too far behind."""
+        loop = asyncio.get_running_loop()
+        try:
+            while not job.token.cancelled:
+                if job.chunks.qsize() >= job.capacity:
+                    job.parked = True  # Re-queued by the request once it takes a chunk
+                    self.parked.add(job)
+                    return
+                pcm = await loop.run_in_executor(self.executor, next, job.pcm_iter, None)
+                if pcm is None:
+                    job.complete = True
+                    break
+                job.chunks.put_nowait(pcm)
+        except Exception as e:
+            logger.error(f"❌ TTS Worker {wid} stream error: {e}")
+        # Ended (done, cancelled or failed): release the ONNX run options
+        job.end()
 
-    def synthesize_raw_sync(self, text: str):
+    def synthesize_raw_sync(self, text: str, token=None):
         """
         Stage P7: Piper ONNX Synthesis Loop
         Synchronous wrapper to get all raw bytes.
+        `token` is the requesting turn's CancelToken (if any); cancelling it
+        terminates the ONNX run in flight, not just the next sentence.
         """
         if not self.voice:
             return b""
-        
-        all_bytes = b""
+
+        pcm = PCMBuffer()
         try:
-            for chunk in self.voice.synthesize(text):
-                # Constraints Stage P7: IF interrupt_signal == TRUE: break
-                if interrupt_manager.cancel_current_tts:
-                    break
-                    
-                if hasattr(chunk, 'audio_int16_bytes') and chunk.audio_int16_bytes:
-                    all_bytes += chunk.audio_int16_bytes
-                elif hasattr(chunk, 'audio'):
-                    if chunk.audio.dtype != np.int16:
-                        audio_int16 = (chunk.audio * 32767).astype(np.int16)
-                        all_bytes += audio_int16.tobytes()
-                    else:
-                        all_bytes += chunk.audio.tobytes()
+            for audio in self._iter_audio(text, token):
+                pcm.append_float(audio)
         except Exception as e:
             logger.error(f"❌ Synthesis logic error: {e}")
-        return all_bytes
+        return pcm.tobytes()
 
-    def get_raw_generator(self, text: str):
+    def synthesize_batch_sync(self, jobs, deliver):
         """
-        Returns a generator yielding raw PCM chunks.
-        Used for the /api/v1/generate endpoint.
+        Synthesizes several phrases with batched ONNX runs: round k runs the k-th
+        sentence of every phrase that has one, so a short phrase is delivered
+        (`deliver(job, pcm)`) as soon as its last sentence is done. A round is
+        terminated once every phrase in it is cancelled; a cancelled phrase
+        drops out of the next round. Synthesis time is shared among the rows.
         """
-        if not self.voice:
-            return
-            
+        sentences = [
+            sentence_ids(self.voice, job.text, self.phonemes) for job in jobs
+        ]
+        pcm = [PCMBuffer() for _ in jobs]
+        synth_s = [0.0] * len(jobs)
+        delivered = set()
+
+        def cancelled(i):
+            return bool(jobs[i].token and jobs[i].token.cancelled)
+
         try:
-            for chunk in self.voice.synthesize(text):
-                if interrupt_manager.cancel_current_tts:
+            for k in range(max(len(s) for s in sentences)):
+                rows = [i for i, s in enumerate(sentences) if k < len(s) and not cancelled(i)]
+                if not rows:
                     break
-                if hasattr(chunk, 'audio_int16_bytes') and chunk.audio_int16_bytes:
-                    yield chunk.audio_int16_bytes
-                elif hasattr(chunk, 'audio'):
-                    if chunk.audio.dtype != np.int16:
-                        audio_int16 = (chunk.audio * 32767).astype(np.int16)
-                        yield audio_int16.tobytes()
-                    else:
-                        yield chunk.audio.tobytes()
+                run_options, remove = abortable_batch_run_options([jobs[i].token for i in rows])
+                t0 = time.perf_counter()
+                try:
+                    audios = phoneme_ids_to_audio_batch(self.voice, [sentences[i][k] for i in rows], run_options)
+                except Exception:
+                    if all(cancelled(i) for i in rows):
+                        continue  # Terminated by the cancel callback
+                    raise
+                finally:
+                    remove()
+                share = (time.perf_counter() - t0) / len(rows)
+                for i, audio in zip(rows, audios):
+                    synth_s[i] += share
+                    pcm[i].append_float(normalize_audio(audio))
+                    if k == len(sentences[i]) - 1:
+                        self.stats.record(len(jobs[i].text), synth_s[i], len(pcm[i]))
+                        deliver(jobs[i], pcm[i].tobytes())
+                        delivered.add(i)
         except Exception as e:
-            print(f"❌ Raw Synthesis error: {e}")
+            logger.error(f"❌ Batched synthesis error: {e}")
+        for i, job in enumerate(jobs):
+            if i in delivered:
+                continue
+            if cancelled(i):
+                job.token.record_abort("tts")
+                deliver(job, None)
+            elif not sentences[i]:
+                deliver(job, b"")
+
+    def _iter_audio(self, text: str, token=None):
+        # Constraints Stage P7: IF interrupt_signal == TRUE: break (now mid-sentence too)
+        run_options, remove = abortable_run_options(token)
+        synth_s, n_samples = 0.0, 0
+        try:
+            sentences = iter_sentence_audio(
+                self.voice, text, run_options, (lambda: token.cancelled) if token else None, self.phonemes
+            )
+            # Only time spent synthesizing counts toward RTF, not the consumer's
+            t0 = time.perf_counter()
+            for audio in sentences:
+                synth_s += time.perf_counter() - t0
+                n_samples += audio.shape[0]
+                yield audio
+                t0 = time.perf_counter()
+            synth_s += time.perf_counter() - t0
+            if not (token and token.cancelled):
+                self.stats.record(len(text), synth_s, n_samples)
+        finally:
+            remove()
+            if token and token.cancelled:
+                token.record_abort("tts")
+
+    def _iter_pcm(self, text: str, token=None):
+        for audio in self._iter_audio(text, token):
+            pcm = PCMBuffer(audio.shape[0])
+            pcm.append_float(audio)
+            yield pcm.memoryview()
+
+    def _schedule(self, text: str, token=None, session=None):
+        """Scheduling fields for a phrase of `token`'s turn (see tts_scheduler)."""
+        clock = None
+        if token is not None:
+            clock = self.clocks.get(token)
+            if clock is None:
+                clock = self.clocks[token] = PlaybackClock()
+        first = clock is not None and clock.next_index() == 0
+        return {
+            "token": token,
+            "session": session,
+            "priority": PRIORITY_FIRST if first else PRIORITY_NEXT,
+            "clock": clock,
+            "cost_s": self.stats.synth_estimate(len(text)),
+        }
+
+    def _played(self, clock, pcm):
+        """Moves the turn's playback clock past `pcm` (played as soon as it's produced)."""
+        if clock is not None and pcm:
+            clock.advance(memoryview(pcm).nbytes / 2 / self.stats.sample_rate)
+
+    async def stream_pcm(self, text: str, token=None, session=None):
+        """
+        Async generator of raw PCM chunks (one per sentence) for /api/v1/generate.
+        Synthesized by the pool workers as the client reads; closing the
+        generator (client gone) or cancelling `token` aborts the synthesis.
+        Served from the audio cache when possible; complete syntheses are stored.
+        """
+        if not self.running:
+            return
+
+        schedule = self._schedule(text, token, session)
+        clock = schedule["clock"]
+        cached = await audio_cache.alookup(self.voice_id, text)
+        if cached is not None:
+            self._played(clock, cached)
+            yield cached
+            return
+
+        # The job runs under its own scope; the turn's clock still orders it
+        scope = schedule["token"] = token.child() if token else CancelToken()
+        job = _StreamJob(self._iter_pcm(text, scope), **schedule)
+        parts = []
+        self.stats.job_started()
+        try:
+            await self.queue.put(job)
+            while (pcm := await job.chunks.get()) is not None:
+                if job.parked:
+                    job.parked = False
+                    self.parked.discard(job)
+                    if self.running:
+                        self.queue.put_nowait(job)
+                    else:
+                        job.end()  # The pool stopped meanwhile: the client gets what was produced
+                self._played(clock, pcm)
+                parts.append(pcm)
+                yield pcm
+            if job.complete and not scope.cancelled:
+                await asyncio.to_thread(audio_cache.store, self.voice_id, text, b"".join(parts))
+        finally:
+            self.stats.job_finished()
+            scope.cancel()  # Frees the worker now if the client left mid-phrase
+            if job.parked:
+                self.parked.discard(job)
+                job.pcm_iter.close()  # Not queued anywhere: no worker will close it
+
+    async def submit(self, text: str, token=None, session=None):
+        """
+        Cached, coalesced synthesis. Returns None if the turn was cancelled.
+        `session` gets its own round-robin lane in the pool queue.
+        """
+        schedule = self._schedule(text, token, session)
+        pcm = await audio_cache.get_or_synthesize(
+            self.voice_id, text, lambda: self._submit_uncached(text, **schedule)
+        )
+        self._played(schedule["clock"], pcm)
+        return pcm
 
-    async def submit(self, text: str):
+    async def _submit_uncached(self, text: str, token=None, **schedule):
+        if token and token.cancelled:
+            return None
+        if not self.running:
+            return None  # Not loaded, or stopped by the voice registry: no worker would take it
         loop = asyncio.get_running_loop()
         future = loop.create_future()
-        await self.queue.put((text, future))
-        return await future
+        self.stats.job_started()
+        try:
+            await self.queue.put(_SynthJob(text, future, token=token, **schedule))
+            pcm = await future
+        finally:
+            self.stats.job_finished()
+        if token and token.cancelled:
+            return None
+        return pcm
+
+    async def prewarm_cache(self, phrases):
+        # Lowest priority: never ahead of a live turn
+        await audio_cache.prewarm(
+            self.voice_id, phrases, lambda p: self._submit_uncached(p, priority=PRIORITY_BACKGROUND)
+        )
 
     async def shutdown(self):
+        """
+        Stops the workers once they have run everything already queued, then
+        the executor. A stream parked for a slow client ends there: its request
+        gets the sentences produced so far. Anything queued after the workers
+        left is dropped (None), never left waiting.
+        """
         for _ in range(self.workers):
             await self.queue.put(None)
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+        executor, self.executor = self.executor, None
+        self.queue.clear()
+        for job in self.parked:
+            job.end()
+        self.parked.clear()
+        if executor:
+            executor.shutdown(wait=False)
+
+    async def unload(self):
+        """Stops the workers and drops the model so its memory is freed; start() loads it again."""
+        await self.shutdown()
+        self.voice = None
+        self.phonemes = None
+        self.workers = self.min_workers  # Reloads start small again
+        self.stats.set_workers(self.workers)
@@ -0,0 +1,402 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+import onnxruntime
+from app.core.config import settings
+from app.core.logging_config import logger
+from app.services.audio_cache import audio_cache, voice_namespace
+from app.services.cancellation import CancelToken
+from app.services.pcm_buffer import float_to_int16
+from app.services.piper_synth import iter_sentence_audio
+from app.services.tts_stats import VoiceStats, read_sample_rate
+
+# ---------------- WORKER PROCESS SIDE ----------------
+# Each worker process loads the voice exactly once (pool initializer) and keeps
+# it for its whole life, so synthesis runs on its own interpreter and GIL.
+_worker_voice = None
+_worker_phonemes = None  # Each process keeps its own PhonemeCache
+# Cancellation crosses the process boundary through one shared byte per job
+# slot; a watcher thread turns a raised flag into RunOptions.terminate.
+CANCEL_SLOTS = 256
+_cancel_flags = None
+_current = {"slot": None, "run_options": None}
+# Streamed jobs hand each sentence's block back as soon as it is done, through
+# one queue shared by all workers: (stream id, block name, bytes), then
+# (stream id, None, 0) once the job is over.
+_sentence_queue = None
+
+def _init_worker(model_path, config_path, flags_name=None, sentence_queue=None):
+    global _worker_voice, _worker_phonemes, _cancel_flags, _sentence_queue
+    from app.core.runtime_resources import load_voice
+    from app.services.phoneme_cache import PhonemeCache
+    _worker_voice = load_voice(model_path, config_path)  # Same ORT thread settings as the server
+    _worker_phonemes = PhonemeCache(_worker_voice)
+    _sentence_queue = sentence_queue
+    if flags_name:
+        _cancel_flags = shared_memory.SharedMemory(name=flags_name)
+        threading.Thread(target=_watch_cancel, daemon=True).start()
+
+def _watch_cancel():
+    while True:
+        time.sleep(0.005)
+        slot, run_options = _current["slot"], _current["run_options"]
+        if slot is not None and run_options is not None and _cancel_flags.buf[slot]:
+            run_options.terminate = True
+
+def _cancel_check(slot):
+    if slot is not None and _cancel_flags is not None:
+        return lambda: bool(_cancel_flags.buf[slot])
+    return None
+
+def _iter_sentences(text: str, slot, is_cancelled):
+    """int16 PCM per sentence, under this job's cancel slot."""
+    run_options = onnxruntime.RunOptions()
+    _current.update(slot=slot, run_options=run_options)
+    try:
+        for audio in iter_sentence_audio(_worker_voice, text, run_options, is_cancelled, _worker_phonemes):
+            if audio.size:
+                yield float_to_int16(audio)
+    finally:
+        _current.update(slot=None, run_options=None)
+
+def _to_shm(arrays) -> str:
+    """Copies int16 arrays back to back into a fresh block; returns its name."""
+    total = sum(a.nbytes for a in arrays)
+    shm = shared_memory.SharedMemory(create=True, size=total)
+    try:
+        out = np.ndarray(total // 2, dtype=np.int16, buffer=shm.buf)
+        pos = 0
+        for a in arrays:
+            out[pos:pos + a.size] = a
+            pos += a.size
+        del out
+        return shm.name
+    finally:
+        shm.close()
+
+def _synthesize_to_shm(text: str, slot=None):
+    """
+    Synthesizes `text` and writes the int16 PCM into a fresh shared-memory block.
+    Returns (block name, total bytes, per-sentence byte lengths, synthesis
+    seconds) so only a few small values cross the process boundary instead of
+    pickled audio.
+    """
+    is_cancelled = _cancel_check(slot)
+    t0 = time.perf_counter()
+    sentences = list(_iter_sentences(text, slot, is_cancelled))
+    synth_s = time.perf_counter() - t0
+    if is_cancelled and is_cancelled():
+        return None, 0, [], synth_s
+
+    total = sum(a.nbytes for a in sentences)
+    if total == 0:
+        return None, 0, [], synth_s
+    return _to_shm(sentences), total, [a.nbytes for a in sentences], synth_s
+
+def _stream_to_shm(text: str, slot, stream_id: int):
+    """
+    Like _synthesize_to_shm, but each sentence goes into its own block and is
+    handed to the parent through the sentence queue as soon as it is done.
+    Returns (None, total bytes, per-sentence byte lengths, synthesis seconds).
+    """
+    is_cancelled = _cancel_check(slot)
+    sizes = []
+    t0 = time.perf_counter()
+    try:
+        for audio in _iter_sentences(text, slot, is_cancelled):
+            if is_cancelled and is_cancelled():
+                break
+            _sentence_queue.put((stream_id, _to_shm([audio]), audio.nbytes))
+            sizes.append(audio.nbytes)
+    finally:
+        _sentence_queue.put((stream_id, None, 0))
+    return None, sum(sizes), sizes, time.perf_counter() - t0
+
+# ---------------- PARENT SIDE ----------------
+def _take_shm(name: str, size: int) -> bytes:
+    """Copies the PCM out of a worker's block once and releases the block."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+def _unlink_shm(name: str):
+    shm = shared_memory.SharedMemory(name=name)
+    shm.close()
+    shm.unlink()
+
+def _discard_result(cf):
+    """Releases the block of a synthesis nobody is waiting for anymore."""
+    if cf.cancelled() or cf.exception():
+        return
+    name = cf.result()[0]
+    if name:
+        _unlink_shm(name)
+
+
+class ProcessTTSPool:
+    """
+    Drop-in alternative to TTSWorkerPool that synthesizes in worker processes.
+    Same surface: start(), submit(), synthesize_raw_sync(), stream_pcm(), shutdown().
+    stream_pcm() gets each sentence as the worker finishes it: a router thread
+    reads the shared sentence queue and wakes the stream that owns the block.
+    """
+    scalable = False  # Processes start up front: a fixed share of the CPU budget
+
+    def __init__(self, model_path, config_path, workers=2):
+        self.model_path = model_path
+        self.config_path = config_path
+        self.workers = workers
+        self.voice_id = voice_namespace(model_path)  # Audio cache namespace: changes with the model file
+        self.stats = VoiceStats(workers, read_sample_rate(config_path), os.path.basename(model_path))
+        self.executor = None
+        self.cancel_flags = None
+        self.free_slots = list(range(CANCEL_SLOTS))
+        self.slot_lock = threading.Lock()
+        self.sentence_queue = None
+        self.router = None
+        self.streams = {}  # stream id -> (loop, asyncio.Queue) of a stream_pcm reading its sentences
+        self.next_stream = 0
+
+    async def start(self):
+        logger.info(f"🔊 Starting {self.workers} Piper worker processes: {self.model_path}")
+        ctx = multiprocessing.get_context(settings.TTS_PROCESS_START_METHOD)
+        self.cancel_flags = shared_memory.SharedMemory(create=True, size=CANCEL_SLOTS)
+        self.cancel_flags.buf[:CANCEL_SLOTS] = bytes(CANCEL_SLOTS)
+        self.sentence_queue = ctx.Queue()
+        self.router = threading.Thread(target=self._route_sentences, args=(self.sentence_queue,), daemon=True,
+                                       name=f"piper-router-{self.stats.name}")
+        self.router.start()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.config_path, self.cancel_flags.name, self.sentence_queue),
+        )
+        # Spin every worker up now so the first request doesn't pay the model load
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _synthesize_to_shm, "") for _ in range(self.workers)
+        ))
+
+    async def warm_up(self, text: str):
+        """One throwaway synthesis per worker process (kept out of stats)."""
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _synthesize_to_shm, text) for _ in range(self.workers)
+        ))
+        for name, size, _, _ in results:
+            if name:
+                _take_shm(name, size)
+
+    def _collect(self, result):
+        name, size, sentence_sizes, _ = result
+        if not name:
+            return b"", []
+        return _take_shm(name, size), sentence_sizes
+
+    def _route_sentences(self, sentence_queue):
+        """Router thread: hands each streamed sentence block to its stream (None stops it)."""
+        while (item := sentence_queue.get()) is not None:
+            stream = self.streams.get(item[0])
+            if stream is None:
+                if item[1]:
+                    _unlink_shm(item[1])  # The stream is gone: nobody will take the block
+                continue
+            loop, _ = stream
+            try:
+                loop.call_soon_threadsafe(self._deliver_sentence, *item)
+            except RuntimeError:  # Its loop is closed
+                if item[1]:
+                    _unlink_shm(item[1])
+
+    def _deliver_sentence(self, stream_id: int, name, size: int):
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            if name:
+                _unlink_shm(name)  # Closed while the block was on its way
+            return
+        stream[1].put_nowait((name, size))
+
+    def _submit_job(self, text: str, token=None, stream_id=None):
+        """
+        Submits one synthesis bound to `token`. Cancelling the token drops the
+        job if it is still queued, or raises its slot flag so the worker
+        terminates the ONNX run. With `stream_id` the worker streams its
+        sentences back (_stream_to_shm). Returns the concurrent future.
+        """
+        slot = None
+        if token is not None:
+            with self.slot_lock:
+                slot = self.free_slots.pop() if self.free_slots else None
+            if slot is not None:
+                self.cancel_flags.buf[slot] = 0
+
+        if stream_id is None:
+            cf = self.executor.submit(_synthesize_to_shm, text, slot)
+        else:
+            cf = self.executor.submit(_stream_to_shm, text, slot, stream_id)
+        self.stats.job_started()
+
+        def on_cancel():
+            cf.cancel()
+            if slot is not None and self.cancel_flags is not None:
+                self.cancel_flags.buf[slot] = 1
+
+        remove = token.add_callback(on_cancel) if token is not None else (lambda: None)
+
+        def release(_):
+            remove()
+            self.stats.job_finished()
+            if not cf.cancelled() and cf.exception() is None and not (token and token.cancelled):
+                _, size, _, synth_s = cf.result()
+                self.stats.record(len(text), synth_s, size // 2)
+            if token is not None and token.cancelled:
+                token.record_abort("tts")
+            if slot is not None:
+                with self.slot_lock:
+                    self.free_slots.append(slot)
+        cf.add_done_callback(release)
+        return cf
+
+    def synthesize_raw_sync(self, text: str, token=None):
+        if not self.executor or (token and token.cancelled):
+            return b""
+        try:
+            pcm, _ = self._collect(self._submit_job(text, token).result())
+        except Exception as e:
+            if not (token and token.cancelled):
+                logger.error(f"❌ Synthesis process error: {e}")
+            return b""
+        if token and token.cancelled:
+            return b""
+        return pcm
+
+    async def stream_pcm(self, text: str, token=None, session=None):
+        """
+        Async generator of raw PCM chunks (one per sentence) for /api/v1/generate,
+        each yielded as soon as the worker process has synthesized it.
+        Closing it (client gone) or cancelling `token` aborts the synthesis.
+        `session` is accepted for parity with TTSWorkerPool (processes take jobs in order).
+        """
+        if not self.executor or (token and token.cancelled):
+            return
+        cached = await audio_cache.alookup(self.voice_id, text)
+        if cached is not None:
+            yield cached
+            return
+
+        scope = token.child() if token else CancelToken()
+        stream_id, self.next_stream = self.next_stream, self.next_stream + 1
+        sentences = asyncio.Queue()
+        self.streams[stream_id] = (asyncio.get_running_loop(), sentences)
+        parts = []
+        try:
+            cf = self._submit_job(text, scope, stream_id)
+            cf.add_done_callback(lambda f: self._end_stream(stream_id, f))
+            while True:
+                name, size = await sentences.get()
+                if name is None:
+                    break
+                pcm = _take_shm(name, size)
+                if scope.cancelled:
+                    continue  # Drain: blocks still on their way are released as they come
+                parts.append(pcm)
+                yield pcm
+            if scope.cancelled:
+                return
+            try:
+                await asyncio.wrap_future(cf)  # The end marker is in: the result follows right away
+            except Exception as e:
+                logger.error(f"❌ Raw Synthesis error: {e}")
+                return  # Not all of the phrase: don't cache it
+            await asyncio.to_thread(audio_cache.store, self.voice_id, text, b"".join(parts))
+        finally:
+            scope.cancel()  # Client gone mid-phrase: drop the job or stop its ONNX run
+            self.streams.pop(stream_id, None)
+            while not sentences.empty():  # Delivered but never read
+                name, _ = sentences.get_nowait()
+                if name:
+                    _unlink_shm(name)
+
+    def _end_stream(self, stream_id: int, cf):
+        """
+        Ends the stream of a job that never sends its own end marker: dropped
+        before it ran, or its worker process died. Any other job's marker
+        comes from the worker, after its last sentence (the future's result
+        may overtake those on their way).
+        """
+        if not (cf.cancelled() or isinstance(cf.exception(), BrokenProcessPool)):
+            return
+        stream = self.streams.get(stream_id)
+        if stream is not None:
+            try:
+                stream[0].call_soon_threadsafe(self._deliver_sentence, stream_id, None, 0)
+            except RuntimeError:
+                pass
+
+    async def submit(self, text: str, token=None, session=None):
+        """Cached, coalesced synthesis. Returns None if the turn was cancelled (jobs run in order)."""
+        return await audio_cache.get_or_synthesize(
+            self.voice_id, text, lambda: self._submit_uncached(text, token)
+        )
+
+    async def _submit_uncached(self, text: str, token=None):
+        if token and token.cancelled:
+            return None
+        if not self.executor:
+            return None  # Not started, or stopped by the voice registry
+        cf = self._submit_job(text, token)
+        try:
+            pcm, _ = self._collect(await asyncio.wrap_future(cf))
+        except asyncio.CancelledError:
+            if cf.cancelled() and token and token.cancelled:
+                return None  # Dropped from the queue by the token
+            cf.add_done_callback(_discard_result)
+            raise
+        except Exception as e:
+            if not (token and token.cancelled):
+                logger.error(f"❌ TTS process error: {e}")
+            return None
+        if token and token.cancelled:
+            return None
+        return pcm
+
+    async def prewarm_cache(self, phrases):
+        await audio_cache.prewarm(self.voice_id, phrases, self._submit_uncached)
+
+    @property
+    def running(self) -> bool:
+        return self.executor is not None
+
+    async def unload(self):
+        await self.shutdown()  # The worker processes hold the model
+
+    async def shutdown(self):
+        """
+        Stops taking jobs and lets the worker processes finish the ones already
+        submitted (their callers get their audio), then stops them. The cancel
+        flags and the sentence router go only after that: nothing is cancelled
+        or unlinked underneath a running job, and streams get their last sentences.
+        """
+        executor, self.executor = self.executor, None
+        if executor:
+            await asyncio.to_thread(executor.shutdown, wait=True)  # Off the loop: may take a synthesis or two
+        if self.router:
+            # The workers have exited, so their last sentences are ahead of this stop
+            self.sentence_queue.put(None)
+            await asyncio.to_thread(self.router.join)
+            self.sentence_queue.close()
+            self.router = self.sentence_queue = None
+        if self.cancel_flags:
+            self.cancel_flags.close()
+            self.cancel_flags.unlink()
+            self.cancel_flags = None
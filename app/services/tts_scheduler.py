@@ -0,0 +1,176 @@
+"""
+Job scheduling for TTSWorkerPool: priority, playback deadlines and
+round-robin fairness across sessions, instead of one FIFO.
+
+Each session has its own FIFO lane (a turn's phrases stay in order); only the
+head of each lane competes for the next free worker:
+
+  level 0  the first phrase of a turn (what the user waits on), or a later
+           phrase whose latest start is within TTS_DEADLINE_SLACK_MS
+  level 1  later phrases, earliest latest-start first
+  level 2  background work (cache pre-warm)
+
+latest start = when the turn's audio produced so far stops playing (its
+PlaybackClock) minus the phrase's estimated synthesis time. Ties go
+round-robin: a lane that was just served moves to the back.
+
+Jobs of cancelled turns are dropped before they reach a worker, and stop
+sentinels (None) are served only once no job is left.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from app.core.config import settings
+
+PRIORITY_FIRST = 0
+PRIORITY_NEXT = 1
+PRIORITY_BACKGROUND = 2
+
+
+class PlaybackClock:
+    """Playback position of one turn: when the audio produced so far ends."""
+    def __init__(self):
+        self.jobs = 0
+        self.end = None  # perf_counter() time; None until the turn has audio
+
+    def next_index(self) -> int:
+        index, self.jobs = self.jobs, self.jobs + 1
+        return index
+
+    def advance(self, audio_s: float, now: float = None):
+        now = now if now is not None else time.perf_counter()
+        self.end = max(now, self.end or now) + audio_s
+
+
+class ScheduledJob:
+    """Scheduling fields shared by the pool's job types."""
+    def __init__(self, token=None, session=None, priority=PRIORITY_NEXT, clock=None, cost_s=0.0):
+        self.token = token
+        self.session = session
+        self.priority = priority
+        self.clock = clock
+        self.cost_s = cost_s  # Estimated synthesis time
+        self.enqueued = 0.0
+
+    @property
+    def stale(self) -> bool:
+        return bool(self.token and self.token.cancelled)
+
+    def drop(self):
+        """Releases a job that will never run."""
+
+    def latest_start(self):
+        if self.clock is None or self.clock.end is None:
+            return None
+        return self.clock.end - self.cost_s
+
+
+class FairJobQueue:
+    """Drop-in for the pool's asyncio.Queue: put / put_nowait / get / qsize."""
+    def __init__(self):
+        self.lanes = OrderedDict()  # session -> deque of jobs; order is the round-robin turn
+        self.stops = 0
+        self.getters = deque()
+        self.dropped = 0
+
+    def qsize(self) -> int:
+        return self.stops + sum(1 for lane in self.lanes.values() for job in lane if not job.stale)
+
+    async def put(self, job):
+        self.put_nowait(job)
+
+    def put_nowait(self, job):
+        if job is None:
+            self.stops += 1
+        else:
+            job.enqueued = time.perf_counter()
+            self.lanes.setdefault(job.session, deque()).append(job)
+        self._wakeup()
+
+    def _wakeup(self):
+        while self.getters:
+            getter = self.getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                break
+
+    def _purge(self):
+        for session, lane in list(self.lanes.items()):
+            if not any(job.stale for job in lane):
+                continue
+            live = deque()
+            for job in lane:
+                if job.stale:
+                    job.drop()
+                    self.dropped += 1
+                else:
+                    live.append(job)
+            if live:
+                self.lanes[session] = live
+            else:
+                del self.lanes[session]
+
+    def _rank(self, job, position: int, now: float):
+        if job.priority == PRIORITY_BACKGROUND:
+            return (2, 0.0, position)
+        latest = job.latest_start()
+        slack_s = settings.TTS_DEADLINE_SLACK_MS / 1000
+        if job.priority == PRIORITY_FIRST or (latest is not None and latest - now <= slack_s):
+            return (0, 0.0, position)
+        return (1, latest if latest is not None else float("inf"), position)
+
+    def level(self, job) -> int:
+        """Scheduling level of `job` right now (0 urgent, 1 later phrase, 2 background)."""
+        return self._rank(job, 0, time.perf_counter())[0]
+
+    def get_nowait(self, levels=None):
+        """
+        The next job by rank. With `levels`, only a job ranked at one of those
+        levels: if the best job is at another, it stays queued (QueueEmpty).
+        """
+        self._purge()
+        if self.lanes:
+            now = time.perf_counter()
+            rank, session = min(
+                (self._rank(lane[0], i, now), session)
+                for i, (session, lane) in enumerate(self.lanes.items())
+            )
+            if levels is not None and rank[0] not in levels:
+                raise asyncio.QueueEmpty
+            lane = self.lanes[session]
+            job = lane.popleft()
+            if lane:
+                self.lanes.move_to_end(session)
+            else:
+                del self.lanes[session]
+            return job
+        if self.stops:
+            self.stops -= 1
+            return None
+        raise asyncio.QueueEmpty
+
+    def clear(self):
+        """Drops every queued job (the pool has stopped): callers get None / the end of their stream."""
+        for lane in self.lanes.values():
+            for job in lane:
+                job.drop()
+        self.lanes.clear()
+        self.stops = 0
+
+    async def get(self):
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            getter = asyncio.get_running_loop().create_future()
+            self.getters.append(getter)
+            try:
+                await getter
+            except asyncio.CancelledError:
+                getter.cancel()
+                if getter in self.getters:
+                    self.getters.remove(getter)
+                if self.lanes or self.stops:
+                    self._wakeup()  # Pass on a wakeup that was meant for us
+                raise
@@ -0,0 +1,161 @@
+"""
+Live synthesis statistics per voice, and the phrase sizes they imply.
+
+Each pool records (text length, synthesis seconds, audio samples) for every
+finished synthesis and tracks how many jobs are queued or running. From that:
+
+  load   = RTF x (1 + queued / workers)      effective real-time factor right now
+  next_s = TTS_PHRASE_MIN_S / (1 - load)     later phrases grow as synthesis nears
+                                             real time, so it stays ahead of playback
+  first_s = max(TTS_FIRST_PHRASE_MIN_S, load x next_s)
+                                             first phrase is as short as possible but
+                                             must play long enough to cover the
+                                             synthesis of the phrase after it
+
+Seconds become characters through the voice's measured speaking rate.
+
+Queue depth (seen by each arriving job) and queue wait (time until a worker
+picks the job up) are kept as histograms; the autoscaler reads the peak wait
+since its last look.
+"""
+import bisect
+import json
+import threading
+from app.core.config import settings
+from app.core.logging_config import logger
+
+EWMA_ALPHA = 0.2
+DEFAULT_CHARS_PER_SEC = 14.0  # Typical conversational rate until measured
+MAX_LOAD = 0.9                # Beyond this synthesis can't keep up; cap the growth
+WAIT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16)
+
+
+def read_sample_rate(config_path: str, default: int = 22050) -> int:
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("audio", {}).get("sample_rate", default))
+    except (OSError, ValueError):
+        return default
+
+
+class Histogram:
+    """Counts per bucket (value <= bound), plus one bucket above the last bound."""
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> dict:
+        buckets = {f"le_{b:g}": c for b, c in zip(self.bounds, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        mean = round(self.total / self.count, 1) if self.count else None
+        return {"count": self.count, "mean": mean, "buckets": buckets}
+
+
+class VoiceStats:
+    def __init__(self, workers: int, sample_rate: int = 22050, name: str = ""):
+        self.name = name
+        self.workers = max(1, workers)
+        self.sample_rate = sample_rate
+        self.rtf = None  # Synthesis seconds per audio second (EWMA); None until measured
+        self.chars_per_sec = DEFAULT_CHARS_PER_SEC
+        self.queued = 0  # Jobs waiting or running
+        self.samples = 0
+        self.first_synth_ms = None  # First real synthesis (warm-up excluded)
+        self.wait_ms = Histogram(WAIT_BUCKETS_MS)
+        self.queue_depth = Histogram(DEPTH_BUCKETS)
+        self.peak_wait_ms = 0.0  # Since the autoscaler last looked
+        self.lock = threading.Lock()
+
+    def job_started(self):
+        with self.lock:
+            self.queue_depth.observe(self.queued)
+            self.queued += 1
+
+    def job_finished(self):
+        with self.lock:
+            self.queued = max(0, self.queued - 1)
+
+    def record_wait(self, wait_s: float):
+        wait_ms = wait_s * 1000
+        with self.lock:
+            self.wait_ms.observe(wait_ms)
+            self.peak_wait_ms = max(self.peak_wait_ms, wait_ms)
+
+    def take_peak_wait(self) -> float:
+        """Longest queue wait (ms) since the last call."""
+        with self.lock:
+            peak, self.peak_wait_ms = self.peak_wait_ms, 0.0
+        return peak
+
+    def synth_estimate(self, text_len: int) -> float:
+        """Expected synthesis seconds for `text_len` characters (0 until measured)."""
+        if self.rtf is None:
+            return 0.0
+        return self.rtf * text_len / self.chars_per_sec
+
+    def seed_from(self, other: "VoiceStats"):
+        """Starts from another voice's estimates (a hot swap), so sizing doesn't reset to defaults."""
+        with other.lock:
+            self.rtf, self.chars_per_sec = other.rtf, other.chars_per_sec
+
+    def set_workers(self, workers: int):
+        self.workers = max(1, workers)
+
+    def record(self, text_len: int, synth_s: float, n_samples: int):
+        if n_samples <= 0:
+            return
+        audio_s = n_samples / self.sample_rate
+        rtf = synth_s / audio_s
+        cps = text_len / audio_s
+        with self.lock:
+            first = self.rtf is None
+            if first:
+                self.rtf, self.chars_per_sec = rtf, cps
+                self.first_synth_ms = round(synth_s * 1000, 1)
+            else:
+                self.rtf += EWMA_ALPHA * (rtf - self.rtf)
+                self.chars_per_sec += EWMA_ALPHA * (cps - self.chars_per_sec)
+            self.samples += 1
+        if first:
+            logger.info(f"⏱️ First synthesis [{self.name}]: {self.first_synth_ms} ms (RTF {rtf:.3f})")
+
+    @property
+    def load(self) -> float:
+        if self.rtf is None:
+            return 0.0
+        return self.rtf * (1 + self.queued / self.workers)
+
+    def phrase_sizes(self):
+        """(first_min_len, next_min_len) in characters for the PhraseSegmenter."""
+        if self.rtf is None:
+            return settings.TTS_FIRST_PHRASE_MIN, settings.TTS_PHRASE_MIN
+        load = min(self.load, MAX_LOAD)
+        next_s = settings.TTS_PHRASE_MIN_S / (1 - load)
+        first_s = max(settings.TTS_FIRST_PHRASE_MIN_S, load * next_s)
+        next_len = min(settings.TTS_PHRASE_MAX, max(settings.TTS_PHRASE_MIN, round(next_s * self.chars_per_sec)))
+        first_len = min(next_len, max(settings.TTS_FIRST_PHRASE_MIN, round(first_s * self.chars_per_sec)))
+        return first_len, next_len
+
+    def snapshot(self) -> dict:
+        first_len, next_len = self.phrase_sizes()
+        return {
+            "rtf": round(self.rtf, 3) if self.rtf is not None else None,
+            "load": round(self.load, 3),
+            "queued": self.queued,
+            "workers": self.workers,
+            "chars_per_sec": round(self.chars_per_sec, 1),
+            "samples": self.samples,
+            "first_synth_ms": self.first_synth_ms,
+            "first_phrase_min": first_len,
+            "phrase_min": next_len,
+            "wait_ms": self.wait_ms.snapshot(),
+            "queue_depth": self.queue_depth.snapshot(),
+        }
@@ -0,0 +1,367 @@
+"""
+One conversation turn: language lock, Gemini stream, phrase chunking and TTS.
+
+Transport-agnostic: the pipeline yields event dicts and, in inline-audio mode,
+the int16 PCM of each `audio_text` event right after it. /api/stream_chat
+encodes them as NDJSON or frames; the duplex WebSocket sends them as messages.
+"""
+import asyncio
+import datetime
+import time
+from collections import deque
+from app.core.config import settings
+from app.core.logging_config import logger
+from app.core.metrics import LatencyRegistry
+from app.services.transliteration_detector import detect_transliteration
+from app.services.script_normalizer import ScriptNormalizer
+from app.services.tts_manager import get_pool, ensure_voice, filler_audio, hold_voice
+from app.services.phrase_segmenter import PhraseSegmenter
+from app.services.stream_protocol import TextCoalescer
+
+INTERRUPTED = object()  # Wakes the response stream when the turn is cancelled
+FLUSH = object()  # Wakes the response stream when coalesced text is due
+FILLER = object()  # Wakes the response stream when the filler budget runs out
+WAKE_RETRY_S = 0.01  # A timer wake-up that finds the response queue full tries again after this
+
+# From turn start: first audible sound (filler or answer) and first answer audio, in ms
+turn_latency = LatencyRegistry()
+
+
+async def start_turn(session, user_text_raw: str, language: str = None, llm_client=None, inline_audio: bool = False):
+    """
+    Starts a turn for `session` (cancelling the previous one) and returns
+    (pipeline, inline): an async generator function and whether it carries PCM.
+    """
+    turn_started = time.perf_counter()
+    chat_history = session.chat_history
+    # Cancellation scope of this turn: barge-in or the next turn cancels it (in any process)
+    token, turn_id = await session.begin_turn()
+
+    # Shared immunity: AI is about to start thinking/speaking
+    session.start_immunity(400)
+
+    # Language Identification & Normalization
+    # Priority: UI Selection > Auto-Detection
+    det_lang = detect_transliteration(user_text_raw)
+    
+    # If user explicitly selected a language in UI, ALWAYS use that
+    if language and language in ["en", "hi", "mr"]:
+        LOCKED_LANGUAGE = language
+        logger.debug(f"Language detect: auto={det_lang.upper()}, UI override={language.upper()}")
+    elif det_lang in ["hi", "mr"]:
+        LOCKED_LANGUAGE = det_lang
+    else:
+        LOCKED_LANGUAGE = "en"
+
+    logger.info(f"🔒 MODE: {LOCKED_LANGUAGE.upper()}")
+    session.set_language(LOCKED_LANGUAGE)
+    normalized_user_text = ScriptNormalizer.normalize_input(user_text_raw, LOCKED_LANGUAGE)
+
+    # The pool itself is looked up per phrase: a hot swap may replace it mid-turn
+    inline = inline_audio and get_pool(LOCKED_LANGUAGE) is not None
+
+    async def pipeline():
+        loop = asyncio.get_running_loop()
+        # Stage graph: gemini_task -> tts_q -> (inline_)tts_worker -> response_q -> client.
+        # Bounded queues give backpressure; each stage ends its output with a None
+        # sentinel, so nothing ever waits on a timer.
+        response_q = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        tts_q = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+
+        # ---------------- GEMINI TASK ----------------
+        async def gemini_task():
+            try:
+                current_time = datetime.datetime.now().strftime("%I:%M %p")
+                # Prepare History with Language Tags
+                formatted_history = []
+                for item in list(chat_history):
+                    role = item.get('role', 'User')
+                    text = item.get('text', '')
+                    lang = item.get('lang', '??')
+                    formatted_history.append(f"({lang.upper()}) {role}: {text}")
+                history_text = "\n".join(formatted_history)
+                
+                # STRICT Language Instruction
+                if LOCKED_LANGUAGE == "en":
+                    lang_rule = "YOU MUST RESPOND IN ENGLISH ONLY. Use only English words. Never use Hindi or Marathi."
+                elif LOCKED_LANGUAGE == "hi":
+                    lang_rule = "आपको केवल हिंदी में ही बात करनी है। पूरी तरह से देवनागरी लिपि का उपयोग करें। अंग्रेजी या मराठी शब्दों का प्रयोग न करें। (Respond 100% in Hindi Devanagari)."
+                elif LOCKED_LANGUAGE == "mr":
+                    lang_rule = "तुम्हाला फक्त मराठीतच बोलायचे आहे। पूर्णपणे देवनागरी लिपी वापरा। इंग्रजी किंवा हिंदी शब्द वापरू नका। (Respond 100% in Marathi Devanagari)."
+
+                sys_prompt = f"""You are Ai Assistance Powered By The Baap Company, a human-like AI friend. Current Time: {current_time}.
+Never use emojis. Keep it punchy, witty & very warm (10-15 words max).
+
+CONTEXT HISTORY:
+{history_text}
+
+CRITICAL INSTRUCTION:
+The history above may contain different languages. IGNORE THEM.
+{lang_rule}
+TARGET_LANGUAGE: {LOCKED_LANGUAGE.upper()}
+RESPOND_NOW_IN_{LOCKED_LANGUAGE.upper()}:
+USER: "{normalized_user_text}"
+AGENT:"""
+
+                # Async client: awaiting the next token yields to the loop, so VAD frames,
+                # other users' streams and barge-in keep flowing while Gemini is thinking.
+                stream = await llm_client.aio.models.generate_content_stream(
+                    model="gemini-2.0-flash",
+                    contents=sys_prompt,
+                    config={"temperature": 0.3}  # Reduced for strict consistency
+                )
+
+                # Stage P6: phrase chunking for TTS (short first phrase for fast start).
+                # Sizes follow the voice's live RTF and backlog (see tts_stats).
+                segmenter = PhraseSegmenter(settings.TTS_FIRST_PHRASE_MIN, settings.TTS_PHRASE_MIN)
+                full_text = ""
+
+                try:
+                    async for chunk in stream:
+                        if token.cancelled:
+                            print(" Gemini Interrupted")
+                            await stream.aclose()
+                            break
+                        if not chunk.text: continue
+
+                        await response_q.put({"type": "text", "content": chunk.text})
+                        full_text += chunk.text
+
+                        if voice_pool := get_pool(LOCKED_LANGUAGE):
+                            segmenter.first_min_len, segmenter.next_min_len = voice_pool.stats.phrase_sizes()
+                        for phrase in segmenter.push(chunk.text):
+                            valid = ScriptNormalizer.validate_output(phrase, LOCKED_LANGUAGE)
+                            if valid:
+                                await tts_q.put(valid)
+                except asyncio.CancelledError:
+                    # Barge-in cancels this task mid-await: drop the stream now, keep the partial reply
+                    if not token.cancelled:
+                        raise
+                    print(" Gemini Interrupted")
+                    await stream.aclose()
+                token.record_abort("llm")
+
+                tail = segmenter.flush()
+                if tail and not token.cancelled:
+                    valid = ScriptNormalizer.validate_output(tail, LOCKED_LANGUAGE)
+                    if valid: await tts_q.put(valid)
+                
+                #  ALWAYS Save History (Full or Partial)
+                if normalized_user_text and full_text.strip():
+                    # Check if we already added it
+                    if not chat_history or chat_history[-1]["text"] != full_text.strip():
+                        # Only add User if not last
+                        if not chat_history or chat_history[-1]["role"] != "User": 
+                             chat_history.append({"role": "User", "text": normalized_user_text, "lang": LOCKED_LANGUAGE})
+                        chat_history.append({"role": "Ai Assistance Powered By The Baap Company", "text": full_text.strip(), "lang": LOCKED_LANGUAGE})
+                        print(f" MEMORY SAVED [{LOCKED_LANGUAGE.upper()}]: {full_text.strip()[:40]}...")
+
+            except Exception as e:
+                print(f" Gemini Error: {e}")
+            # Not in `finally`: a stage cancelled by the pipeline must not block on a full queue
+            await tts_q.put(None)
+
+        # ---------------- TTS WORKER ----------------
+        async def tts_worker():
+            """Forwards phrases in reply order as audio_text events; the client fetches the audio."""
+            first = True
+            try:
+                while (item := await tts_q.get()) is not None and not token.cancelled:
+                    if first:
+                        session.start_immunity(800)
+                        first = False
+                    await response_q.put({"type": "audio_text", "content": item, "lang": LOCKED_LANGUAGE})
+            except Exception as e:
+                print(f" TTS Stage Error: {e}")
+            await response_q.put(None)
+
+        # ---------------- INLINE TTS WORKER ----------------
+        async def inline_tts_worker():
+            """
+            Submits phrases to the TTSWorkerPool as they arrive, keeping up to
+            TTS_INLINE_LOOKAHEAD in flight, and emits their PCM strictly in order.
+            """
+            lookahead = max(1, settings.TTS_INLINE_LOOKAHEAD)
+            pending = deque()  # (seq, phrase, synthesis future) in reply order
+            get_task = None
+            done = False
+            seq = 0
+
+            async def synthesize(item):
+                # Voice may still be loading (or lazy): phrases queue up meanwhile
+                pool = await ensure_voice(LOCKED_LANGUAGE)
+                if pool is None:
+                    return None  # Voice failed to load: text only
+                release = hold_voice(LOCKED_LANGUAGE, pool)  # A hot swap drains this pool first
+                try:
+                    return await pool.submit(item, token, session.session_id)
+                finally:
+                    release()
+
+            try:
+                while not token.cancelled:
+                    if get_task is None and not done and len(pending) < lookahead:
+                        get_task = asyncio.ensure_future(tts_q.get())
+
+                    waiting = [t for t in (get_task, pending[0][2] if pending else None) if t]
+                    if not waiting:
+                        break
+                    await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                    if get_task is not None and get_task.done():
+                        item = get_task.result()
+                        get_task = None
+                        if item is None:
+                            done = True
+                        else:
+                            pending.append((seq, item, asyncio.ensure_future(synthesize(item))))
+                            seq += 1
+
+                    # Flush every finished phrase at the head of the line
+                    while pending and pending[0][2].done() and not token.cancelled:
+                        idx, item, fut = pending.popleft()
+                        pcm = fut.result() or b""
+                        if idx == 0:
+                            session.start_immunity(800)
+                        await response_q.put({
+                            "type": "audio_text", "content": item, "lang": LOCKED_LANGUAGE,
+                            "seq": idx, "bytes": len(pcm),
+                        })
+                        await response_q.put(pcm)
+            except Exception as e:
+                print(f" TTS Stage Error: {e}")
+            finally:
+                if get_task is not None:
+                    get_task.cancel()
+                for _, _, fut in pending:
+                    fut.cancel()
+            await response_q.put(None)
+
+        # ---------------- RUN PIPELINE ----------------
+        release_voice = hold_voice(LOCKED_LANGUAGE)  # Not evicted mid-turn, even between phrases
+        g_task = asyncio.create_task(gemini_task())
+        t_task = asyncio.create_task(inline_tts_worker() if inline else tts_worker())
+
+        # Barge-in may fire from any thread: stop Gemini and wake the stream right away
+        def wake():
+            if response_q.full():
+                response_q.get_nowait()  # The turn is over: its unsent output is dropped anyway
+            response_q.put_nowait(INTERRUPTED)
+
+        def on_cancel():
+            loop.call_soon_threadsafe(g_task.cancel)
+            loop.call_soon_threadsafe(wake)
+        remove_cancel = token.add_callback(on_cancel)
+        turn_watch = session.watch_turn(token, turn_id)  # Shared store: barge-in from another worker
+
+        # Text tokens are merged into fewer events; audio and interrupts never wait.
+        # One timer per window wakes the stream when buffered text is due.
+        coalescer = TextCoalescer()
+        flush_timer = None
+
+        def flush_due():
+            nonlocal flush_timer
+            flush_timer = None
+            if response_q.full():  # A burst the client hasn't read yet: try again, never drop it
+                flush_timer = loop.call_later(WAKE_RETRY_S, flush_due)
+            else:
+                response_q.put_nowait(FLUSH)
+
+        def take_text():
+            nonlocal flush_timer
+            if flush_timer is not None:
+                flush_timer.cancel()
+                flush_timer = None
+            return coalescer.take()
+
+        # Stage P8: filler. If the answer has no audio within TTS_FILLER_BUDGET_MS, a cached
+        # acknowledgement plays meanwhile (the client cross-fades it into the answer)
+        filler = await filler_audio(LOCKED_LANGUAGE) if settings.TTS_FILLER else None
+        filler_timer = None
+        sounded = answered = False
+
+        def filler_due():
+            nonlocal filler_timer
+            filler_timer = None
+            if answered or token.cancelled:
+                return
+            if response_q.full():  # e.g. an early text burst: the filler is still due once it drains
+                filler_timer = loop.call_later(WAKE_RETRY_S, filler_due)
+            else:
+                response_q.put_nowait(FILLER)
+
+        if filler:
+            budget_s = settings.TTS_FILLER_BUDGET_MS / 1000 - (time.perf_counter() - turn_started)
+            filler_timer = loop.call_later(max(0.0, budget_s), filler_due)
+
+        def mark_audio(answer: bool):
+            nonlocal sounded, answered
+            ms = round((time.perf_counter() - turn_started) * 1000, 1)
+            after_filler = sounded
+            if not sounded:
+                sounded = True
+                turn_latency.record("first_sound", ms)
+            if answer:
+                answered = True
+                turn_latency.record("first_answer_audio", ms)
+                logger.info(f"⏱️ First answer audio: {ms} ms{' (after filler)' if after_filler else ''}")
+
+        try:
+            while True:
+                # Checked before awaiting: a cancel between packets is seen without a loop hop
+                pkt = INTERRUPTED if token.cancelled else await response_q.get()
+                if pkt is FLUSH:
+                    if text := take_text():
+                        yield text
+                    continue
+                if pkt is FILLER:
+                    filler_timer = None
+                    if not answered and not token.cancelled:
+                        text, pcm = filler
+                        session.start_immunity(800)
+                        event = {"type": "filler", "content": text, "lang": LOCKED_LANGUAGE}
+                        if inline:
+                            event["bytes"] = len(pcm)
+                        yield event
+                        if inline:
+                            yield pcm
+                        mark_audio(answer=False)
+                    continue
+                if isinstance(pkt, dict) and pkt["type"] == "text":
+                    if coalescer.add(pkt["content"], loop.time()):
+                        yield take_text()
+                    elif flush_timer is None:
+                        flush_timer = loop.call_at(coalescer.deadline, flush_due)
+                    continue
+                # Anything else goes out now, after the text that preceded it
+                if text := take_text():
+                    yield text
+                if pkt is None:
+                    break
+                if isinstance(pkt, dict) and pkt["type"] == "audio_text" and not answered:
+                    if filler_timer is not None:
+                        filler_timer.cancel()
+                    mark_audio(answer=True)
+                if pkt is INTERRUPTED or token.cancelled:
+                    token.record_abort("stream")
+                    yield {"type": "interrupt"}
+                    # 🔥 Save Partial Context on Interrupt (gemini_task may already have saved the turn)
+                    recent = list(chat_history)[-2:]
+                    if normalized_user_text and not any(item["text"] == normalized_user_text for item in recent):
+                        chat_history.append({"role": "User", "text": normalized_user_text, "lang": LOCKED_LANGUAGE})
+                    break
+                yield pkt
+        finally:
+            release_voice()
+            remove_cancel()
+            if turn_watch is not None:
+                turn_watch.cancel()
+            if flush_timer is not None:
+                flush_timer.cancel()
+            if filler_timer is not None:
+                filler_timer.cancel()
+            g_task.cancel()
+            t_task.cancel()
+            print("🚀 Interaction Pipeline Cleaned.")
+
+    return pipeline, inline
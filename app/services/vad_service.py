@@ -1,24 +1,43 @@
+import copy
 import torch
 import numpy as np
 import time
+from app.services.pcm_buffer import PCMRing
 
-class VoiceDetector:
-    def __init__(self, aggressiveness=2, volume_threshold=0.01):
-        # ---------------- Neural VAD (Silero) ----------------
+VAD_FRAME = 512  # Silero window at 16 kHz (32 ms)
+
+# Silero is loaded once per process (load_silero, at startup and off the event
+# loop); every VoiceDetector gets its own copy so the RNN state of one user's
+# stream never leaks into another's.
+_silero_model = None
+_silero_loaded = False
+
+def load_silero():
+    """Loads the shared Silero model (blocking: torch.hub may download it). Idempotent."""
+    global _silero_model, _silero_loaded
+    if not _silero_loaded:
+        _silero_loaded = True
         print("🧠 Loading Silero VAD Model...")
         try:
-            self.model, utils = torch.hub.load(repo_or_dir='snakers4/silero-vad',
-                                             model='silero_vad',
-                                             force_reload=False,
-                                             trust_repo=True)
-            (self.get_speech_timestamps, _, self.read_audio, _, _) = utils
+            _silero_model, _ = torch.hub.load(repo_or_dir='snakers4/silero-vad',
+                                              model='silero_vad',
+                                              force_reload=False,
+                                              trust_repo=True)
             print("✅ Silero VAD Ready")
         except Exception as e:
             print(f"⚠️ Silero Load Fail ({e}), falling back to basic VAD")
-            self.model = None
+            _silero_model = None
+    return _silero_model
+
+class VoiceDetector:
+    def __init__(self, aggressiveness=2, volume_threshold=0.01):
+        # ---------------- Neural VAD (Silero) ----------------
+        shared_model = load_silero()
+        self.model = copy.deepcopy(shared_model) if shared_model is not None else None
 
         self.volume_threshold = volume_threshold
-        self.rolling_buffer = []  # For Silero (needs 512 samples)
+        self.rolling_buffer = PCMRing(VAD_FRAME)  # For Silero (needs 512 samples)
+        self.frame = np.empty(VAD_FRAME, dtype=np.float32)  # Reused for every window
         
         # ---------------- Calibration ----------------
         self.calibration_frames = []
@@ -75,17 +94,14 @@ class VoiceDetector:
             return False
             
         # 1. Fragment-Resistant Buffer (Stage 1)
-        audio_int16 = np.frombuffer(pcm_frame, dtype=np.int16)
-        self.rolling_buffer.extend(audio_int16.tolist())
+        self.rolling_buffer.write(pcm_frame)
         
         has_speech_in_cycle = False
+        chunk_data = self.frame
 
         # Process ALL available 512-sample (32ms) chunks in the buffer
-        while len(self.rolling_buffer) >= 512:
-            chunk_data = np.array(self.rolling_buffer[:512], dtype=np.float32) / 32768.0
-            self.rolling_buffer = self.rolling_buffer[512:]
-            
-            rms = np.sqrt(np.mean(chunk_data**2))
+        while self.rolling_buffer.read_frame(chunk_data):
+            rms = float(np.sqrt(np.dot(chunk_data, chunk_data) / VAD_FRAME))
             
             # 2. Volume Gate (Stage 2)
             # In Strict Mode (AI Speaking), we ignore echo with 10x floor
@@ -145,7 +161,4 @@ class VoiceDetector:
         self.speech_frames = 0
         self.silence_frames = 0
         self.speech_session_active = False
-        self.rolling_buffer = []
-
-# REQUIRED GLOBAL SINGLETON
-voice_detector = VoiceDetector()
+        self.rolling_buffer.clear()
@@ -0,0 +1,106 @@
+/**
+ * Decoders for the TTS output codecs (mirror of app/services/audio_codecs.py).
+ * pcm: int16 LE | mulaw: G.711 u-law bytes | adpcm: IMA-ADPCM 256-byte blocks (505 samples)
+ *
+ * createDecoder(codec).push(bytes) -> Float32Array of every whole unit so far
+ * (partial samples / blocks wait for the next push); flush() decodes what is left.
+ * decode(codec, bytes) is push + flush for one self-contained payload.
+ */
+(function () {
+    const STEP_TABLE = [
+        7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+        50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+        253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+        1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+        3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+        11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+        32767
+    ];
+    const INDEX_ADJUST = [-1, -1, -1, -1, 2, 4, 6, 8];
+    const ADPCM_BLOCK_BYTES = 256;
+    const ADPCM_BLOCK_SAMPLES = 505;
+
+    const MULAW_TABLE = new Float32Array(256);
+    for (let i = 0; i < 256; i++) {
+        const u = ~i & 0xFF;
+        const mag = (((u & 0x0F) << 3) + 0x84) << ((u >> 4) & 0x07);
+        MULAW_TABLE[i] = ((u & 0x80) ? 0x84 - mag : mag - 0x84) / 32768;
+    }
+
+    function decodePCM(bytes) {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        const out = new Float32Array(bytes.byteLength >> 1);
+        for (let i = 0; i < out.length; i++) out[i] = view.getInt16(i * 2, true) / 32768;
+        return out;
+    }
+
+    function decodeMulaw(bytes) {
+        const out = new Float32Array(bytes.length);
+        for (let i = 0; i < bytes.length; i++) out[i] = MULAW_TABLE[bytes[i]];
+        return out;
+    }
+
+    // Whole blocks plus at most one short final block
+    function decodeADPCM(bytes) {
+        const blocks = Math.ceil(bytes.length / ADPCM_BLOCK_BYTES);
+        const tail = bytes.length - (blocks - 1) * ADPCM_BLOCK_BYTES;
+        if (tail < 4) return new Float32Array(0);
+        const out = new Float32Array((blocks - 1) * ADPCM_BLOCK_SAMPLES + 1 + 2 * (tail - 4));
+        let o = 0;
+        for (let start = 0; start < bytes.length; start += ADPCM_BLOCK_BYTES) {
+            const end = Math.min(start + ADPCM_BLOCK_BYTES, bytes.length);
+            let pred = (bytes[start] | (bytes[start + 1] << 8)) << 16 >> 16;
+            let index = Math.min(bytes[start + 2], 88);
+            out[o++] = pred / 32768;
+            for (let i = start + 4; i < end; i++) {
+                for (let nibble = bytes[i] & 0x0F, k = 0; k < 2; k++, nibble = bytes[i] >> 4) {
+                    const step = STEP_TABLE[index];
+                    let diff = step >> 3;
+                    if (nibble & 4) diff += step;
+                    if (nibble & 2) diff += step >> 1;
+                    if (nibble & 1) diff += step >> 2;
+                    pred = Math.max(-32768, Math.min(32767, (nibble & 8) ? pred - diff : pred + diff));
+                    index = Math.max(0, Math.min(88, index + INDEX_ADJUST[nibble & 7]));
+                    out[o++] = pred / 32768;
+                }
+            }
+        }
+        return out;
+    }
+
+    const CODECS = {
+        pcm: { unit: 2, decode: decodePCM },
+        mulaw: { unit: 1, decode: decodeMulaw },
+        adpcm: { unit: ADPCM_BLOCK_BYTES, decode: decodeADPCM },
+    };
+
+    function createDecoder(codec) {
+        const { unit, decode } = CODECS[codec] || CODECS.pcm;
+        let pending = new Uint8Array(0);
+        return {
+            push(bytes) {
+                if (pending.length) {
+                    const merged = new Uint8Array(pending.length + bytes.length);
+                    merged.set(pending);
+                    merged.set(bytes, pending.length);
+                    bytes = merged;
+                }
+                const whole = bytes.length - (bytes.length % unit);
+                pending = bytes.slice(whole);
+                return decode(bytes.subarray(0, whole));
+            },
+            flush() {
+                const rest = codec === 'adpcm' ? pending : pending.subarray(0, 0);
+                pending = new Uint8Array(0);
+                return decode(rest);
+            }
+        };
+    }
+
+    window.AudioCodecs = {
+        createDecoder,
+        decode(codec, bytes) {
+            return (CODECS[codec] || CODECS.pcm).decode(bytes);
+        }
+    };
+})();
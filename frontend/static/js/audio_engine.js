@@ -21,6 +21,28 @@ document.addEventListener('DOMContentLoaded', () => {
     const sendButton = document.getElementById('sendButton');
 
     // ---------- STATE ----------
+    // 🔑 Per-tab session id: backend keeps history, barge-in and VAD state per session
+    const sessionId = sessionStorage.getItem('sessionId') ||
+        (crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(16).slice(2)}`);
+    sessionStorage.setItem('sessionId', sessionId);
+
+    // 🔊 Inline audio: backend synthesizes phrases and streams PCM inside /api/stream_chat
+    const USE_INLINE_AUDIO = true;
+
+    // 📦 TTS audio encoding: IMA-ADPCM (~4x smaller) on mobile, raw PCM elsewhere (see audio_codecs.js)
+    const AUDIO_CODEC = /Mobi|Android/i.test(navigator.userAgent) ? 'adpcm' : 'pcm';
+
+    // 🔌 Duplex socket: mic, turns, text and sequenced PCM all over /ws/audio (falls back to HTTP if refused)
+    const USE_DUPLEX_WS = true;
+    const DUPLEX_PROTOCOL = 'baap.duplex.v1';
+    let discardThroughSeq = 0; // Audio frames with seq <= this belong to an interrupted turn
+
+    // 🫧 Filler: a cached "Hmm." the server sends while the answer is late; cross-faded into the answer
+    const FILLER_CROSSFADE_S = 0.12;
+    let fillerActive = false; // Audio scheduled now belongs to the filler
+    let fillerSources = [];
+    let turnTiming = null;    // Time to first sound (filler or answer) vs first answer audio
+
     let currentLang = 'en';
     let globalAudioCtx = null;
     let ttsNextStartTime = 0;
@@ -84,6 +106,8 @@ document.addEventListener('DOMContentLoaded', () => {
         ttsQueue = [];
         ttsCache.clear();
         ttsNextStartTime = 0;
+        fillerActive = false;
+        fillerSources = [];
 
         activeSources.forEach(s => { try { s.stop(0); } catch (e) { } });
         activeSources = [];
@@ -207,10 +231,22 @@ document.addEventListener('DOMContentLoaded', () => {
             audioWorkletNode = new AudioWorkletNode(ctx, 'recorder');
 
             const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-            socket = new WebSocket(`${protocol}//${window.location.host}/ws/audio`);
+            const wsUrl = `${protocol}//${window.location.host}/ws/audio?session_id=${encodeURIComponent(sessionId)}&codec=${AUDIO_CODEC}`;
+            socket = USE_DUPLEX_WS ? new WebSocket(wsUrl, [DUPLEX_PROTOCOL]) : new WebSocket(wsUrl);
+            socket.binaryType = 'arraybuffer';
 
             socket.onmessage = (e) => {
-                const data = json_safe_parse(e.data);
+                let data;
+                if (e.data instanceof ArrayBuffer) {
+                    // Duplex: [kind][payload] — 'A' frames carry [u32 seq][int16 PCM]
+                    const bytes = new Uint8Array(e.data);
+                    if (bytes[0] === 0x41) { handleDuplexAudio(e.data); return; }
+                    data = json_safe_parse(new TextDecoder().decode(bytes.subarray(1)));
+                    if (!data) return;
+                    if (handleDuplexEvent(data)) return;
+                } else {
+                    data = json_safe_parse(e.data);
+                }
                 if (!data) return;
 
                 // Update status if this is the first packet confirming connection
@@ -257,6 +293,7 @@ document.addEventListener('DOMContentLoaded', () => {
             };
 
             socket.onclose = () => {
+                isSubmitting = false;
                 console.warn("📡 Socket Closed. Reconnecting in 2s...");
                 setTimeout(() => { if (isRecognitionActive) initSensoryLayer(); }, 2000);
             };
@@ -267,7 +304,14 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (isMuted) return;
 
                 if (socket && socket.readyState === WebSocket.OPEN) {
-                    socket.send(e.data);
+                    if (isDuplex()) {
+                        const frame = new Uint8Array(1 + e.data.byteLength);
+                        frame[0] = 0x4D; // 'M'
+                        frame.set(new Uint8Array(e.data), 1);
+                        socket.send(frame);
+                    } else {
+                        socket.send(e.data);
+                    }
 
                     // 🧪 Visual Debug: Confirm capture
                     if (!document.body.classList.contains('speaking') && !isSubmitting) {
@@ -291,6 +335,74 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function json_safe_parse(str) { try { return JSON.parse(str); } catch (e) { return null; } }
 
+    // ---------- DUPLEX SOCKET ----------
+    function isDuplex() {
+        return socket && socket.readyState === WebSocket.OPEN && socket.protocol === DUPLEX_PROTOCOL;
+    }
+
+    // Control messages: binary 'J' frames on the duplex socket, JSON text on the legacy one
+    function sendControl(msg) {
+        if (!socket || socket.readyState !== WebSocket.OPEN) return;
+        if (socket.protocol === DUPLEX_PROTOCOL) {
+            const json = new TextEncoder().encode(JSON.stringify(msg));
+            const frame = new Uint8Array(1 + json.length);
+            frame[0] = 0x4A; // 'J'
+            frame.set(json, 1);
+            socket.send(frame);
+        } else {
+            socket.send(JSON.stringify(msg));
+        }
+    }
+
+    // Turn events that only the duplex socket sends; returns true when handled
+    function handleDuplexEvent(data) {
+        if (data.type === 'text' || data.type === 'audio_text' || data.type === 'filler') {
+            handleChatEvent(data);
+            return true;
+        }
+        if (data.type === 'interrupt') {
+            console.log("⚡ INTERRUPT (seq <=", data.seq, ")");
+            discardAudio(data.seq);
+            isSubmitting = false;
+            return true;
+        }
+        if (data.type === 'done') {
+            isSubmitting = false;
+            if (activeSources.length === 0) statusLabel.innerText = "Always Listening";
+            return true;
+        }
+        return false;
+    }
+
+    function handleDuplexAudio(buffer) {
+        if (buffer.byteLength < 6) return;
+        const seq = new DataView(buffer).getUint32(1, false);
+        if (seq <= discardThroughSeq || !globalAudioCtx) return;
+        const samples = AudioCodecs.decode(AUDIO_CODEC, new Uint8Array(buffer, 5));
+        if (samples.length === 0) return;
+        markSpeaking();
+        schedulePCM(globalAudioCtx, samples, seq);
+    }
+
+    // Stop only audio of the interrupted turn; frames of the next turn keep playing
+    function discardAudio(seq) {
+        discardThroughSeq = Math.max(discardThroughSeq, seq);
+        fillerActive = false;
+        fillerSources = [];
+        activeSources = activeSources.filter(s => {
+            if (s.seq !== undefined && s.seq <= discardThroughSeq) {
+                try { s.stop(0); } catch (e) { }
+                return false;
+            }
+            return true;
+        });
+        if (activeSources.length === 0) {
+            ttsNextStartTime = 0;
+            document.body.classList.remove('speaking');
+            document.body.classList.add('listening');
+        }
+    }
+
     // ---------- STT VISUAL ONLY ----------
     function initSTT() {
         const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
@@ -386,15 +498,22 @@ document.addEventListener('DOMContentLoaded', () => {
 
         statusLabel.innerText = "Thinking...";
         currentAbortController = new AbortController();
+        turnTiming = { start: performance.now(), sound: false };
 
         // Create new AI bubble for response
         currentAIBubble = addChatMessage('', 'ai');
 
+        // One socket for everything: the turn streams back as 'J' events and 'A' frames
+        if (isDuplex()) {
+            sendControl({ type: 'text', text, language: currentLang });
+            return; // isSubmitting is released by the 'done' / 'interrupt' events
+        }
+
         try {
             const resp = await fetch('/api/stream_chat', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ text, language: currentLang }),
+                body: JSON.stringify({ text, language: currentLang, session_id: sessionId, inline_audio: USE_INLINE_AUDIO, codec: AUDIO_CODEC }),
                 signal: currentAbortController.signal
             });
 
@@ -402,33 +521,24 @@ document.addEventListener('DOMContentLoaded', () => {
             const decoder = new TextDecoder();
             let partial = "";
 
+            // Length-prefixed frames ([kind][u32 len][payload]) when the server synthesizes inline
+            if (resp.headers.get('Content-Type') === 'application/vnd.baap.frames') {
+                await readFramedStream(reader);
+                return;
+            }
+
             while (true) {
                 const { value, done } = await reader.read();
                 if (done || isInterrupted) break;
 
-                const lines = (partial + decoder.decode(value)).split('\n');
+                const lines = (partial + decoder.decode(value, { stream: true })).split('\n');
                 partial = lines.pop();
 
                 for (const line of lines) {
                     if (!line.trim() || isInterrupted) continue;
                     const data = json_safe_parse(line);
                     if (!data) continue;
-
-                    if (data.type === 'text') {
-                        if (currentAIBubble) {
-                            currentAIBubble.textContent += data.content;
-                            chatMessages.scrollTop = chatMessages.scrollHeight;
-
-                            // If chat is collapsed, show activity
-                            if (chatWrapper && chatWrapper.classList.contains('collapsed')) {
-                                chatToggleBtn.classList.add('has-new');
-                            }
-                        }
-                    }
-                    else if (data.type === 'audio_text') {
-                        ttsQueue.push({ text: data.content, lang: data.lang });
-                        if (!isProcessingTTS) processTTS();
-                    }
+                    handleChatEvent(data);
                 }
             }
         } catch (e) {
@@ -440,6 +550,111 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function handleChatEvent(data) {
+        if (data.type === 'text') {
+            if (currentAIBubble) {
+                currentAIBubble.textContent += data.content;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+
+                // If chat is collapsed, show activity
+                if (chatWrapper && chatWrapper.classList.contains('collapsed')) {
+                    chatToggleBtn.classList.add('has-new');
+                }
+            }
+        }
+        else if (data.type === 'filler') {
+            fillerActive = true;
+            // Inline turns send its audio next; NDJSON turns fetch it (a cache hit, never synthesized)
+            if (data.bytes === undefined) playFiller(data.content, data.lang);
+        }
+        else if (data.type === 'audio_text') {
+            fillerActive = false; // Audio from here on is the answer
+            if (data.seq === undefined) {
+                ttsQueue.push({ text: data.content, lang: data.lang });
+                if (!isProcessingTTS) processTTS();
+            }
+        }
+    }
+
+    async function playFiller(text, lang) {
+        try {
+            const ctx = await getAudioContext();
+            if (!ttsAbortController) ttsAbortController = new AbortController();
+            const resp = await fetch(`/api/v1/generate?codec=${AUDIO_CODEC}`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ text, lang, session_id: sessionId }),
+                signal: ttsAbortController.signal
+            });
+            const samples = AudioCodecs.decode(AUDIO_CODEC, new Uint8Array(await resp.arrayBuffer()));
+            // Too late if the answer already started
+            if (fillerActive && !isInterrupted && samples.length > 0) {
+                markSpeaking();
+                schedulePCM(ctx, samples);
+            }
+        } catch (err) { }
+    }
+
+    // The answer starts now rather than after the filler: filler fades out as the answer fades in
+    function crossfadeFromFiller(ctx, fader) {
+        const now = ctx.currentTime;
+        const end = now + FILLER_CROSSFADE_S;
+        fillerSources.forEach(s => {
+            s.fader.gain.setValueAtTime(s.fader.gain.value, now);
+            s.fader.gain.linearRampToValueAtTime(0, end);
+            try { s.stop(end); } catch (e) { }
+        });
+        fillerSources = [];
+        fader.gain.setValueAtTime(0, now);
+        fader.gain.linearRampToValueAtTime(1, end);
+        ttsNextStartTime = now;
+    }
+
+    function logTurnTiming(isFiller) {
+        if (!turnTiming) return;
+        const ms = Math.round(performance.now() - turnTiming.start);
+        if (!turnTiming.sound) {
+            turnTiming.sound = true;
+            console.log(`⏱️ Time to first sound: ${ms} ms${isFiller ? ' (filler)' : ''}`);
+        }
+        if (!isFiller) {
+            console.log(`⏱️ Time to first answer audio: ${ms} ms`);
+            turnTiming = null;
+        }
+    }
+
+    async function readFramedStream(reader) {
+        const ctx = await getAudioContext();
+        const textDecoder = new TextDecoder();
+        let buf = new Uint8Array(0);
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done || isInterrupted) break;
+
+            const merged = new Uint8Array(buf.length + value.length);
+            merged.set(buf);
+            merged.set(value, buf.length);
+            buf = merged;
+
+            while (buf.length >= 5 && !isInterrupted) {
+                const len = new DataView(buf.buffer, buf.byteOffset + 1, 4).getUint32(0, false);
+                if (buf.length < 5 + len) break;
+                const kind = String.fromCharCode(buf[0]);
+                const payload = buf.subarray(5, 5 + len);
+                buf = buf.subarray(5 + len);
+
+                if (kind === 'J') {
+                    const data = json_safe_parse(textDecoder.decode(payload));
+                    if (data) handleChatEvent(data);
+                } else if (kind === 'A' && payload.length >= 2) {
+                    markSpeaking();
+                    schedulePCM(ctx, AudioCodecs.decode(AUDIO_CODEC, payload));
+                }
+            }
+        }
+    }
+
     // ---------- TTS ----------
     // ---------- TTS PRE-FETCH OPTIMIZATION ----------
     async function processTTS() {
@@ -464,13 +679,7 @@ document.addEventListener('DOMContentLoaded', () => {
     async function performAudioPlayback(text, lang) {
         try {
             const ctx = await getAudioContext();
-            document.body.classList.remove('listening');
-            document.body.classList.add('speaking');
-
-            // 🔥 SYNC: Tell Backend AI is talking
-            if (socket && socket.readyState === WebSocket.OPEN) {
-                socket.send(JSON.stringify({ type: 'ai_state', status: 'speaking' }));
-            }
+            markSpeaking();
 
             // 🔥 FETCH Audio with Pre-fetch Support
             if (!ttsAbortController) ttsAbortController = new AbortController();
@@ -481,26 +690,26 @@ document.addEventListener('DOMContentLoaded', () => {
                 resp = ttsCache.get(text);
                 ttsCache.delete(text);
             } else {
-                resp = await fetch("/api/v1/generate", {
+                resp = await fetch(`/api/v1/generate?codec=${AUDIO_CODEC}`, {
                     method: "POST",
                     headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify({ text, lang }),
+                    body: JSON.stringify({ text, lang, session_id: sessionId }),
                     signal: ttsAbortController.signal
                 });
             }
 
             const reader = resp.body.getReader();
-            let leftover = new Uint8Array(0);
+            const decoder = AudioCodecs.createDecoder(AUDIO_CODEC);
 
             // Pre-fetch next item in queue if available
             if (ttsQueue.length > 0) {
                 const next = ttsQueue[0];
                 console.log("🚚 Pre-fetching next chunk:", next.text.substring(0, 20));
                 // We don't await this, just trigger it
-                fetch("/api/v1/generate", {
+                fetch(`/api/v1/generate?codec=${AUDIO_CODEC}`, {
                     method: "POST",
                     headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify({ text: next.text, lang: next.lang }),
+                    body: JSON.stringify({ text: next.text, lang: next.lang, session_id: sessionId }),
                     signal: ttsAbortController.signal
                 }).then(r => ttsCache.set(next.text, r));
             }
@@ -510,64 +719,66 @@ document.addEventListener('DOMContentLoaded', () => {
 
                 // 🔥 Re-Sync: Tell backend we are still speaking on every chunk 
                 // to keep VAD strictness refreshed
-                if (socket && socket.readyState === WebSocket.OPEN) {
-                    socket.send(JSON.stringify({ type: 'ai_state', status: 'speaking' }));
-                }
+                sendControl({ type: 'ai_state', status: 'speaking' });
 
                 const { done, value } = await reader.read();
+                // Decoder holds back partial samples / ADPCM blocks until the next read
+                const samples = done ? decoder.flush() : decoder.push(value);
+                if (samples.length > 0) schedulePCM(ctx, samples);
                 if (done) break;
+            }
+        } catch (err) { }
+    }
 
-                const combined = new Uint8Array(leftover.length + value.length);
-                combined.set(leftover);
-                combined.set(value, leftover.length);
-
-                const usable = combined.length - (combined.length % 2);
-                const usableData = combined.subarray(0, usable);
-                leftover = combined.subarray(usable);
-
-                if (usable === 0) continue;
+    function markSpeaking() {
+        document.body.classList.remove('listening');
+        document.body.classList.add('speaking');
 
-                const f32 = new Float32Array(usable / 2);
-                const view = new DataView(usableData.buffer, usableData.byteOffset, usableData.byteLength);
+        // 🔥 SYNC: Tell Backend AI is talking
+        sendControl({ type: 'ai_state', status: 'speaking' });
+    }
 
-                for (let i = 0; i < f32.length; i++) {
-                    f32[i] = view.getInt16(i * 2, true) / 32768.0;
+    // Schedule one block of decoded samples (Float32Array) for gapless playback
+    // (`seq`: duplex frame number, so an interrupt can stop exactly the old turn's audio)
+    function schedulePCM(ctx, f32, seq) {
+        const buffer = ctx.createBuffer(1, f32.length, 22050);
+        buffer.getChannelData(0).set(f32);
+
+        const source = ctx.createBufferSource();
+        source.buffer = buffer;
+        source.seq = seq;
+        source.fader = ctx.createGain(); // Cross-fade between filler and answer
+        source.connect(source.fader);
+        source.fader.connect(ctx.destination);
+
+        logTurnTiming(fillerActive);
+        if (fillerActive) fillerSources.push(source);
+        else if (fillerSources.length > 0) crossfadeFromFiller(ctx, source.fader);
+
+        const now = ctx.currentTime;
+        // Tighten the gap for Jarvis-feel (0.02 instead of 0.05)
+        if (ttsNextStartTime < now) ttsNextStartTime = now + 0.02;
+        source.start(ttsNextStartTime);
+
+        activeSources.push(source);
+        ttsNextStartTime += buffer.duration;
+
+        source.onended = () => {
+            activeSources = activeSources.filter(s => s !== source);
+            fillerSources = fillerSources.filter(s => s !== source);
+
+            // 🔥 Fixed: Only switch back to listening if ALL sentences are done
+            if (activeSources.length === 0 && !isInterrupted && !isProcessingTTS && ttsQueue.length === 0) {
+                document.body.classList.remove('speaking');
+                lastAIEndListenTime = Date.now();
+
+                if (recognition) {
+                    try { recognition.stop(); } catch (e) { }
                 }
 
-                const buffer = ctx.createBuffer(1, f32.length, 22050);
-                buffer.getChannelData(0).set(f32);
-
-                const source = ctx.createBufferSource();
-                source.buffer = buffer;
-                source.connect(ctx.destination);
-
-                const now = ctx.currentTime;
-                // Tighten the gap for Jarvis-feel (0.02 instead of 0.05)
-                if (ttsNextStartTime < now) ttsNextStartTime = now + 0.02;
-                source.start(ttsNextStartTime);
-
-                activeSources.push(source);
-                ttsNextStartTime += buffer.duration;
-
-                source.onended = () => {
-                    activeSources = activeSources.filter(s => s !== source);
-
-                    // 🔥 Fixed: Only switch back to listening if ALL sentences are done
-                    if (activeSources.length === 0 && !isInterrupted && !isProcessingTTS && ttsQueue.length === 0) {
-                        document.body.classList.remove('speaking');
-                        lastAIEndListenTime = Date.now();
-
-                        if (recognition) {
-                            try { recognition.stop(); } catch (e) { }
-                        }
-
-                        if (socket && socket.readyState === WebSocket.OPEN) {
-                            socket.send(JSON.stringify({ type: 'ai_state', status: 'listening' }));
-                        }
-                    }
-                };
+                sendControl({ type: 'ai_state', status: 'listening' });
             }
-        } catch (err) { }
+        };
     }
 
     // ---------- UI ----------
@@ -580,7 +791,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // 2. Call backend reset
             try {
-                await fetch('/api/reset', { method: 'POST' });
+                await fetch(`/api/reset?session_id=${encodeURIComponent(sessionId)}`, { method: 'POST' });
             } catch (e) { }
 
             // 3. Force full page reload for clean state
@@ -617,9 +828,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 recognition.lang = { en: 'en-IN', hi: 'hi-IN', mr: 'mr-IN' }[currentLang];
                 recognition.abort();
             }
-            if (socket && socket.readyState === WebSocket.OPEN) {
-                socket.send(JSON.stringify({ type: 'lang_update', lang: currentLang }));
-            }
+            sendControl({ type: 'lang_update', lang: currentLang });
         });
     });
 
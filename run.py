@@ -15,4 +15,14 @@ if __name__ == "__main__":
     port = int(os.getenv("APP_PORT", 8082))
     host = os.getenv("APP_HOST", "localhost")
     
-    uvicorn.run("app.main:app", host=host, port=port, reload=True)
+    # Dev auto-reload restarts the process (and drops every session); APP_RELOAD=0 in production,
+    # where voices are updated through /admin/voices/{voice}/swap instead
+    reload = os.getenv("APP_RELOAD", "1") == "1"
+    # Several workers need a shared session store (SESSION_STORE=sqlite); each loads its own voices
+    workers = int(os.getenv("APP_WORKERS", "1"))
+    if workers > 1:
+        if settings.SESSION_STORE == "memory":
+            sys.exit("APP_WORKERS > 1 needs a shared session store: set SESSION_STORE=sqlite")
+        reload = False  # Uvicorn can't reload a multi-worker server
+
+    uvicorn.run("app.main:app", host=host, port=port, reload=reload, workers=workers)
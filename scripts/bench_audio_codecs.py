@@ -0,0 +1,71 @@
+"""
+TTS output codec benchmark (app/services/audio_codecs.py).
+
+Encodes speech-like int16 audio at the voice sample rate in the chunk sizes
+the server actually uses and reports, per codec:
+  - encode cost in ms per second of audio (and how many times faster than real time)
+  - wire bytes per second of audio and compression vs raw PCM
+  - SNR of the decoded audio
+
+Usage: python scripts/bench_audio_codecs.py [seconds_of_audio]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+from app.services import audio_codecs
+
+SAMPLE_RATE = 22050
+CHUNKS = {
+    "sentence (2s)": 2.0,   # /api/v1/generate and inline frames
+    "ws frame (0.2s)": 0.2,  # Worst case: encoding every duplex frame on its own
+}
+
+
+def speech_like(seconds: float) -> np.ndarray:
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    voiced = np.sin(2 * np.pi * 140 * t) + 0.5 * np.sin(2 * np.pi * 280 * t) + 0.25 * np.sin(2 * np.pi * 560 * t)
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)  # Syllable-rate loudness
+    return (6000 * voiced * envelope + 400 * rng.standard_normal(n)).astype(np.int16)
+
+
+def snr_db(ref, out):
+    ref = ref.astype(np.float64)
+    err = ref - out[:ref.shape[0]].astype(np.float64)
+    return 10 * np.log10((ref ** 2).sum() / max((err ** 2).sum(), 1e-9))
+
+
+def bench(codec: str, audio: np.ndarray, chunk_s: float):
+    step = int(chunk_s * SAMPLE_RATE)
+    chunks = [audio[i:i + step].tobytes() for i in range(0, audio.shape[0], step)]
+    audio_s = audio.shape[0] / SAMPLE_RATE
+
+    t0 = time.perf_counter()
+    encoded = [audio_codecs.encode_chunk(codec, c) for c in chunks]
+    elapsed = time.perf_counter() - t0
+
+    decoded = np.concatenate([audio_codecs.decode(codec, e)[:len(c) // 2] for c, e in zip(chunks, encoded)])
+    size = sum(len(e) for e in encoded)
+    return elapsed * 1000 / audio_s, size / audio_s, audio.nbytes / size, snr_db(audio, decoded)
+
+
+def main(seconds: float):
+    audio = speech_like(seconds)
+    print(f"🧪 {seconds:g}s of speech-like audio @ {SAMPLE_RATE} Hz")
+    for label, chunk_s in CHUNKS.items():
+        print(f"   Chunks: {label}")
+        for codec in audio_codecs.ENCODERS:
+            ms, bps, ratio, snr = bench(codec, audio, chunk_s)
+            quality = "lossless" if snr > 150 else f"SNR {snr:4.1f} dB"
+            print(f"     {codec:<6} encode {ms:8.3f} ms/s ({1000 / ms:8.0f}x RT)  {bps / 1024:5.1f} KiB/s  "
+                  f"{ratio:4.2f}:1  {quality}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 20.0)
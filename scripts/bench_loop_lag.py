@@ -0,0 +1,101 @@
+"""
+Event-loop lag benchmark for /api/stream_chat.
+
+Runs N concurrent turns against a local fake LLM (token stream with realistic
+inter-token gaps) and samples how late a 1 ms ticker wakes up on the same loop.
+If the Gemini stream is consumed on the loop, lag jumps to the token gap.
+
+Usage: python scripts/bench_loop_lag.py [turns] [tokens_per_turn]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+
+TOKEN_GAP_S = 0.02
+LAG_BUDGET_MS = 5.0
+
+
+class _FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeAsyncModels:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    async def generate_content_stream(self, model, contents, config=None):
+        async def gen():
+            for i in range(self.tokens):
+                await asyncio.sleep(TOKEN_GAP_S)
+                yield _FakeChunk("word, " if i % 8 == 7 else "word ")
+        return gen()
+
+
+class _FakeAio:
+    def __init__(self, tokens):
+        self.models = _FakeAsyncModels(tokens)
+
+
+class FakeGeminiClient:
+    def __init__(self, tokens):
+        self.aio = _FakeAio(tokens)
+
+
+async def ticker(samples, stop):
+    interval = 0.001
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - t0 - interval) * 1000)
+
+
+async def run_turn(main, text, session_id="bench"):
+    resp = await main.stream_chat(main.TextRequest(text=text, language="en", session_id=session_id))
+    n = 0
+    async for _ in resp.body_iterator:
+        n += 1
+    return n
+
+
+async def main_bench(turns, tokens):
+    import app.main as main
+    main.gemini_client = FakeGeminiClient(tokens)
+    # Warm-up turn so one-off lazy imports don't count as loop lag
+    await run_turn(main, "warm up")
+
+    # Idle noise floor of this box, for comparison
+    idle, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(idle, stop))
+    await asyncio.sleep(0.5)
+    stop.set()
+    await tick
+    idle.sort()
+
+    samples, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(samples, stop))
+    t0 = time.perf_counter()
+    packets = await asyncio.gather(*(run_turn(main, f"hello {i}", f"bench-{i}") for i in range(turns)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await tick
+
+    samples.sort()
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"🧪 {turns} concurrent turns x {tokens} tokens in {elapsed:.2f}s ({sum(packets)} packets)")
+    print(f"   Idle floor p99={idle[int(len(idle) * 0.99) - 1]:.2f}ms")
+    print(f"   Loop lag p50={p50:.2f}ms p99={p99:.2f}ms max={samples[-1]:.2f}ms")
+    print(f"   {'✅' if p99 < LAG_BUDGET_MS else '❌'} p99 budget {LAG_BUDGET_MS}ms")
+
+
+if __name__ == "__main__":
+    n_turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    n_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    asyncio.run(main_bench(n_turns, n_tokens))
@@ -0,0 +1,76 @@
+"""
+Synthesis throughput vs. thread settings (app/core/runtime_resources.py).
+
+Runs the same phrases through one voice for every combination of ONNX
+Runtime intra-op threads and concurrent synthesis workers, and reports
+phrases/s, x realtime and per-phrase latency (p50 / p95). The best rows
+have intra-op threads x workers close to the core count.
+
+Usage: python scripts/bench_ort_threads.py [lang] [phrases] [max_workers]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+PHRASES = [
+    "Hello! It is lovely to hear from you again today.",
+    "Sure, I can help you with that right away.",
+    "That sounds like a wonderful plan for the weekend.",
+    "Let me think about it for a second, okay?",
+]
+
+
+def thread_counts(cpus: int):
+    counts = [1, 2, 4, 8, 16]
+    return sorted({c for c in counts if c <= cpus} | {cpus})
+
+
+def run(voice, workers: int, n: int):
+    from app.services.piper_synth import iter_sentence_audio
+
+    def synth(text):
+        t0 = time.perf_counter()
+        samples = sum(a.shape[0] for a in iter_sentence_audio(voice, text))
+        return time.perf_counter() - t0, samples
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(synth, (PHRASES[i % len(PHRASES)] for i in range(n))))
+    elapsed = time.perf_counter() - t0
+    latencies = sorted(r[0] * 1000 for r in results)
+    audio_s = sum(r[1] for r in results) / voice.config.sample_rate
+    return n / elapsed, audio_s / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main(lang: str, n: int, max_workers: int):
+    from app.core import runtime_resources
+    from app.core.config import settings
+    from app.services.piper_synth import iter_sentence_audio
+
+    model_path = settings.PIPER_MODELS[lang]
+    cpus = runtime_resources.available_cpus()
+    print(f"🧪 {n} phrases, voice={lang}, cpus={cpus}")
+    print(f"   {'intra':>5} {'workers':>7} {'phrases/s':>10} {'x RT':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    best = None
+    for intra in thread_counts(cpus):
+        settings.ORT_INTRA_OP_THREADS = intra
+        voice = runtime_resources.load_voice(model_path, f"{model_path}.json")
+        for _ in iter_sentence_audio(voice, PHRASES[0]):  # Warm-up
+            pass
+        for workers in [w for w in (1, 2, 4, 8) if w <= max_workers]:
+            rate, rt, p50, p95 = run(voice, workers, n)
+            print(f"   {intra:>5} {workers:>7} {rate:>10.1f} {rt:>7.1f} {p50:>8.1f} {p95:>8.1f}")
+            if best is None or rate > best[0]:
+                best = (rate, intra, workers)
+    print(f"✅ Best: ORT_INTRA_OP_THREADS={best[1]} with {best[2]} workers ({best[0]:.1f} phrases/s)")
+
+
+if __name__ == "__main__":
+    lang = sys.argv[1] if len(sys.argv) > 1 else "en"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    main(lang, n, max_workers)
@@ -0,0 +1,91 @@
+"""
+Allocation microbenchmark: legacy list/bytes audio handling vs PCMBuffer/PCMRing.
+
+Measures wall time and bytes allocated per step (tracemalloc peak deltas) for
+ 1. assembling a long TTS reply from per-sentence float chunks
+ 2. framing a mic stream into 512-sample VAD windows
+
+Usage: python scripts/bench_pcm_buffer.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+from app.services.pcm_buffer import PCMBuffer, PCMRing
+
+SENTENCES = [np.random.uniform(-1, 1, 22050 * 3).astype(np.float32) for _ in range(40)]  # 2 min reply
+MIC_FRAMES = [np.random.randint(-3000, 3000, 480, dtype=np.int16).tobytes() for _ in range(3000)]  # ~90 s
+
+
+def tts_legacy():
+    state = {"all_bytes": b""}
+
+    def step(audio):
+        audio_int16 = (audio * 32767).astype(np.int16)
+        state["all_bytes"] += audio_int16.tobytes()
+    return SENTENCES, step, lambda: len(state["all_bytes"])
+
+
+def tts_buffer():
+    pcm = PCMBuffer()
+    return SENTENCES, pcm.append_float, lambda: len(pcm.tobytes())
+
+
+def vad_legacy():
+    state = {"rolling": [], "frames": 0}
+
+    def step(data):
+        state["rolling"].extend(np.frombuffer(data, dtype=np.int16).tolist())
+        while len(state["rolling"]) >= 512:
+            chunk = np.array(state["rolling"][:512], dtype=np.float32) / 32768.0
+            state["rolling"] = state["rolling"][512:]
+            state["frames"] += float(np.sqrt(np.mean(chunk ** 2))) >= 0
+    return MIC_FRAMES, step, lambda: state["frames"]
+
+
+def vad_ring():
+    ring, frame, state = PCMRing(512), np.empty(512, dtype=np.float32), {"frames": 0}
+
+    def step(data):
+        ring.write(data)
+        while ring.read_frame(frame):
+            state["frames"] += float(np.sqrt(np.dot(frame, frame) / 512)) >= 0
+    return MIC_FRAMES, step, lambda: state["frames"]
+
+
+def measure(factory):
+    """Wall time (untraced run) and bytes allocated summed over every step (traced run)."""
+    inputs, step, finish = factory()
+    t0 = time.perf_counter()
+    for item in inputs:
+        step(item)
+    finish()
+    elapsed = time.perf_counter() - t0
+
+    inputs, step, finish = factory()
+    allocated = 0
+    tracemalloc.start()
+    for item in inputs:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        step(item)
+        allocated += tracemalloc.get_traced_memory()[1] - base
+    result = finish()
+    tracemalloc.stop()
+    return result, elapsed, allocated
+
+
+if __name__ == "__main__":
+    print("🧪 PCM buffer microbenchmark")
+    for name, legacy, new in (("TTS assemble", tts_legacy, tts_buffer), ("VAD framing", vad_legacy, vad_ring)):
+        r_old, t_old, p_old = measure(legacy)
+        r_new, t_new, p_new = measure(new)
+        assert r_old == r_new, (r_old, r_new)
+        print(f"   {name:<13} legacy {t_old * 1000:7.1f}ms alloc {p_old / 1e6:8.1f}MB | "
+              f"buffer {t_new * 1000:7.1f}ms alloc {p_new / 1e6:8.1f}MB ({p_old / max(p_new, 1):.0f}x less)")
+
@@ -0,0 +1,94 @@
+"""
+Phonemization share of synthesis time, with and without the phoneme cache
+(app/services/phoneme_cache.py).
+
+For each voice, a turn's worth of replies is synthesized sentence by sentence
+three ways:
+  - no cache: espeak on every phrase (today's cost)
+  - warm phrases: the same replies again, served from the phrase tier
+  - new phrases: different replies made of words already seen (word tier)
+and reports phonemize vs ONNX time per phrase, the phonemize share of the
+total, and whether the word-assembled IDs equal espeak's own.
+
+Usage: python scripts/bench_phoneme_cache.py [rounds]
+"""
+import os
+import sys
+import time
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+# Replies in the register the LLM answers in; NEW reuses SEEN's words in new orders
+SEEN = {
+    "en": ["Sure, I can help you with that today.", "Your order is ready. Please check your email.",
+           "Thank you for calling, have a nice day!"],
+    "hi": ["जी हाँ, मैं आपकी मदद कर सकता हूँ।", "आपका ऑर्डर तैयार है। कृपया अपना ईमेल देखिए।",
+           "कॉल करने के लिए धन्यवाद, आपका दिन शुभ हो!"],
+    "mr": ["हो, मी तुमची मदत करू शकतो.", "तुमची ऑर्डर तयार आहे. कृपया तुमचा ईमेल बघा.",
+           "कॉल केल्याबद्दल धन्यवाद, तुमचा दिवस छान जावो!"],
+}
+NEW = {
+    "en": ["Sure, I can help you today.", "Please check your email."],
+    "hi": ["जी हाँ, आपका ऑर्डर तैयार है।", "कृपया अपना ईमेल देखिए।"],
+    "mr": ["हो, तुमची ऑर्डर तयार आहे.", "कृपया तुमचा ईमेल बघा."],
+}
+
+
+def synth(voice, phrases, phonemize, rounds: int):
+    from app.services.piper_synth import phoneme_ids_to_audio
+
+    phonemize_s = onnx_s = 0.0
+    results = []
+    for _ in range(rounds):
+        for text in phrases:
+            t0 = time.perf_counter()
+            ids = phonemize(text)
+            phonemize_s += time.perf_counter() - t0
+            results.append(ids)
+            t0 = time.perf_counter()
+            for sentence in ids:
+                phoneme_ids_to_audio(voice, sentence)
+            onnx_s += time.perf_counter() - t0
+    n = rounds * len(phrases)
+    return phonemize_s * 1000 / n, onnx_s * 1000 / n, results
+
+
+def report(label, phonemize_ms, onnx_ms):
+    share = 100 * phonemize_ms / (phonemize_ms + onnx_ms)
+    print(f"     {label:<14} phonemize {phonemize_ms:7.3f} ms  onnx {onnx_ms:8.2f} ms  -> {share:5.1f}% of synthesis")
+
+
+def main(rounds: int):
+    from app.core import runtime_resources
+    from app.core.config import settings
+    from app.services.phoneme_cache import PhonemeCache
+    from app.services.piper_synth import sentence_ids
+
+    print(f"🧪 {rounds} rounds per phrase set")
+    for lang, model_path in settings.PIPER_MODELS.items():
+        if lang not in SEEN:
+            continue
+        voice = runtime_resources.load_voice(model_path, f"{model_path}.json")
+        synth(voice, SEEN[lang][:1], lambda t: sentence_ids(voice, t), 1)  # Warm-up
+        print(f"   Voice: {lang}")
+        phonemize_ms, onnx_ms, _ = synth(voice, SEEN[lang] + NEW[lang], lambda t: sentence_ids(voice, t), rounds)
+        report("no cache", phonemize_ms, onnx_ms)
+
+        cache = PhonemeCache(voice, max_bytes=4 * 1024 * 1024, words=True)
+        for text in SEEN[lang]:
+            cache.phonemize_ids(text)
+        phonemize_ms, onnx_ms, _ = synth(voice, SEEN[lang], cache.phonemize_ids, rounds)
+        report("warm phrases", phonemize_ms, onnx_ms)
+
+        cache.entries = type(cache.entries)((k, v) for k, v in cache.entries.items() if k[0] == "w")
+        phonemize_ms, onnx_ms, results = synth(voice, NEW[lang], cache.phonemize_ids, 1)
+        report("new phrases", phonemize_ms, onnx_ms)
+        exact = sum(ids == sentence_ids(voice, text) for ids, text in zip(results, NEW[lang]))
+        stats = cache.snapshot()
+        print(f"     word tier: {stats['word_hits']} assembled, {stats['misses'] - len(SEEN[lang])} phonemized, "
+              f"{exact}/{len(NEW[lang])} identical to espeak")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
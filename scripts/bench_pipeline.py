@@ -0,0 +1,122 @@
+"""
+Turn pipeline benchmark for /api/stream_chat.
+
+Runs concurrent turns against a local fake LLM (a "thinking" pause, then a
+token stream) and reports:
+  - event-loop wakeups (callbacks run) per turn
+  - finish latency: LLM stream exhausted -> HTTP stream closed
+  - interrupt latency: turn cancelled -> "interrupt" packet delivered
+
+Usage: python scripts/bench_pipeline.py [turns] [tokens_per_turn]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+
+THINK_S = 0.3
+TOKEN_GAP_S = 0.005
+
+
+class _FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeAsyncModels:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.finished_at = {}  # prompt -> perf_counter when the stream ran out
+
+    async def generate_content_stream(self, model, contents, config=None):
+        async def gen():
+            await asyncio.sleep(THINK_S)
+            for i in range(self.tokens):
+                await asyncio.sleep(TOKEN_GAP_S)
+                yield _FakeChunk("word. " if i % 8 == 7 else "word ")
+            self.finished_at[contents] = time.perf_counter()
+        return gen()
+
+
+class _FakeAio:
+    def __init__(self, tokens):
+        self.models = _FakeAsyncModels(tokens)
+
+
+class FakeGeminiClient:
+    def __init__(self, tokens):
+        self.aio = _FakeAio(tokens)
+
+
+def count_wakeups():
+    """Patches asyncio's Handle._run to count every callback the loop runs."""
+    counter = {"n": 0}
+    original = asyncio.events.Handle._run
+
+    def _run(self):
+        counter["n"] += 1
+        return original(self)
+    asyncio.events.Handle._run = _run
+    return counter
+
+
+def pct(data, p):
+    data = sorted(data)
+    return data[min(len(data) - 1, int(len(data) * p))]
+
+
+async def finish_turn(main, client, i):
+    resp = await main.stream_chat(main.TextRequest(text=f"hello {i}", language="en", session_id=f"bench-{i}"))
+    async for _ in resp.body_iterator:
+        pass
+    done = time.perf_counter()
+    ends = [t for prompt, t in client.aio.models.finished_at.items() if f'"hello {i}"' in prompt]
+    return (done - ends[0]) * 1000 if ends else None
+
+
+async def interrupt_turn(main, session_manager, i):
+    resp = await main.stream_chat(main.TextRequest(text=f"stop {i}", language="en", session_id=f"bench-int-{i}"))
+    cancelled_at = None
+    n = 0
+    async for pkt in resp.body_iterator:
+        n += 1
+        if n == 3:
+            cancelled_at = time.perf_counter()
+            session_manager.get(f"bench-int-{i}").interrupt_manager.turn.cancel()
+        elif cancelled_at and '"interrupt"' in str(pkt):
+            return (time.perf_counter() - cancelled_at) * 1000
+    return None
+
+
+async def main_bench(turns, tokens):
+    import app.main as main
+    from app.services.session_manager import session_manager
+    client = FakeGeminiClient(tokens)
+    main.gemini_client = client
+    await finish_turn(main, client, -1)  # Warm-up: lazy imports, first-call costs
+
+    wakeups = count_wakeups()
+    t0 = time.perf_counter()
+    finish = await asyncio.gather(*(finish_turn(main, client, i) for i in range(turns)))
+    elapsed = time.perf_counter() - t0
+    per_turn = wakeups["n"] / turns
+
+    interrupt = await asyncio.gather(*(interrupt_turn(main, session_manager, i) for i in range(turns)))
+    finish = [f for f in finish if f is not None]
+    interrupt = [x for x in interrupt if x is not None]
+
+    print(f"🧪 {turns} concurrent turns x {tokens} tokens in {elapsed:.2f}s")
+    print(f"   Wakeups per turn: {per_turn:.0f} ({tokens} LLM tokens)")
+    print(f"   Finish latency    p50={pct(finish, 0.5):.2f}ms p99={pct(finish, 0.99):.2f}ms")
+    if interrupt:
+        print(f"   Interrupt latency p50={pct(interrupt, 0.5):.2f}ms p99={pct(interrupt, 0.99):.2f}ms")
+
+
+if __name__ == "__main__":
+    n_turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    n_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    asyncio.run(main_bench(n_turns, n_tokens))
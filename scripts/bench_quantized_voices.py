@@ -0,0 +1,114 @@
+"""
+Full-precision vs INT8 voices (scripts/quantize_voices.py, PIPER_QUANTIZED).
+
+Each variant is loaded in a fresh process so its resident memory can be
+measured on its own. On a fixed phrase set it then reports:
+  - real-time factor (synthesis time / audio duration; lower is faster)
+  - model RSS (resident memory added by loading the voice)
+  - similarity to the full-precision audio: cosine similarity of the
+    log-magnitude spectrograms (1.0 = identical) and the duration ratio
+
+Both variants run with the noise scales at 0 so the output is repeatable and
+only quantization separates them.
+
+Usage: python scripts/bench_quantized_voices.py [langs (default all)] [rounds]
+"""
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+PHRASES = {
+    "en": ["Hello! It is lovely to hear from you again today.", "Your order is ready. Please check your email.",
+           "That sounds like a wonderful plan for the weekend."],
+    "hi": ["नमस्ते! आज आपसे बात करके अच्छा लगा।", "आपका ऑर्डर तैयार है। कृपया अपना ईमेल देखिए।",
+           "यह सप्ताहांत के लिए बहुत अच्छी योजना है।"],
+    "mr": ["नमस्कार! आज तुमच्याशी बोलून छान वाटलं.", "तुमची ऑर्डर तयार आहे. कृपया तुमचा ईमेल बघा.",
+           "आठवड्याच्या शेवटासाठी ही छान योजना आहे."],
+}
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_variant(model_path: str, phrases, rounds: int):
+    """In a child process: (rss bytes, synthesis seconds, audio seconds, audio per phrase)."""
+    from app.core import runtime_resources
+    from app.services.piper_synth import iter_sentence_audio
+
+    before = rss_bytes()
+    voice = runtime_resources.load_voice(model_path, f"{model_path}.json")
+    voice.config.noise_scale = voice.config.noise_w_scale = 0.0
+    for _ in iter_sentence_audio(voice, phrases[0]):  # Warm-up
+        pass
+    rss = rss_bytes() - before
+
+    audio, synth_s = [], 0.0
+    for _ in range(rounds):
+        audio = []
+        for text in phrases:
+            t0 = time.perf_counter()
+            audio.append(np.concatenate(list(iter_sentence_audio(voice, text))))
+            synth_s += time.perf_counter() - t0
+    audio_s = rounds * sum(a.shape[0] for a in audio) / voice.config.sample_rate
+    return rss, synth_s, audio_s, audio
+
+
+def log_spectrogram(audio: np.ndarray, n_fft: int = 1024, hop: int = 256) -> np.ndarray:
+    if audio.shape[0] < n_fft:
+        audio = np.pad(audio, (0, n_fft - audio.shape[0]))
+    frames = np.lib.stride_tricks.sliding_window_view(audio, n_fft)[::hop] * np.hanning(n_fft)
+    return np.log1p(np.abs(np.fft.rfft(frames, axis=1)))
+
+
+def similarity(ref: np.ndarray, out: np.ndarray) -> float:
+    a, b = log_spectrogram(ref), log_spectrogram(out)
+    n = min(a.shape[0], b.shape[0])
+    a, b = a[:n].ravel(), b[:n].ravel()
+    return float(a @ b / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
+
+
+def main(langs, rounds: int):
+    from app.core.config import quantized_path, settings
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"🧪 {rounds} rounds of {len(next(iter(PHRASES.values())))} phrases per voice")
+    print(f"   {'voice':<6} {'model':<22} {'RTF':>7} {'RSS MB':>8} {'similarity':>11} {'duration':>9}")
+    for lang in langs:
+        full = settings.PIPER_MODELS[lang]
+        variants = [full, quantized_path(full)]
+        if not os.path.exists(variants[1]):
+            print(f"   {lang:<6} ⚠️ no {os.path.basename(variants[1])}: run scripts/quantize_voices.py {lang}")
+            continue
+        reference = None
+        for model_path in variants:
+            with ctx.Pool(1) as pool:
+                rss, synth_s, audio_s, audio = pool.apply(run_variant, (model_path, PHRASES[lang], rounds))
+            if reference is None:
+                reference, sim, duration = audio, 1.0, 1.0
+            else:
+                sim = float(np.mean([similarity(r, a) for r, a in zip(reference, audio)]))
+                duration = sum(a.shape[0] for a in audio) / sum(r.shape[0] for r in reference)
+            print(f"   {lang:<6} {os.path.basename(model_path):<22} {synth_s / audio_s:>7.4f} {rss / 1e6:>8.1f} "
+                  f"{sim:>11.4f} {duration:>8.3f}x")
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+
+    langs = sys.argv[1].split(",") if len(sys.argv) > 1 else [l for l in settings.PIPER_MODELS if l in PHRASES]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    main(langs, rounds)
@@ -0,0 +1,78 @@
+"""
+Phrase segmentation benchmark: PhraseSegmenter vs the old inline chunking.
+
+Streams long synthetic replies (English and Devanagari) token by token through
+both and reports time per token and the phrases produced.
+
+Usage: python scripts/bench_segmenter.py [sentences_per_reply] [repeats]
+"""
+import os
+import sys
+import time
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+from app.services.phrase_segmenter import PhraseSegmenter
+
+EN = "Hi, so the thing is, we can meet at the library around 10.30 tomorrow and Dr. Rao will join us too. "
+HI = "अच्छा, तो बात यह है कि हम कल सुबह पुस्तकालय में मिल सकते हैं और डॉ. राव भी आएंगे। "
+
+
+def tokens_of(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def legacy_segment(tokens):
+    """The chunking loop that used to live inline in gemini_task."""
+    buffer = ""
+    boundaries = {".", "!", "?", "।", ",", "\n"}
+    first = True
+    phrases = []
+    for tok in tokens:
+        buffer += tok
+        if any(b in buffer for b in boundaries):
+            potential_pos = [buffer.find(b) for b in boundaries if buffer.find(b) != -1]
+            pos = min(potential_pos) if potential_pos else -1
+            m_len = 6 if first else 40
+            if pos != -1 and (pos >= m_len or buffer[pos] in ".!?।\n"):
+                phrase = buffer[:pos + 1].strip()
+                buffer = buffer[pos + 1:]
+                if phrase:
+                    phrases.append(phrase)
+                    first = False
+    if buffer.strip():
+        phrases.append(buffer.strip())
+    return phrases
+
+
+def segmenter_segment(tokens):
+    seg = PhraseSegmenter(6, 40)
+    phrases = []
+    for tok in tokens:
+        phrases += seg.push(tok)
+    tail = seg.flush()
+    return phrases + ([tail] if tail else [])
+
+
+def bench(fn, tokens, repeats):
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        phrases = fn(tokens)
+    return (time.perf_counter() - t0) / repeats / len(tokens) * 1e6, phrases
+
+
+def main(sentences, repeats):
+    for name, sentence in (("EN", EN), ("HI", HI)):
+        tokens = tokens_of(sentence * sentences)
+        legacy_us, legacy = bench(legacy_segment, tokens, repeats)
+        new_us, new = bench(segmenter_segment, tokens, repeats)
+        print(f"🧪 {name}: {len(tokens)} tokens, {sentences} sentences")
+        print(f"   Legacy inline : {legacy_us:.2f}µs/token, {len(legacy)} phrases, longest {max(map(len, legacy))} chars")
+        print(f"   PhraseSegmenter: {new_us:.2f}µs/token, {len(new)} phrases, longest {max(map(len, new))} chars")
+
+
+if __name__ == "__main__":
+    n_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(n_sentences, n_repeats)
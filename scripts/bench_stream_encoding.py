@@ -0,0 +1,109 @@
+"""
+Stream encoding benchmark for /api/stream_chat (NDJSON).
+
+Drives concurrent turns through the real StreamingResponse with a fake LLM
+and a counting ASGI `send`, once per flush policy / encoder, and reports:
+  - body writes (ASGI send calls) and bytes per turn
+  - server CPU seconds per 1k concurrent streams
+
+Usage: python scripts/bench_stream_encoding.py [streams] [tokens_per_turn]
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+
+TOKEN_GAP_S = 0.005
+TOKENS = {
+    "en": ("word ", "word. "),
+    "hi": ("नमस्ते ", "दोस्त। "),
+}
+
+
+class _FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeAsyncModels:
+    def __init__(self, tokens, words):
+        self.tokens = tokens
+        self.words = words
+
+    async def generate_content_stream(self, model, contents, config=None):
+        async def gen():
+            for i in range(self.tokens):
+                await asyncio.sleep(TOKEN_GAP_S)
+                yield _FakeChunk(self.words[1] if i % 8 == 7 else self.words[0])
+        return gen()
+
+
+class _FakeAio:
+    def __init__(self, tokens, words):
+        self.models = _FakeAsyncModels(tokens, words)
+
+
+class FakeGeminiClient:
+    def __init__(self, tokens, words):
+        self.aio = _FakeAio(tokens, words)
+
+
+async def run_stream(main, lang, i, totals):
+    resp = await main.stream_chat(main.TextRequest(text=f"hello {i}", language=lang, session_id=f"bench-{i}"))
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            totals["writes"] += 1
+            totals["bytes"] += len(message["body"])
+
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}}
+    await resp(scope, receive, send)
+
+
+async def run_config(main, streams, lang):
+    totals = {"writes": 0, "bytes": 0}
+    # The pipeline logs every turn; keep only the results
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        cpu = time.process_time()
+        await asyncio.gather(*(run_stream(main, lang, i, totals) for i in range(streams)))
+        cpu = time.process_time() - cpu
+    return totals["writes"] / streams, totals["bytes"] / streams, cpu * 1000 / streams
+
+
+async def main_bench(streams, tokens):
+    import app.main as main
+    from app.core.config import settings
+    from app.services import stream_protocol
+
+    encoders = {"json": stream_protocol._stdlib_dumps}
+    if stream_protocol.orjson:
+        encoders["orjson"] = stream_protocol.orjson.dumps
+    policies = {"per-token": 0, f"{settings.STREAM_TEXT_FLUSH_MS:g}ms window": settings.STREAM_TEXT_FLUSH_MS}
+
+    for lang, words in TOKENS.items():
+        main.gemini_client = FakeGeminiClient(tokens, words)
+        await run_config(main, 10, lang)  # Warm-up: lazy imports, first-call costs
+        print(f"🧪 {streams} concurrent streams x {tokens} tokens [{lang}]")
+        for policy, flush_ms in policies.items():
+            for name, dumps in encoders.items():
+                settings.STREAM_TEXT_FLUSH_MS = flush_ms
+                stream_protocol.dumps = dumps
+                writes, size, cpu = await run_config(main, streams, lang)
+                print(f"   {policy:<14} {name:<7} writes/turn={writes:5.1f} bytes/turn={size:6.0f} "
+                      f"CPU per 1k streams={cpu:.2f}s")
+
+
+if __name__ == "__main__":
+    n_streams = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    asyncio.run(main_bench(n_streams, n_tokens))
@@ -0,0 +1,50 @@
+"""
+Synthesis throughput: thread pool (TTSWorkerPool) vs process pool (ProcessTTSPool).
+
+Usage: python scripts/bench_tts_backends.py [lang] [workers] [phrases]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+PHRASES = [
+    "Hello! It is lovely to hear from you again today.",
+    "Sure, I can help you with that right away.",
+    "That sounds like a wonderful plan for the weekend.",
+    "Let me think about it for a second, okay?",
+]
+
+
+async def run_backend(pool_cls, model_path, workers, n):
+    pool = pool_cls(model_path=model_path, config_path=f"{model_path}.json", workers=workers)
+    await pool.start()
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(pool.submit(PHRASES[i % len(PHRASES)]) for i in range(n)))
+    elapsed = time.perf_counter() - t0
+    await pool.shutdown()
+
+    audio_s = sum(len(r or b"") for r in results) / 2 / 22050
+    print(f"   {pool_cls.__name__:<16} {n / elapsed:7.1f} phrases/s  "
+          f"{audio_s / elapsed:6.1f}x realtime  ({elapsed:.2f}s)")
+
+
+async def main_bench(lang, workers, n):
+    from app.core.config import settings
+    from app.services.tts_pool import TTSWorkerPool
+    from app.services.tts_process_pool import ProcessTTSPool
+
+    model_path = settings.PIPER_MODELS[lang]
+    print(f"🧪 {n} phrases, {workers} workers, voice={lang}, cpus={os.cpu_count()}")
+    for pool_cls in (TTSWorkerPool, ProcessTTSPool):
+        await run_backend(pool_cls, model_path, workers, n)
+
+
+if __name__ == "__main__":
+    lang = sys.argv[1] if len(sys.argv) > 1 else "en"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 2)
+    n = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    asyncio.run(main_bench(lang, workers, n))
@@ -0,0 +1,75 @@
+"""
+Cross-request batching benchmark (TTSWorkerPool, TTS_BATCH_MAX / TTS_BATCH_WINDOW_MS).
+
+Simulates N concurrent sessions, each speaking a turn of a few phrases in
+order (cache bypassed, every phrase unique), through one voice with a fixed
+number of workers. For each batch size it reports aggregate phrases/s,
+x realtime and per-phrase latency (p50 / p95); batch size 1 is the
+unbatched baseline.
+
+Usage: python scripts/bench_tts_batching.py [lang] [workers] [phrases_per_session]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+SESSIONS = (10, 50, 100)
+BATCH_SIZES = (1, 2, 4, 8)
+PHRASES = [
+    "Hello! It is lovely to hear from you again today.",
+    "Sure, I can help you with that right away.",
+    "That sounds like a wonderful plan for the weekend.",
+    "Let me think about it for a second, okay?",
+]
+
+
+async def run(pool, sessions: int, per_session: int):
+    latencies, samples = [], 0
+
+    async def session(s):
+        nonlocal samples
+        for i in range(per_session):
+            text = f"{PHRASES[(s + i) % len(PHRASES)]} Number {s * per_session + i}."
+            t0 = time.perf_counter()
+            pcm = await pool._submit_uncached(text, session=f"s{s}")
+            latencies.append((time.perf_counter() - t0) * 1000)
+            samples += len(pcm or b"") // 2
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session(s) for s in range(sessions)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    audio_s = samples / pool.voice.config.sample_rate
+    return (len(latencies) / elapsed, audio_s / elapsed,
+            latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)])
+
+
+async def main(lang: str, workers: int, per_session: int):
+    from app.core.config import settings
+    from app.services.tts_pool import TTSWorkerPool
+
+    model_path = settings.PIPER_MODELS[lang]
+    pool = TTSWorkerPool(model_path, f"{model_path}.json", workers=workers, min_workers=workers, max_workers=workers)
+    await pool.start()
+    await pool.warm_up(PHRASES[0])
+    print(f"🧪 voice={lang}, workers={workers}, {per_session} phrases/session, window={settings.TTS_BATCH_WINDOW_MS} ms")
+    print(f"   {'sessions':>8} {'batch':>5} {'phrases/s':>10} {'x RT':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for sessions in SESSIONS:
+        base = None
+        for batch in BATCH_SIZES:
+            pool.batch_max = batch
+            rate, rt, p50, p95 = await run(pool, sessions, per_session)
+            base = base or rate
+            print(f"   {sessions:>8} {batch:>5} {rate:>10.1f} {rt:>7.1f} {p50:>8.1f} {p95:>8.1f}  ({rate / base:.2f}x)")
+    await pool.shutdown()
+
+
+if __name__ == "__main__":
+    lang = sys.argv[1] if len(sys.argv) > 1 else "en"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    per_session = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    asyncio.run(main(lang, workers, per_session))
@@ -0,0 +1,50 @@
+"""
+Builds dynamically quantized (INT8 weights) variants of the Piper voices.
+
+For each voice in settings.PIPER_MODELS writes <model>.int8.onnx next to the
+original plus a copy of its config (<model>.int8.onnx.json), which is what
+PIPER_QUANTIZED=<langs> loads instead of the full-precision model. Weights of
+the chosen op types are stored as INT8 and activations are quantized at run
+time, so no calibration data is needed. Check the result with
+scripts/bench_quantized_voices.py before switching a language over.
+
+Usage: python scripts/quantize_voices.py [langs (default all)] [op_types (default MatMul,Gemm,Conv)]
+"""
+import os
+import shutil
+import sys
+
+# Add working directory to path so we can import app
+sys.path.append(os.getcwd())
+
+
+def quantize(model_path: str, op_types):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from app.core.config import quantized_path
+
+    out = quantized_path(model_path)
+    quantize_dynamic(model_path, out, weight_type=QuantType.QInt8, op_types_to_quantize=op_types)
+    shutil.copyfile(f"{model_path}.json", f"{out}.json")
+    return out
+
+
+def main(langs, op_types):
+    from app.core.config import settings
+
+    for lang in langs:
+        model_path = settings.PIPER_MODELS[lang]
+        if not os.path.exists(model_path):
+            print(f"⚠️ {lang}: {model_path} not found, skipped")
+            continue
+        out = quantize(model_path, op_types)
+        before, after = os.path.getsize(model_path), os.path.getsize(out)
+        print(f"✅ {lang}: {os.path.basename(out)}  {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB "
+              f"({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+
+    langs = sys.argv[1].split(",") if len(sys.argv) > 1 else list(settings.PIPER_MODELS)
+    op_types = sys.argv[2].split(",") if len(sys.argv) > 2 else ["MatMul", "Gemm", "Conv"]
+    main(langs, op_types)
@@ -0,0 +1,95 @@
+"""
+Phrase-level TTS audio cache tests (LRU budget, disk tier, coalescing).
+"""
+
+import asyncio
+
+import os
+
+from app.services.audio_cache import AudioCache, voice_namespace
+
+
+def test_lru_respects_byte_budget():
+    cache = AudioCache(max_bytes=10, disk_dir="")
+    cache.store("en", "one", b"aaaa")
+    cache.store("en", "two", b"bbbb")
+    assert cache.lookup("en", "one") == b"aaaa"  # "one" is now most recent
+
+    cache.store("en", "three", b"cccc")
+    assert cache.lookup("en", "two") is None
+    assert cache.lookup("en", "one") == b"aaaa"
+    assert cache.bytes <= 10
+    assert cache.stats()["evictions"] == 1
+
+
+def test_key_normalizes_whitespace_and_voice():
+    cache = AudioCache(max_bytes=1024, disk_dir="")
+    cache.store("hindi.onnx", "  नमस्ते   दोस्त ", b"pcm")
+    assert cache.lookup("hindi.onnx", "नमस्ते दोस्त") == b"pcm"
+    assert cache.lookup("marathi.onnx", "नमस्ते दोस्त") is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    AudioCache(max_bytes=1024, disk_dir=str(tmp_path)).store("en", "Hello!", b"\x01\x02")
+
+    fresh = AudioCache(max_bytes=1024, disk_dir=str(tmp_path))
+    assert fresh.lookup("en", "Hello!") == b"\x01\x02"
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_async_checks_find_disk_entries(tmp_path):
+    AudioCache(max_bytes=1024, disk_dir=str(tmp_path)).store("en", "Hello!", b"\x01\x02")
+    fresh = AudioCache(max_bytes=1024, disk_dir=str(tmp_path))
+
+    async def run():
+        return (await fresh.acontains("en", "Hello!"), await fresh.acontains("en", "Bye."),
+                await fresh.alookup("en", "Hello!"))
+
+    assert asyncio.run(run()) == (True, False, b"\x01\x02")
+
+
+def test_rewriting_a_phrase_counts_its_disk_bytes_once(tmp_path):
+    cache = AudioCache(max_bytes=1024, disk_dir=str(tmp_path), disk_max_bytes=1024)
+    cache.store("en", "Hello!", b"\x01\x02\x03\x04")
+    cache.store("en", "Hello!", b"\x05\x06")
+    assert cache.disk_bytes == 2
+    assert AudioCache(max_bytes=1024, disk_dir=str(tmp_path)).disk_bytes == 2
+
+
+def test_namespace_changes_with_the_model_file(tmp_path):
+    model = tmp_path / "english.onnx"
+    model.write_bytes(b"v1")
+    before = voice_namespace(str(model))
+    assert before == voice_namespace(str(model)) and before.startswith("english.onnx@")
+
+    model.write_bytes(b"v2 weights")  # Replaced in place, same file name
+    os.utime(model, ns=(0, 10**9))
+    assert voice_namespace(str(model)) != before
+    assert voice_namespace(str(tmp_path / "missing.onnx")) == "missing.onnx"
+
+
+def test_concurrent_misses_share_one_synthesis():
+    cache = AudioCache(max_bytes=1024, disk_dir="")
+    calls = []
+
+    async def synthesize():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"pcm"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_synthesize("en", "Hi", synthesize) for _ in range(5)))
+
+    assert asyncio.run(run()) == [b"pcm"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_interrupted_synthesis_is_not_cached():
+    cache = AudioCache(max_bytes=1024, disk_dir="")
+
+    async def interrupted():
+        return None
+
+    assert asyncio.run(cache.get_or_synthesize("en", "Hi", interrupted)) is None
+    assert not cache.contains("en", "Hi")
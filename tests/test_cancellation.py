@@ -0,0 +1,40 @@
+"""
+CancelToken / InterruptManager turn-scope tests.
+"""
+
+from app.services.cancellation import CancelToken, abort_latency
+from app.services.interrupt_manager import InterruptManager
+
+
+def test_callbacks_run_once_and_late_callbacks_run_immediately():
+    token = CancelToken()
+    calls = []
+    token.add_callback(lambda: calls.append("a"))
+    remove = token.add_callback(lambda: calls.append("removed"))
+    remove()
+
+    token.cancel()
+    token.cancel()
+    token.add_callback(lambda: calls.append("late"))
+
+    assert token.cancelled
+    assert calls == ["a", "late"]
+
+
+def test_new_turn_supersedes_previous_one():
+    im = InterruptManager()
+    first = im.reset_interrupt()
+    second = im.reset_interrupt()
+
+    assert first.cancelled and not second.cancelled
+    assert not im.cancel_current_tts
+
+
+def test_abort_latency_recorded_once_per_stage():
+    token = CancelToken()
+    token.record_abort("test-stage")  # Not cancelled yet: nothing to measure
+    token.cancel()
+    token.record_abort("test-stage")
+    token.record_abort("test-stage")
+
+    assert abort_latency.summary()["test-stage"]["count"] == 1
@@ -0,0 +1,52 @@
+"""
+Duplex session socket: sequenced audio frames and interrupt discard.
+"""
+
+import asyncio
+import json
+
+from app.api.websocket_session import DuplexSender
+from app.core.config import settings
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+
+def test_audio_is_framed_with_increasing_seq():
+    async def run():
+        ws = FakeWebSocket()
+        sender = DuplexSender(ws)
+        writer = asyncio.create_task(sender.run())
+        await sender.audio(b"\x01\x00" * settings.WS_AUDIO_FRAME_BYTES)  # 2 frames worth
+        await sender.event({"type": "done"})
+        await asyncio.sleep(0)
+        writer.cancel()
+        return ws.sent
+
+    sent = asyncio.run(run())
+    audio = [m for m in sent if m[:1] == b"A"]
+    assert [int.from_bytes(m[1:5], "big") for m in audio] == [1, 2]
+    assert sum(len(m) - 5 for m in audio) == 2 * settings.WS_AUDIO_FRAME_BYTES
+    assert json.loads(sent[-1][1:]) == {"type": "done"}
+
+
+def test_interrupt_discards_queued_frames_of_old_turn():
+    async def run():
+        ws = FakeWebSocket()
+        sender = DuplexSender(ws)
+        await sender.audio(b"\x00" * (3 * settings.WS_AUDIO_FRAME_BYTES))  # Queued, not sent yet
+        sender.interrupt()
+        await sender.audio(b"\x00\x00")  # Next turn
+        writer = asyncio.create_task(sender.run())
+        await asyncio.sleep(0)
+        writer.cancel()
+        return ws.sent
+
+    sent = asyncio.run(run())
+    assert json.loads(sent[0][1:]) == {"type": "interrupt", "seq": 3}
+    assert [int.from_bytes(m[1:5], "big") for m in sent[1:]] == [4]
@@ -0,0 +1,35 @@
+"""
+PCMBuffer / PCMRing tests.
+"""
+
+import numpy as np
+
+from app.services.pcm_buffer import PCMBuffer, PCMRing
+
+
+def test_buffer_grows_and_matches_legacy_conversion():
+    chunks = [np.random.uniform(-1, 1, n).astype(np.float32) for n in (10, 1000, 5000)]
+    pcm = PCMBuffer(capacity=16)
+    for c in chunks:
+        pcm.append_float(c)
+    pcm.append(b"\x01\x00\x02\x00")
+
+    legacy = b"".join((c * 32767).astype(np.int16).tobytes() for c in chunks) + b"\x01\x00\x02\x00"
+    assert pcm.tobytes() == legacy
+    assert bytes(pcm.memoryview()) == legacy
+
+
+def test_ring_frames_arbitrary_writes():
+    samples = np.arange(-2000, 2000, dtype=np.int16)
+    ring = PCMRing(frame_size=512, capacity=1024)
+    frame = np.empty(512, dtype=np.float32)
+    frames = []
+    for start in range(0, samples.size, 300):  # writes never aligned to frames
+        ring.write(samples[start:start + 300].tobytes())
+        while ring.read_frame(frame):
+            frames.append(frame.copy())
+
+    assert len(frames) == samples.size // 512
+    expected = samples[:len(frames) * 512].astype(np.float32) / 32768.0
+    np.testing.assert_allclose(np.concatenate(frames), expected, rtol=1e-6)
+    assert ring.available == samples.size % 512
@@ -0,0 +1,48 @@
+"""
+Phoneme cache: known phrases and phrases made of known words skip espeak,
+and the cache stays within its byte budget.
+"""
+
+from app.services.phoneme_cache import PhonemeCache
+
+
+class FakeVoice:
+    """Phonemes are the upper-cased letters; sentences end at '.'."""
+    def __init__(self):
+        self.calls = []
+
+    def phonemize(self, text):
+        self.calls.append(text)
+        sentences = [s.strip() + "." for s in text.split(".") if s.strip()]
+        return [list(s.upper()) for s in sentences]
+
+    def phonemes_to_ids(self, phonemes):
+        return [ord(p) for p in phonemes]
+
+
+def test_phrase_tier_and_word_tier_skip_phonemization():
+    voice = FakeVoice()
+    cache = PhonemeCache(voice, max_bytes=1 << 20, words=True)
+    first = cache.phonemize_ids("hello world. good day.")
+    assert cache.phonemize_ids("hello  world. good day.") == first  # Whitespace-normalized phrase hit
+
+    # Only known tokens: assembled from the word tier, identical to espeak's output
+    assembled = cache.phonemize_ids("good world. hello day.")
+    assert voice.calls == ["hello world. good day."]
+    assert assembled == [voice.phonemes_to_ids(p) for p in voice.phonemize("good world. hello day.")]
+
+    cache.phonemize_ids("hello there.")  # Unknown word: phonemized
+    snapshot = cache.snapshot()
+    assert (snapshot["phrase_hits"], snapshot["word_hits"], snapshot["misses"]) == (1, 1, 2)
+
+
+def test_budget_evicts_oldest_and_zero_disables():
+    voice = FakeVoice()
+    cache = PhonemeCache(voice, max_bytes=600, words=False)
+    for i in range(10):
+        cache.phonemize_ids(f"phrase number {i}.")
+    assert cache.bytes <= 600 and cache.evictions > 0
+
+    off = PhonemeCache(voice, max_bytes=0)
+    off.phonemize_ids("phrase number 1.")
+    assert len(off.entries) == 0 and voice.calls[-1] == "phrase number 1."
@@ -0,0 +1,75 @@
+"""
+PhraseSegmenter tests.
+"""
+
+from app.core.config import settings
+from app.services.phrase_segmenter import PhraseSegmenter
+from app.services.tts_stats import VoiceStats
+
+
+def segment(chunks, **kwargs):
+    seg = PhraseSegmenter(**kwargs)
+    phrases = []
+    for chunk in chunks:
+        phrases += seg.push(chunk)
+    tail = seg.flush()
+    return phrases + ([tail] if tail else [])
+
+
+def test_first_phrase_short_later_phrases_long():
+    text = "Sure thing, let me check that, it should take a moment, okay, thanks for waiting"
+    assert segment([text], first_min_len=6, next_min_len=40) == [
+        "Sure thing,",
+        "let me check that, it should take a moment,",
+        "okay, thanks for waiting",
+    ]
+
+
+def test_first_sentence_cuts_at_once_later_sentences_merge():
+    assert segment(["Hi! Yes. Okay?! Fine"], first_min_len=50, next_min_len=1) == [
+        "Hi!", "Yes.", "Okay?!", "Fine",
+    ]
+    assert segment(["Hi! Yes. Okay?! Fine. Good, so we are done here."], first_min_len=50, next_min_len=15) == [
+        "Hi!", "Yes. Okay?! Fine.", "Good, so we are done here.",
+    ]
+
+
+def test_danda_and_devanagari_abbreviations():
+    chunks = ["नमस्ते। डॉ. शर्मा ", "आज आए थे॥ श्री. ", "पाटील उद्या येतील।"]
+    assert segment(chunks, next_min_len=1) == ["नमस्ते।", "डॉ. शर्मा आज आए थे॥", "श्री. पाटील उद्या येतील।"]
+
+
+def test_abbreviations_decimals_and_urls_do_not_split():
+    text = 'Mr. Rao said "it costs 3.5 lakh, e.g. at gemini.com." J. Smith agreed.'
+    assert segment([text], first_min_len=100, next_min_len=100) == [
+        'Mr. Rao said "it costs 3.5 lakh, e.g. at gemini.com."',
+        "J. Smith agreed.",
+    ]
+
+
+def test_token_splits_do_not_change_phrases():
+    text = "Well, the meeting is at 10.30 tomorrow. Dr. Patil will join, and so will I. अच्छा। Bye!"
+    words = [w + " " for w in text.split(" ")]
+    chars = list(text)
+    assert segment(words) == segment(chars) == segment([text])
+
+
+def test_backlogged_voice_gets_the_phrase_size_it_reports():
+    stats = VoiceStats(workers=1, sample_rate=1000)
+    stats.record(text_len=14, synth_s=0.2, n_samples=1000)  # RTF 0.2
+    for _ in range(2):
+        stats.job_started()  # Load 0.6
+    first_len, next_len = stats.phrase_sizes()
+    assert settings.TTS_PHRASE_MIN < next_len < settings.TTS_PHRASE_MAX
+
+    # Fed the way gemini_task does: sizes refreshed before every token
+    seg = PhraseSegmenter()
+    phrases = []
+    for word in ("Okay. " + "Yes, sure. I can. " * 20).split(" "):
+        seg.first_min_len, seg.next_min_len = stats.phrase_sizes()
+        phrases += seg.push(word + " ")
+    tail = seg.flush()
+
+    assert phrases[0] == "Okay."
+    assert len(phrases) > 2 and all(len(p) >= next_len for p in phrases[1:])  # Not one per short sentence
+    assert stats.snapshot()["phrase_min"] == next_len and len(tail or "") < next_len
@@ -0,0 +1,20 @@
+"""
+PIPER_QUANTIZED picks a voice's INT8 variant only when it has been built.
+"""
+
+from app.core.config import Settings, quantized_path
+
+
+def test_quantized_variant_is_chosen_per_language_when_present(tmp_path):
+    settings = Settings()
+    settings.PIPER_MODELS = {lang: str(tmp_path / f"{lang}.onnx") for lang in ("en", "hi", "mr")}
+    for lang in ("hi", "en"):
+        (tmp_path / f"{lang}.int8.onnx").write_bytes(b"")
+
+    settings.PIPER_QUANTIZED = "hi,mr"
+    assert settings.voice_model("hi") == quantized_path(settings.PIPER_MODELS["hi"])
+    assert settings.voice_model("mr") == settings.PIPER_MODELS["mr"]  # Not built: full precision
+    assert settings.voice_model("en") == settings.PIPER_MODELS["en"]  # Not chosen
+
+    settings.PIPER_QUANTIZED = "all"
+    assert settings.voice_model("en").endswith("en.int8.onnx")
@@ -0,0 +1,23 @@
+"""
+Process-wide inference thread settings.
+"""
+
+from app.core import runtime_resources
+from app.core.config import settings
+
+
+def test_parse_cpu_list():
+    assert runtime_resources.parse_cpu_list("0-3, 6,,8-8") == {0, 1, 2, 3, 6, 8}
+    assert runtime_resources.parse_cpu_list("") == set()
+
+
+def test_intra_op_threads_share_the_cores(monkeypatch):
+    monkeypatch.setattr(runtime_resources, "available_cpus", lambda: 16)
+    monkeypatch.setattr(settings, "ORT_INTRA_OP_THREADS", 0)
+    monkeypatch.setattr(settings, "TTS_CPU_BUDGET", 4)
+    assert runtime_resources.intra_op_threads() == 4  # 4 concurrent syntheses x 4 threads
+    monkeypatch.setattr(settings, "TTS_CPU_BUDGET", 0)
+    assert runtime_resources.intra_op_threads() == 1  # One synthesis per core
+    monkeypatch.setattr(settings, "ORT_INTRA_OP_THREADS", 3)
+    options = runtime_resources.session_options()
+    assert options.intra_op_num_threads == 3 and options.inter_op_num_threads == 1
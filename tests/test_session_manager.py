@@ -0,0 +1,52 @@
+"""
+Session isolation & idle eviction tests.
+"""
+
+import asyncio
+
+from app.services.session_manager import SessionManager
+
+
+def test_sessions_are_isolated():
+    manager = SessionManager(idle_timeout=60)
+    a = manager.get("alice")
+    b = manager.get("bob")
+
+    a.chat_history.append({"role": "User", "text": "hello"})
+    a.interrupt_manager.cancel_current_tts = True
+
+    assert manager.get("alice") is a
+    assert len(b.chat_history) == 0
+    assert not b.interrupt_manager.cancel_current_tts
+    assert a.voice_detector is None  # No mic socket yet: no VAD copy
+
+
+def test_detector_is_created_once_for_a_mic_socket():
+    manager = SessionManager(idle_timeout=60)
+    a, b = manager.get("alice"), manager.get("bob")
+    a.start_immunity(5000)  # A text turn before the mic socket opened
+
+    async def run():
+        first, again = await asyncio.gather(a.open_detector(), a.open_detector())
+        return first, again, await b.open_detector()
+
+    first, again, other = asyncio.run(run())
+    assert first is again is a.voice_detector and other is not first
+    assert first.immunity_until == a.vad_immune_until > 0
+
+
+def test_missing_id_uses_default_session():
+    manager = SessionManager(idle_timeout=60)
+    assert manager.get(None) is manager.get("")
+
+
+def test_idle_eviction_skips_connected_sessions():
+    manager = SessionManager(idle_timeout=10)
+    idle = manager.get("idle")
+    connected = manager.get("connected")
+    connected.connections = 1
+
+    now = idle.last_active + 11
+    assert manager.evict_idle(now=now) == 1
+    assert "idle" not in manager.sessions
+    assert "connected" in manager.sessions
@@ -0,0 +1,182 @@
+"""
+Session stores: the SQLite store gives two processes (two managers here) the
+same history, language lock, turn state and echo immunity; barge-in crosses
+between them.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.services.session_manager import SessionManager
+from app.services.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(history_len=3)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), history_len=3)
+
+
+def test_history_language_and_turns(store):
+    for i in range(5):
+        store.append_history("s", {"role": "User", "text": f"m{i}", "lang": "hi"})
+    assert [item["text"] for item in store.history("s")] == ["m2", "m3", "m4"]  # Newest history_len
+    assert store.history("other") == []
+
+    store.set_language("s", "mr")
+    assert store.language("s") == "mr" and store.language("other") is None
+
+    first = store.start_turn("s")
+    store.cancel_turn("s")
+    assert store.turn_state("s") == (first, True)
+    assert store.turn_state("s") != (store.start_turn("s"), True)  # A new turn starts uncancelled
+
+    store.set_immunity("s", vad_until=5.0)
+    store.set_immunity("s", vad_until=3.0, barge_in_until=4.0)  # Never moves a deadline back
+    assert store.immunity("s") == (5.0, 4.0) and store.immunity("other") == (0.0, 0.0)
+    store.clear_immunity("s")
+    assert store.immunity("s") == (0.0, 0.0)
+
+
+def test_workers_share_state_and_barge_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TURN_POLL_S", 0.005)
+    path = str(tmp_path / "sessions.db")
+    worker_a = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+    worker_b = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+
+    async def run():
+        on_b = worker_b.get("alice")  # stream_chat landed on worker B
+        token, turn_id = await on_b.begin_turn()
+        on_b.set_language("hi")
+        on_b.chat_history.append({"role": "User", "text": "नमस्ते", "lang": "hi"})
+        await on_b.flush()  # Written in the background
+        watch = on_b.watch_turn(token, turn_id)
+
+        on_a = worker_a.get("alice")  # The WebSocket lives on worker A
+        joined = await on_a.turn_token()
+        await on_a.chat_history.load()
+        seen = (await on_a.get_language(), [item["text"] for item in on_a.chat_history], joined.cancelled)
+        on_a.cancel_turn()  # Barge-in on A
+        await asyncio.wait_for(watch, 1)
+        return seen, token.cancelled, (await worker_a.get("alice").turn_token()).cancelled
+
+    seen, cancelled_on_b, joined_cancelled = asyncio.run(run())
+    assert seen == ("hi", ["नमस्ते"], False)  # A joins B's live turn
+    assert cancelled_on_b and joined_cancelled
+
+
+def test_immunity_reaches_the_gate_on_another_worker(tmp_path, monkeypatch):
+    from app.api.websocket_audio import SensoryGate
+
+    monkeypatch.setattr(settings, "SESSION_TURN_POLL_S", 0.005)
+    path = str(tmp_path / "sessions.db")
+    worker_a = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+    worker_b = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+
+    async def run():
+        on_a = worker_a.get("alice")  # The mic socket lives on worker A
+        await on_a.open_detector()
+        gate = SensoryGate(on_a)
+        watch = gate.watch_immunity()
+        on_b = worker_b.get("alice")  # The turn streams from worker B
+        await on_b.begin_turn()
+        on_b.start_immunity(800)  # First audio went out
+        await asyncio.sleep(0.05)
+        watch.cancel()
+        return gate, on_b
+
+    gate, on_b = asyncio.run(run())
+    assert gate.voice_detector.immunity_until == on_b.vad_immune_until
+    assert gate.interrupt_manager.immune_until == on_b.interrupt_manager.immune_until
+    assert gate.interrupt_manager.on_user_speech() is False  # Echo of B's reply: no barge-in
+
+
+def test_reset_clears_the_turn_and_immunity_for_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TURN_POLL_S", 0.005)
+    path = str(tmp_path / "sessions.db")
+    worker_a = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+    worker_b = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+
+    async def run():
+        on_b = worker_b.get("alice")  # The turn streams from worker B
+        token, turn_id = await on_b.begin_turn()
+        on_b.start_immunity(5000)
+        await on_b.flush()
+        watch = on_b.watch_turn(token, turn_id)
+        on_a = worker_a.get("alice")
+        on_a.reset()  # /api/reset landed on worker A
+        await on_a.flush()
+        await asyncio.wait_for(watch, 1)
+        return token.cancelled, await on_b.immunity(), (await on_a.turn_token()).cancelled
+
+    cancelled, immunity, joined_cancelled = asyncio.run(run())
+    assert cancelled and joined_cancelled  # The turn on B stops; nothing new joins it
+    assert immunity == (0.0, 0.0)
+
+
+def test_store_from_before_shared_immunity_is_upgraded(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "sessions.db")
+    old = sqlite3.connect(path)
+    old.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, language TEXT, "
+                "turn_id INTEGER NOT NULL DEFAULT 0, turn_cancelled INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL)")
+    old.execute("INSERT INTO sessions (session_id, language, updated) VALUES ('s', 'hi', 0)")
+    old.commit()
+    old.close()
+
+    store = SQLiteSessionStore(path)
+    assert store.immunity("s") == (0.0, 0.0) and store.language("s") == "hi"
+    store.set_immunity("s", vad_until=5.0)
+    assert store.immunity("s") == (5.0, 0.0)
+
+
+def test_tts_request_on_another_worker_follows_the_turn(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TURN_POLL_S", 0.005)
+    path = str(tmp_path / "sessions.db")
+    worker_a = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+    worker_b = SessionManager(idle_timeout=60, store=SQLiteSessionStore(path))
+
+    async def run():
+        on_b = worker_b.get("alice")  # stream_chat runs the turn on worker B
+        await on_b.begin_turn()
+        token, watch = await worker_a.get("alice").join_turn()  # /api/v1/generate landed on worker A
+        before = token.cancelled
+        on_b.cancel_turn()  # Barge-in seen by B
+        await asyncio.wait_for(watch, 1)
+        return before, token.cancelled
+
+    before, after = asyncio.run(run())
+    assert before is False and after is True
+
+
+def test_shared_store_stays_off_the_event_loop(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), history_len=10)
+    calls = []
+    for name in ("history", "append_history", "start_turn", "turn_state", "set_immunity", "set_language"):
+        def traced(*args, _name=name, _method=getattr(store, name)):
+            calls.append((_name, threading.get_ident()))
+            return _method(*args)
+        setattr(store, name, traced)
+    manager = SessionManager(idle_timeout=60, store=store)
+
+    async def run():
+        session = manager.get("alice")
+        session.chat_history.append({"role": "User", "text": "hi"})  # Before any turn here
+        await session.begin_turn()
+        session.start_immunity(800)
+        session.set_language("en")
+        session.chat_history.append({"role": "AI", "text": "hello"})
+        reads = [len(session.chat_history), session.chat_history[-1]["text"], [i["text"] for i in session.chat_history]]
+        await session.turn_token()
+        await session.flush()
+        return threading.get_ident(), reads
+
+    loop_thread, reads = asyncio.run(run())
+    assert reads == [2, "hello", ["hi", "hello"]]
+    assert [name for name, thread in calls if thread == loop_thread] == []
+    assert [name for name, _ in calls].count("history") == 1  # Once per turn, not per access
@@ -0,0 +1,35 @@
+"""
+Stream encoding: text coalescing flush policy and event encoders.
+"""
+
+import json
+
+from app.services.stream_protocol import TextCoalescer, encode_event, ws_event, FRAME_JSON
+
+
+def test_coalescer_flushes_on_window_or_size():
+    c = TextCoalescer(window_s=0.03, max_chars=10)
+    assert not c.add("ab", now=0.0)
+    assert not c.add("cd", now=0.01)
+    assert c.deadline == 0.03
+    assert c.add("ef", now=0.03)  # Window elapsed
+    assert c.take() == {"type": "text", "content": "abcdef"}
+    assert c.take() is None
+
+    assert not c.add("12345", now=5.0)
+    assert c.add("67890", now=5.0)  # Size reached
+    assert c.take()["content"] == "1234567890"
+
+
+def test_zero_window_sends_every_token():
+    c = TextCoalescer(window_s=0, max_chars=1000)
+    assert c.add("x", now=0.0)
+
+
+def test_encoded_events_are_json():
+    event = {"type": "text", "content": "नमस्ते"}
+    line = encode_event(event)
+    assert line.endswith(b"\n") and json.loads(line) == event
+    framed = encode_event(event, framed=True)
+    assert framed[:1] == FRAME_JSON and json.loads(framed[5:]) == event
+    assert json.loads(ws_event(event)[1:]) == event
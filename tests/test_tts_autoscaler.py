@@ -0,0 +1,79 @@
+"""
+TTS worker autoscaling: queue-driven scaling within the shared CPU budget.
+"""
+
+import asyncio
+
+from app.core import runtime_resources
+from app.core.config import settings
+from app.services.tts_autoscaler import TTSAutoscaler
+from app.services.tts_stats import VoiceStats
+
+
+class FakePool:
+    scalable = True
+    running = True
+
+    def __init__(self, workers=1, min_workers=1, max_workers=4):
+        self.workers, self.min_workers, self.max_workers = workers, min_workers, max_workers
+        self.queue = asyncio.Queue()
+        self.stats = VoiceStats(workers)
+
+    def scale_to(self, workers):
+        self.workers = max(self.min_workers, min(self.max_workers, workers))
+        return self.workers
+
+    def backlog(self, jobs, waited_ms):
+        for _ in range(jobs):
+            self.queue.put_nowait(object())
+            self.stats.job_started()
+        self.stats.record_wait(waited_ms / 1000)
+
+
+def autoscaler(monkeypatch, budget, **pools):
+    monkeypatch.setattr(settings, "TTS_CPU_BUDGET", budget)
+    scaler = TTSAutoscaler()
+    scaler.pools = pools
+    return scaler
+
+
+def test_backlog_scales_up_within_budget(monkeypatch):
+    hi = FakePool()
+    scaler = autoscaler(monkeypatch, 3, hi=hi, en=FakePool())
+    hi.backlog(jobs=3, waited_ms=300)
+    scaler.tick(now=0)
+    assert hi.workers == 2
+    hi.stats.record_wait(0.3)
+    scaler.tick(now=1)
+    assert hi.workers == 2  # Budget spent and English can't go below its minimum
+    assert scaler.snapshot() == {"budget": 3, "used": 3}
+
+
+def test_starved_voice_takes_workers_from_idle_voice(monkeypatch):
+    hi, en = FakePool(), FakePool(workers=3)
+    scaler = autoscaler(monkeypatch, 4, hi=hi, en=en)
+    hi.backlog(jobs=4, waited_ms=500)
+    scaler.tick(now=0)
+    assert (hi.workers, en.workers) == (2, 2)
+
+
+def test_short_waits_and_idle_voices(monkeypatch):
+    monkeypatch.setattr(settings, "TTS_SCALE_DOWN_IDLE_S", 10)
+    hi, en = FakePool(workers=2), FakePool(workers=3)
+    scaler = autoscaler(monkeypatch, 8, hi=hi, en=en)
+    hi.backlog(jobs=1, waited_ms=5)  # One quick job: not worth a worker
+    scaler.tick(now=0)
+    assert hi.workers == 2
+    scaler.tick(now=5)
+    assert en.workers == 3
+    scaler.tick(now=10)
+    assert en.workers == 2  # Idle for TTS_SCALE_DOWN_IDLE_S: one worker at a time
+    assert hi.workers == 2  # Still has a job
+
+
+def test_default_budget_follows_cpu_affinity(monkeypatch):
+    monkeypatch.setattr(runtime_resources, "available_cpus", lambda: 3)  # e.g. CPU_AFFINITY=0-2
+    scaler = autoscaler(monkeypatch, 0, hi=FakePool(), en=FakePool())
+    assert scaler.budget == 3
+    monkeypatch.setattr(settings, "ORT_INTRA_OP_THREADS", 0)
+    assert runtime_resources.intra_op_threads() * scaler.budget <= 3  # Runs x threads fit the cores
@@ -0,0 +1,137 @@
+"""
+Cross-request batching: concurrent phrases share one padded ONNX run and each
+caller gets back exactly its own audio.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.cancellation import CancelToken
+from app.services.piper_synth import phoneme_ids_to_audio, phoneme_ids_to_audio_batch
+from app.services.tts_pool import TTSWorkerPool
+from app.services.tts_scheduler import PRIORITY_BACKGROUND, PRIORITY_FIRST, PRIORITY_NEXT
+
+SAMPLES_PER_ID = 100
+PAD_NOISE = 0.25
+
+
+class FakeSession:
+    """
+    Phoneme id i lasts `frames(i)` frames of HOP samples of value i (one frame
+    each by default). Like VITS, a row's length comes from its durations, and a
+    row shorter than the batch's longest is filled up with non-silent noise.
+    """
+    def __init__(self, frames=lambda i: 1):
+        self.frames = frames
+        self.batch_sizes = []
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="output"), SimpleNamespace(name="w_ceil")]
+
+    def run(self, _outputs, args, _run_options=None):
+        ids = args["input"]
+        self.batch_sizes.append(ids.shape[0])
+        durations = np.zeros(ids.shape, dtype=np.float32)
+        for row, n in enumerate(args["input_lengths"]):
+            durations[row, :n] = [self.frames(int(i)) for i in ids[row, :n]]
+        rows = [np.repeat(ids[row].astype(np.float32), (durations[row] * SAMPLES_PER_ID).astype(np.int64))
+                for row in range(ids.shape[0])]
+        audio = np.full((len(rows), max(r.size for r in rows)), PAD_NOISE, dtype=np.float32)
+        for row, r in enumerate(rows):
+            audio[row, :r.size] = r
+        return [audio[:, None, None, :], durations[:, None, :]]
+
+
+class FakeVoice:
+    def __init__(self, frames=lambda i: 1):
+        self.config = SimpleNamespace(noise_scale=0.667, length_scale=1.0, noise_w_scale=0.8, num_speakers=1,
+                                      hop_length=SAMPLES_PER_ID)
+        self.session = FakeSession(frames)
+
+    def phonemize(self, text):
+        return [list(sentence) for sentence in text.split(".") if sentence]
+
+    def phonemes_to_ids(self, phonemes):
+        return [len(p) for p in phonemes]
+
+
+class FakeBatchPool(TTSWorkerPool):
+    def __init__(self):
+        super().__init__("fake-batch.onnx", "missing.json", workers=1)
+        self.voice = FakeVoice()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+
+def test_batch_rows_are_trimmed_back_to_their_own_length():
+    voice = FakeVoice()
+    rows = phoneme_ids_to_audio_batch(voice, [[1, 1], [2, 2, 2, 2], [3]])
+    assert voice.session.batch_sizes == [3]
+    assert [r.shape[0] for r in rows] == [200, 400, 100]
+
+
+def test_batch_rows_match_unbatched_audio_when_durations_differ_from_input_length():
+    voice = FakeVoice(frames=lambda i: i)  # Output length no longer follows the input length
+    batch_ids = [[5, 5], [1, 1, 1], [2], [1, 4, 1]]
+    rows = phoneme_ids_to_audio_batch(voice, batch_ids)
+    alone = [phoneme_ids_to_audio(voice, ids) for ids in batch_ids]
+    assert [r.shape[0] for r in rows] == [1000, 300, 200, 600]  # The longest input isn't the longest audio
+    for row, single in zip(rows, alone):
+        np.testing.assert_array_equal(row, single)
+
+
+def test_concurrent_phrases_share_a_batch():
+    async def run():
+        pool = FakeBatchPool()
+        pool.batch_max = 4
+        texts = ["ab", "abc.ab", "a", "abcd"]
+        jobs = [asyncio.create_task(pool._submit_uncached(t)) for t in texts]
+        await asyncio.sleep(0)  # All four queued before the worker starts
+        pool.worker_tasks = [asyncio.create_task(pool.worker_loop(0))]
+        pcm = await asyncio.gather(*jobs)
+        await pool.shutdown()
+        return pcm, pool.voice.session.batch_sizes
+
+    pcm, batch_sizes = asyncio.run(run())
+    assert batch_sizes == [4, 1]  # Round 2 is only the second sentence of "abc.ab"
+    assert [len(p) // 2 for p in pcm] == [200, 500, 100, 400]
+
+
+def test_batches_never_mix_priority_levels():
+    async def run():
+        pool = FakeBatchPool()
+        pool.batch_max = 4
+        jobs = [
+            pool._submit_uncached("a", priority=PRIORITY_BACKGROUND),  # Pre-warm
+            pool._submit_uncached("b", priority=PRIORITY_BACKGROUND),
+            pool._submit_uncached("abcd", token=CancelToken(), session="s2", priority=PRIORITY_NEXT),
+            pool._submit_uncached("ab", token=CancelToken(), session="s1", priority=PRIORITY_FIRST),
+        ]
+        tasks = [asyncio.create_task(job) for job in jobs]
+        await asyncio.sleep(0)
+        pool.worker_tasks = [asyncio.create_task(pool.worker_loop(0))]
+        pcm = await asyncio.gather(*tasks)
+        await pool.shutdown()
+        return pcm, pool.voice.session.batch_sizes
+
+    pcm, batch_sizes = asyncio.run(run())
+    # The live first phrase runs alone, the later phrase next, and pre-warm last, together
+    assert batch_sizes == [1, 1, 2]
+    assert [len(p) // 2 for p in pcm] == [100, 100, 400, 200]
+
+
+def test_voice_without_alignments_is_not_batched(monkeypatch):
+    voice = FakeVoice()
+    voice.session.get_outputs = lambda: [SimpleNamespace(name="output")]
+    monkeypatch.setattr("app.services.tts_pool.load_voice", lambda *args: voice)
+
+    async def run():
+        pool = TTSWorkerPool("fake-batch.onnx", "missing.json", workers=1)
+        pool.batch_max = 4
+        await pool.start()
+        await pool.shutdown()
+        return pool.batch_max
+
+    assert asyncio.run(run()) == 1
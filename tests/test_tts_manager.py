@@ -0,0 +1,268 @@
+"""
+Voice loading: background warm-up, readiness gating, lazy voices, the
+memory-bounded registry and hot swaps.
+"""
+
+import asyncio
+
+from app.core.config import settings
+from app.services import tts_manager
+from app.services.tts_stats import VoiceStats
+
+
+class FakePool:
+    """Loads in LOAD_S; a voice named "broken.onnx" fails to load."""
+    LOAD_S = 0.02
+    UNLOAD_S = 0.0
+    scalable = False
+
+    def __init__(self, model_path, config_path, workers, **kwargs):
+        self.model_path = model_path
+        self.voice_id = model_path
+        self.workers = workers
+        self.stats = VoiceStats(workers)
+        self.warmed = []
+        self.running = False
+        self.unloaded = False
+
+    async def start(self):
+        assert not self.running, "started while still running"
+        await asyncio.sleep(self.LOAD_S)
+        if self.model_path == "broken.onnx":
+            raise RuntimeError("bad model")
+        self.running = True
+
+    async def warm_up(self, text):
+        self.warmed.append(text)
+
+    async def unload(self):
+        await asyncio.sleep(self.UNLOAD_S)
+        self.running, self.unloaded = False, True
+
+
+def setup(monkeypatch, models, lazy="", pinned="", budget_mb=0):
+    monkeypatch.setattr(tts_manager, "TTSWorkerPool", FakePool)
+    monkeypatch.setattr(tts_manager, "tts_pools", {})
+    monkeypatch.setattr(tts_manager, "voice_states", {})
+    monkeypatch.setattr(settings, "PIPER_MODELS", models)
+    monkeypatch.setattr(settings, "TTS_BACKEND", "thread")
+    monkeypatch.setattr(settings, "TTS_LAZY_VOICES", lazy)
+    monkeypatch.setattr(settings, "TTS_CACHE_PREWARM", False)
+    monkeypatch.setattr(settings, "TTS_PINNED_VOICES", pinned)
+    monkeypatch.setattr(settings, "TTS_VOICE_MEMORY_MB", budget_mb)
+    monkeypatch.setattr(tts_manager, "voice_events", tts_manager.deque())
+
+
+def test_voices_load_in_background_and_gate_readiness(monkeypatch):
+    setup(monkeypatch, {"en": "en.onnx", "hi": "hi.onnx"})
+
+    async def run():
+        await tts_manager.init_tts_pools()  # Returns before any voice is loaded
+        before = tts_manager.voices_ready()
+        pool = await tts_manager.ensure_voice("en")  # Waits for just this voice
+        await asyncio.sleep(FakePool.LOAD_S * 2)
+        return before, pool, tts_manager.voices_ready(), tts_manager.voice_status()
+
+    before, pool, after, status = asyncio.run(run())
+    assert before is False and after is True
+    assert pool is tts_manager.get_pool("en") and len(pool.warmed) == 1
+    assert status["en"]["state"] == "ready" and status["en"]["load_ms"] > 0
+    assert status["en"]["first_request_wait_ms"] > 0
+    assert status["hi"]["first_request_wait_ms"] is None  # Nobody asked yet
+
+
+def test_lazy_voice_loads_on_first_use(monkeypatch):
+    setup(monkeypatch, {"en": "en.onnx", "mr": "mr.onnx"}, lazy="mr")
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        await tts_manager.ensure_voice("en")
+        ready, mr_state = tts_manager.voices_ready(), tts_manager.voice_states["mr"].state
+        pool = await tts_manager.ensure_voice("mr")
+        return ready, mr_state, pool
+
+    ready, mr_state, pool = asyncio.run(run())
+    assert ready is True  # Lazy voices don't gate readiness
+    assert mr_state == "cold"
+    assert pool is not None and pool.warmed
+
+
+def test_failed_voice_is_reported_not_raised(monkeypatch):
+    setup(monkeypatch, {"en": "broken.onnx"})
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        return await tts_manager.ensure_voice("en"), await tts_manager.ensure_voice("xx")
+
+    pool, unknown = asyncio.run(run())
+    assert pool is None and unknown is None
+    assert tts_manager.voices_ready() is False
+    assert tts_manager.voice_status()["en"]["state"] == "failed"
+
+
+def test_budget_evicts_least_recently_used_unpinned_voice(monkeypatch, tmp_path):
+    models = {}
+    for voice in ("en", "hi-a", "hi-b", "hi-c"):
+        models[voice] = str(tmp_path / f"{voice}.onnx")
+        with open(models[voice], "wb") as f:
+            f.truncate(400_000)  # Estimated RSS: 0.4 MB each
+    setup(monkeypatch, models, lazy="hi-a,hi-b,hi-c", pinned="hi-a", budget_mb=1.3)
+    monkeypatch.setattr(tts_manager.runtime_resources, "process_rss", lambda: 0)
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        for voice in ("en", "hi-a", "hi-b", "hi-c", "hi-b"):
+            await tts_manager.ensure_voice(voice)
+        return tts_manager.voice_status(), tts_manager.registry_stats()
+
+    status, registry = asyncio.run(run())
+    # hi-c evicted hi-b (hi-a is pinned, en is eager); hi-b coming back evicted hi-c
+    evictions = [(e["voice"], e["event"]) for e in registry["events"] if e["event"] == "evict"]
+    assert evictions == [("hi-b", "evict"), ("hi-c", "evict")]
+    assert sorted(registry["loaded"]) == ["en", "hi-a", "hi-b"]
+    assert registry["resident_mb"] <= 1.3
+    assert status["hi-b"]["loads"] == 2 and status["hi-c"]["state"] == "cold"
+    assert status["hi-a"]["pinned"] and status["en"]["pinned"]
+
+
+def test_voice_of_a_live_turn_is_not_evicted_between_phrases(monkeypatch, tmp_path):
+    models = {}
+    for voice in ("hi-a", "hi-b"):
+        models[voice] = str(tmp_path / f"{voice}.onnx")
+        with open(models[voice], "wb") as f:
+            f.truncate(400_000)
+    setup(monkeypatch, models, lazy="hi-a,hi-b", budget_mb=0.5)
+    monkeypatch.setattr(tts_manager.runtime_resources, "process_rss", lambda: 0)
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        await tts_manager.ensure_voice("hi-a")
+        release = tts_manager.hold_voice("hi-a")  # A turn is speaking hi-a, no job queued right now
+        await tts_manager.ensure_voice("hi-b")
+        held = tts_manager.voice_states["hi-a"].state
+        release()
+        release()  # Idempotent
+        await tts_manager._make_room("hi-b", 0)  # The turn is over: now it may go
+        return held, tts_manager.voice_status()
+
+    held, status = asyncio.run(run())
+    assert held == "ready"  # Over budget rather than cutting off the turn
+    assert status["hi-a"]["in_use"] == 0 and status["hi-a"]["state"] == "cold"
+    assert status["hi-b"]["state"] == "ready"
+
+
+def test_request_during_eviction_waits_for_the_unload(monkeypatch):
+    setup(monkeypatch, {"en": "en.onnx"}, lazy="en")
+    monkeypatch.setattr(FakePool, "UNLOAD_S", 0.05)
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        pool = await tts_manager.ensure_voice("en")
+        evicting = asyncio.create_task(tts_manager.evict_voice("en"))
+        await asyncio.sleep(0)
+        state = tts_manager.voice_states["en"].state
+        again = await tts_manager.ensure_voice("en")  # Must not start the pool under the unload
+        await evicting
+        return pool, again, state, tts_manager.voice_status()["en"]
+
+    pool, again, state, status = asyncio.run(run())
+    assert state == "unloading"
+    assert again is pool and pool.running
+    assert status["state"] == "ready" and status["loads"] == 2 and status["evictions"] == 1
+
+
+def test_hot_swap_switches_new_jobs_and_drains_the_old_pool(monkeypatch):
+    setup(monkeypatch, {"en": "en.onnx"})
+    monkeypatch.setattr(tts_manager, "_resolve_model", lambda lang, path=None: path or "en.onnx")
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        old = await tts_manager.ensure_voice("en")
+        old.stats.rtf = 0.2
+        old.stats.job_started()  # A synthesis still running on the old voice
+        tts_manager.swap_voice("en", "en-v2.onnx")
+        while tts_manager.voice_states["en"].swap["state"] == "loading":
+            await asyncio.sleep(0.005)
+        new = await tts_manager.ensure_voice("en")
+        draining = (tts_manager.voice_states["en"].swap["state"], old.unloaded)
+        old.stats.job_finished()
+        await asyncio.sleep(0.1)
+        return old, new, draining, tts_manager.voice_status()["en"]
+
+    old, new, draining, status = asyncio.run(run())
+    assert new is not old and new.model_path == "en-v2.onnx"
+    assert new.stats.rtf == 0.2  # Estimates carried over: no reset in phrase sizing
+    assert draining == ("draining", False)  # Old pool kept until its job finished
+    assert old.unloaded and not new.unloaded
+    assert status["swap"]["state"] == "done" and status["generation"] == 1
+
+
+def test_hot_swap_waits_for_phrases_held_on_the_old_pool(monkeypatch):
+    setup(monkeypatch, {"en": "en.onnx"})
+    monkeypatch.setattr(tts_manager, "_resolve_model", lambda lang, path=None: path or "en.onnx")
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        old = await tts_manager.ensure_voice("en")
+        release = tts_manager.hold_voice("en", old)  # A phrase got the old pool, not queued yet
+        tts_manager.swap_voice("en", "en-v2.onnx")
+        while tts_manager.voice_states["en"].swap["state"] == "loading":
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.1)
+        held = (tts_manager.voice_states["en"].swap["state"], old.unloaded)
+        release()
+        await asyncio.sleep(0.1)
+        return old, held, tts_manager.voice_states["en"].swap["state"]
+
+    old, held, after = asyncio.run(run())
+    assert held == ("draining", False)  # No queued job, but the phrase still holds the old pool
+    assert old.unloaded and after == "done"
+    assert not tts_manager.pool_holds
+
+
+def test_voice_being_swapped_is_not_evicted_for_another_voice(monkeypatch, tmp_path):
+    models = {}
+    for voice in ("hi-a", "hi-b"):
+        models[voice] = str(tmp_path / f"{voice}.onnx")
+        with open(models[voice], "wb") as f:
+            f.truncate(400_000)
+    setup(monkeypatch, models, lazy="hi-a,hi-b", budget_mb=0.5)
+    monkeypatch.setattr(tts_manager.runtime_resources, "process_rss", lambda: 0)
+    monkeypatch.setattr(tts_manager, "_resolve_model", lambda lang, path=None: path)
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        old = await tts_manager.ensure_voice("hi-a")
+        tts_manager.swap_voice("hi-a", models["hi-a"])
+        await asyncio.sleep(0)  # The new pool is loading
+        await tts_manager.ensure_voice("hi-b")  # Over budget: would pick hi-a, the LRU voice
+        while tts_manager.voice_states["hi-a"].swap["state"] in ("loading", "draining"):
+            await asyncio.sleep(0.005)
+        new = await tts_manager.ensure_voice("hi-a")  # Must not start the swapped-in pool again
+        return old, new, tts_manager.voice_status()["hi-a"]
+
+    old, new, status = asyncio.run(run())
+    assert status["state"] == "ready" and status["evictions"] == 0 and status["in_use"] == 0
+    assert status["swap"]["state"] == "done"
+    assert new is not old and new.running and old.unloaded
+
+
+def test_swap_is_abandoned_if_the_voice_is_evicted_meanwhile(monkeypatch):
+    setup(monkeypatch, {"en": "en.onnx"}, lazy="en")
+    monkeypatch.setattr(tts_manager, "_resolve_model", lambda lang, path=None: path or "en.onnx")
+
+    async def run():
+        await tts_manager.init_tts_pools()
+        old = await tts_manager.ensure_voice("en")
+        tts_manager.swap_voice("en", "en-v2.onnx")
+        await asyncio.sleep(0)
+        await tts_manager.evict_voice("en")  # Manual eviction while the new pool loads
+        while tts_manager.voice_states["en"].swap["state"] == "loading":
+            await asyncio.sleep(0.005)
+        swap = tts_manager.voice_states["en"].swap
+        again = await tts_manager.ensure_voice("en")
+        return old, again, swap
+
+    old, again, swap = asyncio.run(run())
+    assert swap["state"] == "failed"
+    assert again is old and again.running  # The old pool loads again; the new one was shut down
@@ -0,0 +1,219 @@
+"""
+Process backend: PCM comes back through shared memory (streamed sentence by
+sentence for stream_pcm), blocks of abandoned syntheses are released, cancel slots are reused, a cancel raised in this
+process stops the synthesis running in the worker process, and shutdown
+lets submitted jobs finish first.
+
+Workers use the spawn start method. Everything runs from fixtures and tests
+and the worker entry points live in app.services.tts_process_pool, so a
+spawned child that imports this module runs nothing.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.cancellation import CancelToken
+from app.services.tts_process_pool import CANCEL_SLOTS, ProcessTTSPool
+
+onnx = pytest.importorskip("onnx")
+
+SHORT = "Hello there. How are you today?"
+LONG = "Hi there. " * 10000  # Long enough to still be running when cancelled
+
+
+def write_fake_voice(directory) -> str:
+    """A tiny Piper-shaped model: every phoneme id becomes a few samples of a sine."""
+    from onnx import TensorProto, helper, numpy_helper
+    from piper.phoneme_ids import DEFAULT_PHONEME_ID_MAP
+
+    initializers = [
+        numpy_helper.from_array(np.random.default_rng(0).random((1, 4), dtype=np.float32), "W"),
+        numpy_helper.from_array(np.array([0, 1, -1], dtype=np.int64), "shape"),
+        numpy_helper.from_array(np.array([2], dtype=np.int64), "axes"),
+    ]
+    nodes = [
+        helper.make_node("Cast", ["input"], ["ids"], to=TensorProto.FLOAT),
+        helper.make_node("Unsqueeze", ["ids", "axes"], ["ids3"]),
+        helper.make_node("MatMul", ["ids3", "W"], ["wave"]),
+        helper.make_node("Sin", ["wave"], ["sine"]),
+        helper.make_node("Reshape", ["sine", "shape"], ["output"]),
+    ]
+    graph = helper.make_graph(nodes, "fake", [
+        helper.make_tensor_value_info("input", TensorProto.INT64, ["B", "N"]),
+        helper.make_tensor_value_info("input_lengths", TensorProto.INT64, ["B"]),
+        helper.make_tensor_value_info("scales", TensorProto.FLOAT, [3]),
+    ], [helper.make_tensor_value_info("output", TensorProto.FLOAT, None)], initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+
+    path = os.path.join(directory, "fake.onnx")
+    onnx.save(model, path)
+    config = {
+        "audio": {"sample_rate": 22050}, "espeak": {"voice": "en-us"}, "phoneme_type": "espeak",
+        "inference": {"noise_scale": 0.667, "length_scale": 1, "noise_w": 0.8},
+        "phoneme_id_map": DEFAULT_PHONEME_ID_MAP, "num_symbols": 256, "num_speakers": 1,
+    }
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return path
+
+
+def shm_blocks() -> set:
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    start_method, settings.TTS_PROCESS_START_METHOD = settings.TTS_PROCESS_START_METHOD, "spawn"
+    model = write_fake_voice(tmp_path_factory.mktemp("voice"))
+    pool = ProcessTTSPool(model, f"{model}.json", workers=1)
+    try:
+        asyncio.run(pool.start())
+        yield pool
+    finally:
+        asyncio.run(pool.shutdown())
+        settings.TTS_PROCESS_START_METHOD = start_method
+
+
+def test_pcm_crosses_through_shared_memory(pool):
+    from app.core.runtime_resources import load_voice
+    from app.services.pcm_buffer import float_to_int16
+    from app.services.piper_synth import iter_sentence_audio
+
+    voice = load_voice(pool.model_path, pool.config_path)
+    expected = b"".join(float_to_int16(a).tobytes() for a in iter_sentence_audio(voice, SHORT))
+    before = shm_blocks()
+    pcm = asyncio.run(pool._submit_uncached(SHORT, CancelToken()))
+    assert pcm == expected
+    assert shm_blocks() == before  # The worker's block was released once copied out
+    assert pool.stats.queued == 0 and pool.stats.samples == 1
+
+
+def test_stream_yields_each_sentence_as_it_is_done(pool):
+    from app.core.runtime_resources import load_voice
+    from app.services.pcm_buffer import float_to_int16
+    from app.services.piper_synth import iter_sentence_audio
+
+    voice = load_voice(pool.model_path, pool.config_path)
+    expected = [float_to_int16(a).tobytes() for a in iter_sentence_audio(voice, SHORT)]
+    text = "Hi there. " * 3000
+
+    async def run():
+        before = shm_blocks()
+        chunks = [bytes(c) async for c in pool.stream_pcm(SHORT, CancelToken())]
+        t0 = time.perf_counter()
+        first_s, count = None, 0
+        async for _ in pool.stream_pcm(text, CancelToken()):
+            first_s = first_s or time.perf_counter() - t0
+            count += 1
+        return chunks, first_s, time.perf_counter() - t0, count, before, shm_blocks()
+
+    chunks, first_s, total_s, count, before, after = asyncio.run(run())
+    assert chunks == expected and count == 3000
+    assert first_s < total_s / 4  # Not after the whole phrase
+    assert after == before and not pool.streams
+
+
+def test_closed_stream_releases_its_sentence_blocks(pool):
+    async def run():
+        before = shm_blocks()
+        stream = pool.stream_pcm("Hi there. " * 3000, CancelToken())
+        await stream.__anext__()
+        await stream.aclose()  # The client left after the first sentence
+        await pool._submit_uncached(SHORT)  # One worker runs jobs in order: the stream's job is over
+        await asyncio.sleep(0.05)  # Its last blocks reach the router
+        return before, shm_blocks()
+
+    before, after = asyncio.run(run())
+    assert after == before and not pool.streams
+
+
+def test_abandoned_synthesis_releases_its_block(pool):
+    async def run():
+        before = shm_blocks()
+        caller = asyncio.create_task(pool._submit_uncached(LONG))
+        await asyncio.sleep(0.05)  # Running in the worker by now
+        caller.cancel()  # The caller left; nobody will take the block
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        # One worker runs jobs in order: once this is back, the abandoned result was discarded
+        await pool._submit_uncached(SHORT)
+        return before, shm_blocks()
+
+    before, after = asyncio.run(run())
+    assert after == before
+
+
+def test_cancel_slots_are_reused_with_a_cleared_flag(pool):
+    async def run():
+        busy = asyncio.create_task(pool._submit_uncached(LONG))  # Holds the only worker
+        await asyncio.sleep(0.05)
+        slot = pool.free_slots[-1]  # The next job with a token takes this one
+        token = CancelToken()
+        queued = asyncio.create_task(pool._submit_uncached(SHORT, token))
+        await asyncio.sleep(0)
+        token.cancel()  # Still queued: dropped, and its slot's flag raised
+        dropped = await queued
+        flag_after_cancel = pool.cancel_flags.buf[slot]
+        await busy
+
+        pcm = await pool._submit_uncached(SHORT, CancelToken())
+        return dropped, flag_after_cancel, pool.free_slots[-1] == slot, pcm
+
+    dropped, flag_after_cancel, reused, pcm = asyncio.run(run())
+    assert dropped is None and flag_after_cancel == 1
+    assert reused and pcm  # Same slot, flag cleared on reuse: the next job runs to the end
+    assert sorted(pool.free_slots) == list(range(CANCEL_SLOTS))
+
+
+def test_cancel_flag_stops_the_synthesis_in_the_worker(pool):
+    async def run():
+        t0 = time.perf_counter()
+        await pool._submit_uncached(LONG, CancelToken())
+        full_s = time.perf_counter() - t0
+
+        token = CancelToken()
+        slot = pool.free_slots[-1]
+        job = asyncio.create_task(pool._submit_uncached(LONG, token))
+        await asyncio.sleep(full_s / 4)
+        token.cancel()  # Barge-in: raises the job's flag in shared memory
+        raised = pool.cancel_flags.buf[slot]
+        t0 = time.perf_counter()
+        result = await job
+        await pool._submit_uncached(SHORT)  # The only worker is free again
+        return full_s, time.perf_counter() - t0, raised, result
+
+    full_s, freed_s, raised, result = asyncio.run(run())
+    assert raised == 1 and result is None
+    assert freed_s < full_s / 2  # Stopped mid-utterance, not run to the end
+    assert sorted(pool.free_slots) == list(range(CANCEL_SLOTS))
+
+
+def test_shutdown_lets_submitted_jobs_finish(tmp_path):
+    start_method, settings.TTS_PROCESS_START_METHOD = settings.TTS_PROCESS_START_METHOD, "spawn"
+    model = write_fake_voice(tmp_path)
+    own = ProcessTTSPool(model, f"{model}.json", workers=1)
+
+    async def run():
+        await own.start()
+        tokens = [CancelToken() for _ in range(3)]
+        jobs = [asyncio.create_task(own._submit_uncached(f"{SHORT} {i}", t)) for i, t in enumerate(tokens)]
+        await asyncio.sleep(0)  # All submitted: one running, two queued
+        await own.shutdown()
+        for t in tokens:
+            t.cancel()  # After the flags are gone: a no-op, not an AttributeError
+        late = await own._submit_uncached(SHORT)
+        return await asyncio.gather(*jobs), late
+
+    try:
+        results, late = asyncio.run(run())
+    finally:
+        settings.TTS_PROCESS_START_METHOD = start_method
+    assert all(results) and late is None
+    assert own.cancel_flags is None and not own.running
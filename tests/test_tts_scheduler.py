@@ -0,0 +1,89 @@
+"""
+TTS job scheduling: first phrases first, playback deadlines, per-session
+round-robin and dropping jobs of cancelled turns.
+"""
+
+import asyncio
+import time
+
+from app.services.cancellation import CancelToken
+from app.services.tts_scheduler import (
+    FairJobQueue, PlaybackClock, ScheduledJob, PRIORITY_BACKGROUND, PRIORITY_FIRST,
+)
+
+
+class Job(ScheduledJob):
+    def __init__(self, name, **schedule):
+        super().__init__(**schedule)
+        self.name = name
+        self.dropped = False
+
+    def drop(self):
+        self.dropped = True
+
+
+def drain(queue):
+    names = []
+    while queue.qsize():
+        job = queue.get_nowait()
+        names.append(job.name if job else None)
+    return names
+
+
+def test_first_phrase_jumps_a_long_reply():
+    queue = FairJobQueue()
+    busy = PlaybackClock()
+    busy.advance(10.0)  # Plenty of audio already queued for playback
+    for i in range(2, 6):
+        queue.put_nowait(Job(f"a{i}", session="a", clock=busy))
+    queue.put_nowait(Job("b1", session="b", priority=PRIORITY_FIRST))
+    assert drain(queue) == ["b1", "a2", "a3", "a4", "a5"]
+
+
+def test_deadlines_order_later_phrases():
+    queue = FairJobQueue()
+    now = time.perf_counter()
+    late, early = PlaybackClock(), PlaybackClock()
+    late.advance(20.0, now)
+    early.advance(5.0, now)
+    queue.put_nowait(Job("bg", priority=PRIORITY_BACKGROUND))
+    for i in range(2):
+        queue.put_nowait(Job(f"a{i}", session="a", clock=late))
+        queue.put_nowait(Job(f"b{i}", session="b", clock=early))
+    for s in "cd":
+        queue.put_nowait(Job(s, session=s, priority=PRIORITY_FIRST))
+    queue.put_nowait(None)  # Stop sentinel waits for the work
+    # Playback about to run dry counts as urgent as a first phrase
+    starving = PlaybackClock()
+    starving.advance(0.05, now)
+    queue.put_nowait(Job("e", session="e", clock=starving))
+    assert drain(queue) == ["c", "d", "e", "b0", "b1", "a0", "a1", "bg", None]
+
+
+def test_cancelled_turn_jobs_never_reach_a_worker():
+    async def run():
+        queue = FairJobQueue()
+        token = CancelToken()
+        stale = [Job(f"old{i}", session="a", token=token) for i in range(3)]
+        for job in stale:
+            queue.put_nowait(job)
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        token.cancel()  # Barge-in
+        fresh = Job("new", session="a", token=CancelToken(), priority=PRIORITY_FIRST)
+        queue.put_nowait(fresh)
+        first = await getter  # Took old0 before the cancel
+        second = await queue.get()
+        return first, second, stale, queue
+
+    first, second, stale, queue = asyncio.run(run())
+    assert first.name == "old0" and second.name == "new"
+    assert [j.dropped for j in stale] == [False, True, True]
+    assert queue.dropped == 2 and queue.qsize() == 0
+
+
+def test_equal_sessions_take_turns():
+    queue = FairJobQueue()
+    for name in ("x0", "x1", "x2", "y0", "y1"):
+        queue.put_nowait(Job(name, session=name[0]))
+    assert drain(queue) == ["x0", "y0", "x1", "y1", "x2"]
@@ -0,0 +1,47 @@
+"""
+VoiceStats phrase sizing tests.
+"""
+
+from app.core.config import settings
+from app.services.tts_stats import VoiceStats
+
+
+def test_defaults_until_measured():
+    stats = VoiceStats(workers=2)
+    assert stats.phrase_sizes() == (settings.TTS_FIRST_PHRASE_MIN, settings.TTS_PHRASE_MIN)
+
+
+def test_fast_voice_keeps_short_first_phrase():
+    stats = VoiceStats(workers=2, sample_rate=1000)
+    stats.record(text_len=14, synth_s=0.05, n_samples=1000)  # RTF 0.05, 14 chars/s
+    first, nxt = stats.phrase_sizes()
+    assert first == settings.TTS_FIRST_PHRASE_MIN
+    assert nxt == settings.TTS_PHRASE_MIN
+
+
+def test_slow_or_backlogged_voice_grows_phrases():
+    stats = VoiceStats(workers=2, sample_rate=1000)
+    stats.record(text_len=14, synth_s=0.5, n_samples=1000)  # RTF 0.5
+    first, nxt = stats.phrase_sizes()
+    assert first > settings.TTS_FIRST_PHRASE_MIN
+    # The first phrase plays long enough to cover synthesis of the next one
+    assert first >= round(stats.load * nxt)
+
+    for _ in range(2):
+        stats.job_started()
+    first_busy, next_busy = stats.phrase_sizes()
+    assert next_busy > nxt and first_busy > first
+    assert next_busy <= settings.TTS_PHRASE_MAX
+
+
+def test_queue_wait_and_depth_histograms():
+    stats = VoiceStats(workers=1)
+    for _ in range(3):
+        stats.job_started()  # Sees depth 0, 1, 2
+    stats.record_wait(0.004)
+    stats.record_wait(0.3)
+    snap = stats.snapshot()
+    assert snap["queue_depth"]["buckets"]["le_0"] == 1 and snap["queue_depth"]["count"] == 3
+    assert snap["wait_ms"]["buckets"]["le_5"] == 1 and snap["wait_ms"]["buckets"]["le_500"] == 1
+    assert stats.take_peak_wait() == 300.0
+    assert stats.take_peak_wait() == 0.0
@@ -0,0 +1,129 @@
+"""
+Streamed synthesis (/api/v1/generate): a slow or departed client must not hold a worker,
+and unloading the pool finishes queued work and ends parked streams.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.services.cancellation import CancelToken
+from app.services.tts_pool import TTSWorkerPool
+
+SENTENCE_S = 0.02
+
+
+class FakeVoicePool(TTSWorkerPool):
+    """One worker; every sentence takes SENTENCE_S of blocking "synthesis"."""
+    def __init__(self):
+        super().__init__("fake-stream.onnx", "missing.json", workers=1)
+        self.voice = object()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.closed = []
+
+    def _iter_pcm(self, text, token=None):
+        try:
+            for word in text.split():
+                if token and token.cancelled:
+                    return
+                time.sleep(SENTENCE_S)
+                yield word.encode()
+        finally:
+            self.closed.append(text)
+
+    def synthesize_raw_sync(self, text, token=None):
+        return b"".join(self._iter_pcm(text, token))
+
+
+async def started(pool):
+    pool.worker_tasks = [asyncio.create_task(pool.worker_loop(0))]
+    return pool
+
+
+def test_stream_yields_every_sentence_in_order():
+    async def run():
+        pool = await started(FakeVoicePool())
+        chunks = [c async for c in pool.stream_pcm("a b c d e")]
+        await pool.shutdown()
+        return chunks, pool.closed
+
+    chunks, closed = asyncio.run(run())
+    assert chunks == [b"a", b"b", b"c", b"d", b"e"]
+    assert closed == ["a b c d e"]
+
+
+def test_slow_client_parks_and_frees_the_worker():
+    async def run():
+        pool = await started(FakeVoicePool())
+        stream = pool.stream_pcm("s1 s2 s3 s4 s5 s6 s7 s8")
+        await stream.__anext__()  # Client reads one sentence, then stalls
+        await asyncio.sleep(SENTENCE_S * (settings.TTS_STREAM_BUFFER + 2))
+        t0 = time.perf_counter()
+        pcm = await pool.submit("quick")  # The only worker must be free by now
+        waited = time.perf_counter() - t0
+        rest = [c async for c in stream]
+        await pool.shutdown()
+        return pcm, waited, rest
+
+    pcm, waited, rest = asyncio.run(run())
+    assert pcm == b"quick"
+    assert waited < SENTENCE_S * 3
+    assert rest == [b"s2", b"s3", b"s4", b"s5", b"s6", b"s7", b"s8"]
+
+
+def test_disconnect_and_cancel_release_the_job():
+    async def run():
+        pool = await started(FakeVoicePool())
+        stream = pool.stream_pcm("d1 d2 d3 d4 d5 d6")
+        await stream.__anext__()
+        await stream.aclose()  # Client gone
+        await asyncio.sleep(SENTENCE_S * 2)
+
+        token = CancelToken()
+        stream = pool.stream_pcm("c1 c2 c3 c4 c5 c6", token)
+        await stream.__anext__()
+        token.cancel()  # Barge-in
+        rest = [c async for c in stream]
+        await pool.shutdown()
+        return pool.closed, rest, pool.stats.queued
+
+    closed, rest, queued = asyncio.run(run())
+    assert closed == ["d1 d2 d3 d4 d5 d6", "c1 c2 c3 c4 c5 c6"]
+    assert len(rest) <= settings.TTS_STREAM_BUFFER
+    assert queued == 0
+
+
+def test_unload_finishes_queued_jobs_before_stopping():
+    async def run():
+        pool = await started(FakeVoicePool())
+        pool.batch_max = 1
+        jobs = [asyncio.create_task(pool._submit_uncached(f"q{i} w{i}")) for i in range(6)]
+        await asyncio.sleep(0)  # All queued behind the first
+        await pool.unload()
+        late = await pool._submit_uncached("late")
+        return [await job for job in jobs], late, pool.running
+
+    results, late, running = asyncio.run(run())
+    assert results == [f"q{i}w{i}".encode() for i in range(6)]
+    assert late is None and running is False
+
+
+def test_unload_ends_a_parked_stream():
+    async def run():
+        pool = await started(FakeVoicePool())
+        stream = pool.stream_pcm("p1 p2 p3 p4 p5 p6 p7 p8")
+        first = await stream.__anext__()  # Client reads one sentence, then stalls
+        await asyncio.sleep(SENTENCE_S * (settings.TTS_STREAM_BUFFER + 2))
+        parked = bool(pool.parked)
+        await pool.unload()
+        rest = await asyncio.wait_for(collect(stream), 1)  # Never left waiting for a worker
+        return parked, [first] + rest, pool.closed
+
+    async def collect(stream):
+        return [c async for c in stream]
+
+    parked, chunks, closed = asyncio.run(run())
+    assert parked
+    assert chunks == [b"p1", b"p2", b"p3"][:settings.TTS_STREAM_BUFFER + 1]
+    assert closed == ["p1 p2 p3 p4 p5 p6 p7 p8"]
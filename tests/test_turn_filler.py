@@ -0,0 +1,77 @@
+"""
+Filler audio: a cached acknowledgement plays only when the answer is late.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services import turn_pipeline
+from app.services.session_manager import SessionManager
+
+
+class SlowLLM:
+    """Fake genai client: first token after `delay_s`."""
+    def __init__(self, delay_s):
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self.stream))
+        self.delay_s = delay_s
+
+    async def stream(self, **kwargs):
+        async def chunks():
+            await asyncio.sleep(self.delay_s)
+            yield SimpleNamespace(text="Sure, here is the answer you asked for.")
+        return chunks()
+
+
+class BurstLLM:
+    """Fake genai client: a burst of text tokens at once, then the end of the sentence after `delay_s`."""
+    def __init__(self, delay_s):
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self.stream))
+        self.delay_s = delay_s
+
+    async def stream(self, **kwargs):
+        async def chunks():
+            for word in "well let me think about what you asked".split():
+                yield SimpleNamespace(text=word + " ")
+            await asyncio.sleep(self.delay_s)
+            yield SimpleNamespace(text="and here it is.")
+        return chunks()
+
+
+def run_turn(monkeypatch, delay_s, llm=SlowLLM, stall_s=0.0):
+    monkeypatch.setattr(settings, "TTS_FILLER", True)
+    monkeypatch.setattr(settings, "TTS_FILLER_BUDGET_MS", 50)
+    async def filler_audio(lang):
+        return "Hmm.", b"\x00\x00"
+    monkeypatch.setattr(turn_pipeline, "filler_audio", filler_audio)
+    session = SessionManager().get("filler-test")
+
+    async def collect():
+        pipeline, _ = await turn_pipeline.start_turn(session, "what is up", "en", llm(delay_s))
+        types = []
+        async for item in pipeline():
+            if not types and stall_s:
+                await asyncio.sleep(stall_s)  # Client reads nothing more for a while
+            types.append(item["type"])
+        return types
+    return asyncio.run(collect())
+
+
+def test_late_answer_gets_a_filler_first(monkeypatch):
+    types = run_turn(monkeypatch, delay_s=0.2)
+    assert types.index("filler") < types.index("audio_text")
+    assert types.count("filler") == 1
+
+
+def test_prompt_answer_plays_no_filler(monkeypatch):
+    types = run_turn(monkeypatch, delay_s=0.0)
+    assert "audio_text" in types and "filler" not in types
+
+
+def test_filler_survives_a_full_response_queue(monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "STREAM_TEXT_FLUSH_MS", 0)
+    # The queue is full of text when the filler is due; it must still play once it drains
+    types = run_turn(monkeypatch, delay_s=0.3, llm=BurstLLM, stall_s=0.1)
+    assert types.count("filler") == 1
+    assert types.index("filler") < types.index("audio_text")
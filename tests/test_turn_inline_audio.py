@@ -0,0 +1,127 @@
+"""
+Inline audio in /api/stream_chat: phrases finishing out of order still go out
+in reply order, at most TTS_INLINE_LOOKAHEAD in flight, in [kind][len] frames.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services import turn_pipeline
+from app.services.session_manager import SessionManager
+from app.services.stream_protocol import FRAME_AUDIO, FRAME_JSON, encode_audio, encode_event
+from app.services.tts_stats import VoiceStats
+
+SENTENCES = ["One.", "Two.", "Three.", "Four.", "Five."]
+
+
+class FakeLLM:
+    """Fake genai client: the reply one sentence per token."""
+    def __init__(self):
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self.stream))
+
+    async def stream(self, **kwargs):
+        async def chunks():
+            for sentence in SENTENCES:
+                yield SimpleNamespace(text=sentence + " ")
+        return chunks()
+
+
+class OutOfOrderPool:
+    """Earlier phrases take longer, so every phrase finishes before the one ahead of it."""
+    voice_id = "fake-inline.onnx"
+
+    def __init__(self):
+        self.stats = VoiceStats(1)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.finished = []
+
+    async def submit(self, text, token=None, session=None):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01 * (len(SENTENCES) - SENTENCES.index(text)))
+            self.finished.append(text)
+            return text.encode() * 2  # Even length: stands in for int16 PCM
+        finally:
+            self.in_flight -= 1
+
+
+def parse_frames(body: bytes):
+    frames, pos = [], 0
+    while pos < len(body):
+        kind, size = body[pos:pos + 1], int.from_bytes(body[pos + 1:pos + 5], "big")
+        frames.append((kind, body[pos + 5:pos + 5 + size]))
+        pos += 5 + size
+    return frames
+
+
+def test_out_of_order_synthesis_is_emitted_in_reply_order(monkeypatch):
+    monkeypatch.setattr(settings, "TTS_INLINE_LOOKAHEAD", 3)
+    monkeypatch.setattr(settings, "TTS_PHRASE_MIN", 1)  # One sentence per phrase
+    monkeypatch.setattr(settings, "TTS_FILLER", False)
+    pool = OutOfOrderPool()
+    monkeypatch.setattr(turn_pipeline, "get_pool", lambda lang: pool)
+
+    async def ensure_voice(lang):
+        return pool
+    monkeypatch.setattr(turn_pipeline, "ensure_voice", ensure_voice)
+
+    session = SessionManager().get("inline-test")
+
+    async def collect():
+        pipeline, framed = await turn_pipeline.start_turn(session, "count to five", "en", FakeLLM(), inline_audio=True)
+        # Encoded the way stream_chat writes the response body
+        body = b""
+        async for item in pipeline():
+            body += encode_event(item, framed) if isinstance(item, dict) else encode_audio(item)
+        return body, framed
+
+    body, framed = asyncio.run(collect())
+    frames = parse_frames(body)
+    assert framed is True
+    assert pool.finished != SENTENCES  # Synthesis really did finish out of order
+    assert 1 < pool.peak_in_flight <= 3
+
+    events = [(kind, json.loads(payload)) for kind, payload in frames if kind == FRAME_JSON]
+    assert all(kind in (FRAME_JSON, FRAME_AUDIO) for kind, _ in frames)
+    assert any(event["type"] == "text" for _, event in events)
+
+    # Every audio_text event is followed directly by its own PCM, in reply order
+    spoken = []
+    for i, (kind, payload) in enumerate(frames):
+        if kind == FRAME_JSON and json.loads(payload)["type"] == "audio_text":
+            event = json.loads(payload)
+            audio_kind, pcm = frames[i + 1]
+            assert audio_kind == FRAME_AUDIO and len(pcm) == event["bytes"]
+            assert pcm == event["content"].encode() * 2
+            spoken.append((event["seq"], event["content"]))
+    assert spoken == list(enumerate(SENTENCES))
+
+
+def test_phrases_after_a_hot_swap_go_to_the_new_pool(monkeypatch):
+    monkeypatch.setattr(settings, "TTS_INLINE_LOOKAHEAD", 1)
+    monkeypatch.setattr(settings, "TTS_PHRASE_MIN", 1)
+    monkeypatch.setattr(settings, "TTS_FILLER", False)
+    old, new = OutOfOrderPool(), OutOfOrderPool()
+    pools = {"en": old}
+    monkeypatch.setattr(turn_pipeline, "get_pool", lambda lang: pools["en"])
+
+    async def ensure_voice(lang):
+        pool = pools["en"]
+        if len(old.finished) == 2:
+            pools["en"] = new  # Swapped mid-turn, between phrases
+        return pool
+    monkeypatch.setattr(turn_pipeline, "ensure_voice", ensure_voice)
+
+    session = SessionManager().get("inline-swap-test")
+
+    async def collect():
+        pipeline, _ = await turn_pipeline.start_turn(session, "count to five", "en", FakeLLM(), inline_audio=True)
+        return [item for item in [x async for x in pipeline()] if isinstance(item, bytes)]
+
+    audio = asyncio.run(collect())
+    assert audio == [s.encode() * 2 for s in SENTENCES]  # No silent phrase across the switch
+    assert old.finished == SENTENCES[:3] and new.finished == SENTENCES[3:]